@@ -4,6 +4,7 @@ from ._listobjects import ListObjects
 from ._process import Process
 from ._removeobjects import RemoveObjects
 from ._retrieve import Retrieve
+from ._retrieve_cache import RetrieveCache
 from ._search import Search
 from ._upload import Upload
 from ._rank_sources import RankSources
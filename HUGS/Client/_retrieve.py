@@ -5,13 +5,28 @@ class Retrieve:
     """
     This class is used to retrieve the data that's found using the search function
     from the object store
+
+    Retrieved data is kept in a cache on disk and only data that isn't cached
+    is requested from the service, see RetrieveCache.
+
+    Args:
+        service_url (str, default=None): URL of service
+        use_cache (bool, default=True): Use the cache of retrieved data
+        cache_dir (str, pathlib.Path, default=None): Directory for cached data
+        cache_max_bytes (int, default=None): Maximum size of cached data in bytes
     """
-    def __init__(self, service_url=None):
+    def __init__(self, service_url=None, use_cache=True, cache_dir=None, cache_max_bytes=None):
         from Acquire.Client import Wallet
+        from HUGS.Client import RetrieveCache
 
         wallet = Wallet()
         self._service = wallet.get_service(service_url=f"{service_url}/hugs")
 
+        if use_cache:
+            self._cache = RetrieveCache(cache_dir=cache_dir, max_bytes=cache_max_bytes)
+        else:
+            self._cache = None
+
     def list(self):
         """ Return details on the search results
 
@@ -20,50 +35,87 @@ class Retrieve:
         """
         return list(self._results.keys())
 
-    def retrieve(self, keys):
+    def retrieve(self, keys, variables=None, start_datetime=None, end_datetime=None, average=None,
+                 keep_missing=False):
         """ Retrieve the data at the keys found by the search function
 
+            The data is selected and averaged by the service so only the requested
+            variables and times are downloaded.
+
             Args:
                 keys (dict): Dictionary of object store keys
+                variables (list, default=None): Data variables to retrieve, if None all are retrieved
+                start_datetime (datetime, default=None): Retrieve data from this time
+                end_datetime (datetime, default=None): Retrieve data up to and including this time
+                average (str, default=None): Averaging period such as 2H, see HUGS.Processing.resample_observations
+                keep_missing (bool, default=False): Keep averaging periods without data
             Returns:
-                dict: Dictionary of xarray Datasets
+                defaultdict(dict): Dictionary of xarray Datasets keyed by search key and daterange
         """
-        from Acquire.ObjectStore import string_to_datetime
-        from xarray import Dataset
-        from json import loads
-        import warnings
+        from collections import defaultdict
+        from Acquire.ObjectStore import datetime_to_string
+        from HUGS.Util import chunks_to_dataset
 
         if self._service is None:
             raise PermissionError("Cannot use a null service")
 
+        if variables is not None and not isinstance(variables, list):
+            variables = [variables]
+
+        selection = {"variables": variables, "start_datetime": start_datetime, "end_datetime": end_datetime,
+                     "average": average, "keep_missing": keep_missing}
+
+        datasets = defaultdict(dict)
+
+        # Only request the data we haven't cached
+        to_retrieve = defaultdict(dict)
+        for key, dateranges in keys.items():
+            for daterange, data_keys in dateranges.items():
+                dataset = self._cache.get(data_keys, **selection) if self._cache is not None else None
+
+                if dataset is not None:
+                    datasets[key][daterange] = dataset
+                else:
+                    to_retrieve[key][daterange] = data_keys
+
+        if not to_retrieve:
+            return datasets
+
         args = {}
-        args["keys"] = keys
-        args["return_type"] = "json"
+        args["keys"] = dict(to_retrieve)
+        args["return_type"] = "netcdf"
+
+        if variables is not None:
+            args["variables"] = variables
+        if start_datetime is not None:
+            args["start_datetime"] = datetime_to_string(start_datetime)
+        if end_datetime is not None:
+            args["end_datetime"] = datetime_to_string(end_datetime)
+        if average is not None:
+            args["average"] = average
+            args["keep_missing"] = keep_missing
 
         response = self._service.call_function(function="retrieve", args=args)
 
         response_data = response["results"]
 
-        # Convert the string passed to dict
-        for key in response_data:
-            response_data[key] = loads(response_data[key])
+        for key, dateranges in response_data.items():
+            for daterange, chunks in dateranges.items():
+                dataset = chunks_to_dataset(chunks)
+                datasets[key][daterange] = dataset
 
-        datasets = {}
-        for key in response_data:
-            # We need to convert the datetime string back to datetime objects here
-            datetime_data = response_data[key]["coords"]["time"]["data"]
+                if self._cache is not None:
+                    self._cache.set(to_retrieve[key][daterange], dataset, **selection)
 
-            for i, _ in enumerate(datetime_data):
-                datetime_data[i] = string_to_datetime(datetime_data[i])
-
-            # TODO - catch FutureWarnings here that may affect voila behaviour
-            with warnings.catch_warnings():
-                warnings.simplefilter("ignore")
+        return datasets
 
-                json_data = response_data[key]
-                datasets[key] = Dataset.from_dict(json_data)
+    def cache(self):
+        """ Returns the cache of retrieved data
 
-        return datasets
+            Returns:
+                RetrieveCache or None: Cache or None if not used
+        """
+        return self._cache
 
     def service(self):
         return self._service
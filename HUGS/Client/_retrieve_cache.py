@@ -0,0 +1,201 @@
+__all__ = ["RetrieveCache"]
+
+# Default maximum size of the cache directory
+_default_max_bytes = 2 * 1024 ** 3
+
+
+class RetrieveCache:
+    """ A cache on disk of Datasets retrieved from the HUGS object store
+
+        Data is stored in the object store at keys given by the hash of its
+        contents so the data at a set of keys never changes. Each Dataset is
+        cached in a NetCDF file named by the hash of the object store keys it
+        was combined from and the variables, times and averaging selected.
+        The least recently used files are removed once the cache is larger
+        than max_bytes.
+
+        Args:
+            cache_dir (str, pathlib.Path, default=None): Directory to hold cached data.
+            If None the HUGS_CACHE_PATH environment variable is used, if that isn't
+            set ~/.cache/hugs/retrieve is used.
+            max_bytes (int, default=None): Maximum size of cached data in bytes,
+            if None a default of 2 GiB is used
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=None):
+        import os
+        from pathlib import Path
+
+        if cache_dir is None:
+            env_path = os.getenv("HUGS_CACHE_PATH")
+
+            if env_path:
+                cache_dir = env_path
+            else:
+                cache_dir = Path.home().joinpath(".cache", "hugs", "retrieve")
+
+        if max_bytes is None:
+            max_bytes = _default_max_bytes
+
+        if max_bytes < 0:
+            raise ValueError("max_bytes must not be negative")
+
+        self._cache_dir = Path(cache_dir)
+        self._cache_dir.mkdir(parents=True, exist_ok=True)
+        self._max_bytes = int(max_bytes)
+
+    @staticmethod
+    def cache_key(keys, variables=None, start_datetime=None, end_datetime=None, average=None, keep_missing=False):
+        """ Create the name of a cached Dataset from the object store keys
+            of the data it holds and the variables, times and averaging selected
+
+            Args:
+                keys (list): Object store keys
+                variables (list, default=None): Data variables selected
+                start_datetime (datetime, default=None): Start of selected times
+                end_datetime (datetime, default=None): End of selected times
+                average (str, default=None): Averaging period of data
+                keep_missing (bool, default=False): Periods without data were kept when averaging
+            Returns:
+                str: SHA1 hash of keys and selection
+        """
+        from hashlib import sha1
+        from HUGS.Util import timestamp_tzaware
+
+        parts = sorted(keys)
+
+        if variables is not None or start_datetime is not None or end_datetime is not None:
+            if variables is not None:
+                variables = ",".join(variables)
+            if start_datetime is not None:
+                start_datetime = timestamp_tzaware(start_datetime).value
+            if end_datetime is not None:
+                end_datetime = timestamp_tzaware(end_datetime).value
+
+            parts.append(f"selection:{variables}:{start_datetime}:{end_datetime}")
+
+        if average is not None:
+            parts.append(f"average:{average}:{bool(keep_missing)}")
+
+        return sha1("\n".join(parts).encode("utf-8")).hexdigest()
+
+    def _filepath(self, keys, **selection):
+        return self._cache_dir.joinpath(f"{RetrieveCache.cache_key(keys, **selection)}.nc")
+
+    def get(self, keys, variables=None, start_datetime=None, end_datetime=None, average=None, keep_missing=False):
+        """ Get the Dataset combined from the data at the passed object store keys
+
+            Args:
+                keys (list): Object store keys
+                variables (list, default=None): Data variables selected
+                start_datetime (datetime, default=None): Start of selected times
+                end_datetime (datetime, default=None): End of selected times
+                average (str, default=None): Averaging period of data
+                keep_missing (bool, default=False): Periods without data were kept when averaging
+            Returns:
+                xarray.Dataset or None: Dataset or None if not cached
+        """
+        import os
+        from xarray import load_dataset
+
+        filepath = self._filepath(keys, variables=variables, start_datetime=start_datetime,
+                                  end_datetime=end_datetime, average=average, keep_missing=keep_missing)
+
+        try:
+            dataset = load_dataset(filepath)
+        except (OSError, ValueError):
+            return None
+
+        # Record the use of this file for eviction
+        try:
+            os.utime(filepath)
+        except FileNotFoundError:
+            pass
+
+        return dataset
+
+    def set(self, keys, dataset, variables=None, start_datetime=None, end_datetime=None, average=None,
+            keep_missing=False):
+        """ Cache the Dataset combined from the data at the passed object store keys
+
+            Args:
+                keys (list): Object store keys
+                dataset (xarray.Dataset): Dataset
+                variables (list, default=None): Data variables selected
+                start_datetime (datetime, default=None): Start of selected times
+                end_datetime (datetime, default=None): End of selected times
+                average (str, default=None): Averaging period of data
+                keep_missing (bool, default=False): Periods without data were kept when averaging
+            Returns:
+                None
+        """
+        import os
+        from tempfile import mkstemp
+
+        if self._max_bytes == 0:
+            return
+
+        filepath = self._filepath(keys, variables=variables, start_datetime=start_datetime,
+                                  end_datetime=end_datetime, average=average, keep_missing=keep_missing)
+
+        fd, tmp_filepath = mkstemp(dir=self._cache_dir, prefix=".", suffix=".tmp")
+        os.close(fd)
+
+        try:
+            dataset.to_netcdf(tmp_filepath)
+            os.replace(tmp_filepath, filepath)
+        except BaseException:
+            try:
+                os.remove(tmp_filepath)
+            except FileNotFoundError:
+                pass
+            raise
+
+        self.evict()
+
+    def evict(self):
+        """ Remove the least recently used files until the cache is within its size limit
+
+            Returns:
+                None
+        """
+        files = []
+        for filepath in self._cache_dir.glob("*.nc"):
+            try:
+                stat = filepath.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, filepath))
+
+        total = sum(size for _, size, _ in files)
+
+        for _, size, filepath in sorted(files, key=lambda f: f[0]):
+            if total <= self._max_bytes:
+                break
+
+            try:
+                filepath.unlink()
+            except FileNotFoundError:
+                pass
+
+            total -= size
+
+    def size(self):
+        """ Returns the size of the cached data
+
+            Returns:
+                int: Number of bytes
+        """
+        return sum(f.stat().st_size for f in self._cache_dir.glob("*.nc"))
+
+    def clear(self):
+        """ Remove all cached data
+
+            Returns:
+                None
+        """
+        for filepath in self._cache_dir.glob("*.nc"):
+            try:
+                filepath.unlink()
+            except FileNotFoundError:
+                pass
@@ -1,10 +1,8 @@
 __all__ = ["Search"]
 
-import json
-import warnings
-import xarray
 from Acquire.Client import Wallet
-from Acquire.ObjectStore import string_to_datetime, datetime_to_string
+from Acquire.ObjectStore import datetime_to_string
+from HUGS.Util import chunks_to_dataset
 
 
 class Search:
@@ -69,27 +67,15 @@ class Search:
         # Select the keys we want to download
         download_keys = {key: self._results[key]["keys"] for key in selected_keys}
 
-        args = {"keys": download_keys, "return_type": "json"}
+        args = {"keys": download_keys, "return_type": "netcdf"}
         response = self._service.call_function(function="retrieve", args=args)
         result_data = response["results"]
 
-        # datasets = defaultdict(dict)
+        # Each Dataset is returned as base64 encoded chunks of a NetCDF file
         datasets = []
-        # TODO - find a better way of doing this, returning compressed binary data would be far better
         for key, dateranges in result_data.items():
             for daterange in dateranges:
-                serialised_data = json.loads(result_data[key][daterange])
-
-                # We need to convert the datetime string back to datetime objects here
-                datetime_data = serialised_data["coords"]["time"]["data"]
-                for i, _ in enumerate(datetime_data):
-                    datetime_data[i] = string_to_datetime(datetime_data[i])
-
-                # TODO - catch FutureWarnings here that may affect run when used within voila
-                with warnings.catch_warnings():
-                    warnings.simplefilter("ignore")
-                    # datasets[key][daterange] = xarray.Dataset.from_dict(serialised_data)
-                    datasets.append(xarray.Dataset.from_dict(serialised_data))
+                datasets.append(chunks_to_dataset(result_data[key][daterange]))
 
         return datasets
 
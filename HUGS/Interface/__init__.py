@@ -2,4 +2,5 @@ from ._credentials import Credentials
 from ._interface import *
 from ._parse import *
 from ._search import *
+from ._tasks import *
 from ._upload import *
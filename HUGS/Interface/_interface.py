@@ -7,6 +7,7 @@ import os
 import random
 import shutil
 import tempfile
+import threading
 from datetime import datetime
 from pathlib import Path
 
@@ -20,6 +21,8 @@ import pandas as pd
 from Acquire.Client import User
 
 from HUGS.Client import Process, Retrieve, Search
+from HUGS.Interface._tasks import RetrieveTasks
+from HUGS.Processing import downsample_timeseries, minmax_indices
 from HUGS.Util import load_hugs_json
 
 # flake8: noqa
@@ -72,6 +75,15 @@ class Interface:
         self._data = {}
 
         self._to_plot = {}
+        # Number of buckets data is downsampled to before plotting, about
+        # the width of the plot in pixels, see HUGS.Processing.downsample_timeseries
+        self._plot_buckets = 1000
+        # Retrieves the data of selected search results in the background
+        self._retrieve_tasks = None
+        self._retrieve = None
+        self._retrieve_lock = threading.Lock()
+        # Redraws the plot as data arrives, set by plotting_interface
+        self._refresh_plot = None
 
         # Styles - maybe these can be moved somewhere else?
         self.table_style = {"description_width": "initial"}
@@ -598,7 +610,7 @@ class Interface:
                 if arg_dict
                 if arg_dict[key].value is True
             }
-            self.retrieve_data(selected_results=selected_results)
+            self.retrieve_data_async(selected_results=selected_results)
 
         def select_all(a):
             vals = [c.value for c in checkbox_objects]
@@ -834,9 +846,13 @@ class Interface:
                         stroke_width=marker_size.value,
                     )
 
-                mark.x = to_plot[key].index
+                # Only plot the points needed to draw the data at the width of the plot
+                idx = minmax_indices(x=to_plot[key].index.values, y=to_plot[key].iloc[:, 0].values,
+                                     n_buckets=self._plot_buckets)
+
+                mark.x = to_plot[key].index[idx]
                 # TODO - can modify this to be able to add error bars etc
-                mark.y = to_plot[key].iloc[:, 0]
+                mark.y = to_plot[key].iloc[idx, 0]
 
                 marks.append(mark)
 
@@ -987,12 +1003,17 @@ class Interface:
         # 'co count', 'co stdev', 'co n_meas'
 
         def on_plot_clicked(a):
-            # Get the data for ticked checkboxes
+            # Get the data for ticked checkboxes, data that's still being retrieved is
+            # plotted when it arrives
             self._to_plot = {
-                key: data[key] for key in arg_dict if arg_dict[key].value is True
+                key: data[key]
+                for key in arg_dict
+                if arg_dict[key].value is True and key in data
             }
             plot_data(to_plot=self._to_plot)
 
+        self._refresh_plot = on_plot_clicked
+
         # Create a dropdown to select which part of the dataframe
         # to plot, count, stddev etc
 
@@ -1013,6 +1034,9 @@ class Interface:
         axes = [ax, ay]
 
         used_colours = []
+        # The plotted marks and the full resolution data they show, the data is downsampled
+        # to the selected dates when the date selection changes
+        plotted = []
 
         def plot_data(to_plot):
             """ 
@@ -1020,6 +1044,7 @@ class Interface:
             """
 
             marks = []
+            plotted.clear()
             for i, key in enumerate(to_plot):
                 data = to_plot[key]
 
@@ -1043,14 +1068,15 @@ class Interface:
                     display_legend=True,
                 )
 
-                mark.x = data.time
                 # TODO - can modify this to be able to add error bars etc
-
                 data_key = f"{species.lower()}"
                 if data_key not in data:
                     data_key = f"{species.lower()}_count"
 
-                mark.y = data[data_key]
+                # Only plot the points needed to draw the data at the width of the plot
+                mark.x, mark.y = downsample_timeseries(variable=data[data_key], n_buckets=self._plot_buckets)
+
+                plotted.append((mark, data[data_key]))
 
                 ay.label = f"{species} (nmol/mol)"
 
@@ -1107,6 +1133,16 @@ class Interface:
             x_scale.min = start
             x_scale.max = end
 
+            # Downsample the selected dates so zooming in shows more detail
+            for mark, variable in plotted:
+                x, y = downsample_timeseries(
+                    variable=variable, n_buckets=self._plot_buckets, start_date=start, end_date=end
+                )
+
+                with mark.hold_sync():
+                    mark.x = x
+                    mark.y = y
+
         centre_layout = widgets.Layout(
             display="flex", flex_flow="column", align_items="center", width="100%"
         )
@@ -1456,7 +1492,7 @@ class Interface:
                 for s in site_codes
                 if s.lower() in key
             }
-            self.retrieve_data(selected_results=to_download)
+            self.retrieve_data_async(selected_results=to_download)
 
         # Create a marker for each site we have results for, on the marker show the
         # species etc we have data for
@@ -1619,13 +1655,16 @@ class Interface:
                 for s in self._selected_sites
                 if s.lower() in key
             }
-            self._data = self.retrieve_data(selected_results=to_download)
+            # The plot is created straight away and each site is added as its data arrives
+            self._data = {}
             plotting_widgets = self.plotting_interface(
                 selected_results=to_download, data=self._data
             )
 
             fig_box.children = [plotting_widgets]
 
+            self.retrieve_data_async(selected_results=to_download)
+
         # Create a marker for each site we have results for, on the marker show the
         # species etc we have data for
         for site in site_locations:
@@ -1858,12 +1897,76 @@ class Interface:
 
     # Will this force an update ?
     def update_statusbar(self, status_name, text):
+        """ Update the text shown in a status bar
 
-        # if not isinstance(self._widgets[status_name], widgets.widget_string.HTML):
-        #     print(type(self._widgets[status_name]))
-        #     raise TypeError("This function can only be used to update status bars that are ipywidgets HTML objects")
-        return False
-        # self._widgets[status_name].value = f"Status: {text}"
+            Args:
+                status_name (str): Name of status bar widget
+                text (str): Status text, may contain HTML
+            Returns:
+                None
+        """
+        status_widget = self._widgets[status_name]
+
+        if isinstance(status_widget, widgets.HTML):
+            status_widget.value = f"Status: {text}"
+        else:
+            status_widget.children = [widgets.HTML(value=f"Status: {text}")]
+
+    def _retrieve_keys(self, keys):
+        """ Retrieve the data at the passed keys, this is called from the
+            threads of RetrieveTasks
+
+            Args:
+                keys (dict): Dictionary of object store keys
+            Returns:
+                dict: Dictionary of data
+        """
+        with self._retrieve_lock:
+            if self._retrieve is None:
+                self._retrieve = Retrieve(service_url=self._base_url)
+
+        return self._retrieve.retrieve(keys=keys)
+
+    def retrieve_data_async(self, selected_results):
+        """ Start downloading the data in the selected keys from the object store
+            without blocking the interface
+
+            Each search result's data is added to self._data and plotted as soon as it
+            arrives, progress is shown in the status bar. Any download still running
+            is cancelled.
+
+            Args:
+                selected_results (dict): Dictionary of search results
+            Returns:
+                asyncio.Task: Task that gives the dictionary of data when complete
+        """
+        if self._retrieve_tasks is None:
+            self._retrieve_tasks = RetrieveTasks(retrieve_fn=self._retrieve_keys)
+
+        def on_result(key, data):
+            self._data[key] = data
+
+            if self._refresh_plot is not None:
+                self._refresh_plot(a=None)
+
+        failed = []
+
+        def on_progress(n_done, n_total):
+            if n_done < n_total:
+                text = f"<font color='blue'>Retrieving {n_done} of {n_total}...</font>"
+            elif failed:
+                text = f"<font color='red'>Unable to retrieve {', '.join(failed)}</font>"
+            else:
+                text = f"<font color='green'>Retrieval complete</font>"
+
+            self.update_statusbar(status_name="status_bar", text=text)
+
+        def on_error(key, error):
+            failed.append(key)
+
+        return self._retrieve_tasks.start(
+            selected_results=selected_results, on_result=on_result, on_progress=on_progress, on_error=on_error
+        )
 
     def retrieve_data(self, selected_results):
         """ Download the data in the selected keys from the object store
@@ -1875,11 +1978,9 @@ class Interface:
             Returns:
                 dict: Dictionary of data
         """
-        # Create a Retrieve object to interact with the HUGS Cloud object store
-        retrieve = Retrieve(service_url=self._base_url)
         # Select the keys we want to download
         download_keys = {key: selected_results[key]["keys"] for key in selected_results}
-        data = retrieve.retrieve(keys=download_keys)
+        data = self._retrieve_keys(keys=download_keys)
 
         # TODO - get the status bar updates working
         # self.update_statusbar(status_name="download_status", text="Downloading...")
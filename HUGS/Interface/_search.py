@@ -194,7 +194,8 @@ def _parse_results(results):
     """
     date_keys = {}
     for key in results.keys():
-        keys = sorted(results[key])
+        # Sort by the daterange at the end of the key
+        keys = sorted(results[key], key=lambda k: k.split("/")[-1])
         start_key = keys[0]
         end_key = keys[-1]
         # Get the first and last dates from the keys in the search results
@@ -0,0 +1,171 @@
+""" Retrieve data for the interface without blocking it
+
+    The widgets of the interface are updated by callbacks run in the event loop
+    of the kernel. Each selected search result is retrieved in a separate thread
+    and passed to the interface as soon as it arrives so a slow site doesn't hold
+    up the others.
+
+"""
+__all__ = ["RetrieveTasks"]
+
+
+class RetrieveTasks:
+    """ Retrieves the data of several search results concurrently using asyncio
+
+        Args:
+            retrieve_fn (callable): Function that takes a dictionary of object store keys, as
+            passed to HUGS.Client.Retrieve.retrieve, and returns the retrieved data
+            max_workers (int, default=4): Maximum number of search results retrieved at once
+    """
+
+    def __init__(self, retrieve_fn, max_workers=4):
+        from concurrent.futures import ThreadPoolExecutor
+
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+
+        self._retrieve_fn = retrieve_fn
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._task = None
+        # Incremented by cancel, jobs from an earlier generation aren't started
+        self._generation = 0
+
+    @staticmethod
+    def combine_dateranges(dateranges):
+        """ Combine the Datasets retrieved for each daterange of a search result
+
+            Args:
+                dateranges (dict, xarray.Dataset): Dictionary of Datasets keyed by daterange or a Dataset
+            Returns:
+                xarray.Dataset: Combined Dataset
+        """
+        from xarray import Dataset, concat as xr_concat
+
+        if isinstance(dateranges, Dataset):
+            return dateranges
+
+        datasets = [dateranges[d] for d in sorted(dateranges)]
+
+        if len(datasets) == 1:
+            return datasets[0]
+
+        combined = xr_concat(datasets, dim="time")
+
+        if not combined.indexes["time"].is_monotonic_increasing:
+            combined = combined.sortby("time")
+
+        return combined
+
+    async def retrieve(self, selected_results, on_result=None, on_progress=None, on_error=None):
+        """ Retrieve the data of the selected search results
+
+            The callbacks are called in the event loop so can update widgets.
+
+            Args:
+                selected_results (dict): Dictionary of search results
+                on_result (callable, default=None): Called with the key of a search result
+                and its Dataset when it's been retrieved
+                on_progress (callable, default=None): Called with the number of search results
+                retrieved and the total number each time one completes
+                on_error (callable, default=None): Called with the key of a search result
+                and the exception raised if it couldn't be retrieved
+            Returns:
+                dict: Dictionary of Datasets keyed by search result
+        """
+        import asyncio
+        from functools import partial
+
+        loop = asyncio.get_running_loop()
+        generation = self._generation
+
+        def run_retrieve(keys):
+            # Skip jobs still queued for the worker threads when the retrieval was cancelled
+            if self._generation != generation:
+                return {}
+
+            return self._retrieve_fn(keys=keys)
+
+        async def retrieve_key(key):
+            keys = {key: selected_results[key]["keys"]}
+            try:
+                data = await loop.run_in_executor(self._executor, partial(run_retrieve, keys=keys))
+            except Exception as e:
+                return key, None, e
+
+            return key, data, None
+
+        tasks = [asyncio.ensure_future(retrieve_key(key)) for key in selected_results]
+        n_total = len(tasks)
+
+        if on_progress is not None:
+            on_progress(0, n_total)
+
+        results = {}
+        try:
+            for n_done, next_result in enumerate(asyncio.as_completed(tasks), start=1):
+                key, data, error = await next_result
+
+                if error is not None:
+                    if on_error is None:
+                        raise error
+                    on_error(key, error)
+                elif key in data:
+                    results[key] = RetrieveTasks.combine_dateranges(data[key])
+
+                    if on_result is not None:
+                        on_result(key, results[key])
+
+                if on_progress is not None:
+                    on_progress(n_done, n_total)
+        finally:
+            # Stop waiting on the other search results if we've been cancelled or failed
+            for task in tasks:
+                task.cancel()
+
+        return results
+
+    def start(self, selected_results, on_result=None, on_progress=None, on_error=None):
+        """ Start retrieving the data of the selected search results and return immediately
+
+            Any retrieval still running is cancelled, see cancel. See retrieve for the arguments.
+
+            Returns:
+                asyncio.Task: Task that gives the dictionary of Datasets when complete
+        """
+        import asyncio
+
+        self.cancel()
+
+        self._task = asyncio.ensure_future(
+            self.retrieve(
+                selected_results=selected_results, on_result=on_result, on_progress=on_progress, on_error=on_error
+            )
+        )
+
+        return self._task
+
+    def cancel(self):
+        """ Cancel the running retrieval
+
+            Search results waiting for a worker thread are skipped. Downloads that have
+            already started can't be interrupted, they keep their worker thread until
+            they finish and their data is then discarded.
+
+            Returns:
+                None
+        """
+        self._generation += 1
+
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+
+        self._task = None
+
+    def shutdown(self):
+        """ Cancel the running retrieval and stop the worker threads
+
+            Returns:
+                None
+        """
+        self.cancel()
+        self._executor.shutdown(wait=False)
@@ -80,9 +80,7 @@ def get_single_site(
         Returns:
             list: List of xarray.Datasets
     """
-    from pandas import Timestamp, Timedelta
-    import numpy as np
-    from xarray import concat as xr_concat
+    from pandas import Timestamp
     from HUGS.LocalClient import Search
     from HUGS.Util import load_hugs_json
 
@@ -112,73 +110,16 @@ def get_single_site(
         end_datetime=end_date,
     )
 
-    # Retrieve all the data found
+    # Retrieve all the data found, averaging is done as the data is retrieved
     selected_keys = [k for k in results]
-    retrieved_data = search.retrieve(selected_keys=selected_keys)
+    retrieved_data = search.retrieve(selected_keys=selected_keys, average=average, keep_missing=keep_missing)
 
     obs_files = []
 
     for key, dateranges in retrieved_data.items():
         for d in dateranges:
-            split_dates = d.split("_")
-
-            start_date = Timestamp(split_dates[0])
-            end_date = Timestamp(split_dates[1])
-
             data = dateranges[d]
 
-            if average is not None:
-                if keep_missing is True:
-
-                    # Create a dataset with one element and NaNs to prepend or append
-                    ds_single_element = data[{"time": 0}]
-
-                    for v in ds_single_element.variables:
-                        if v != "time":
-                            ds_single_element[v].values = np.nan
-
-                    ds_concat = []
-                    # Pad with an empty entry at the start date
-                    if min(data.time) > Timestamp(start_date):
-                        ds_single_element_start = ds_single_element.copy()
-                        ds_single_element_start.time.values = Timestamp(start_date)
-                        ds_concat.append(ds_single_element_start)
-
-                    ds_concat.append(data)
-
-                    # Pad with an empty entry at the end date
-                    if max(data.time) < Timestamp(end_date):
-                        ds_single_element_end = ds_single_element.copy()
-                        ds_single_element_end.time.values = Timestamp(end_date) - Timedelta("1ns")
-                        ds_concat.append(ds_single_element_end)
-
-                    data = xr_concat(ds_concat, dim="time")
-
-                    # Now sort to get everything in the right order
-                    data = data.sortby("time")
-
-                # First do a mean resample on all variables
-                ds_resampled = data.resample(time=average, keep_attrs=True).mean(skipna=False)
-                # keep_attrs doesn't seem to work for some reason, so manually copy
-                ds_resampled.attrs = data.attrs.copy()
-
-                # For some variables, need a different type of resampling
-                for var in data.variables:
-                    if "repeatability" in var:
-                        ds_resampled[var] = (np.sqrt((data[var] ** 2).resample(time=average).sum()) / data[var].resample(time=average).count())
-
-                    elif "variability" in var:
-                        # Calculate std of 1 min mf obs in av period as new vmf
-                        ds_resampled[var] = (data[var].resample(time=average, keep_attrs=True).std(skipna=False))
-
-                    # Copy over some attributes
-                    if "long_name" in data[var].attrs:
-                        ds_resampled[var].attrs["long_name"] = data[var].attrs["long_name"]
-                    if "units" in data[var].attrs:
-                        ds_resampled[var].attrs["units"] = data[var].attrs["units"]
-
-                data = ds_resampled.copy()
-
             # Rename variables
             rename = {}
 
@@ -1,5 +1,5 @@
 import copy
-from HUGS.Modules import Datasource, ObsSurface
+from HUGS.Modules import Datasource, MetadataIndex, ObsSurface
 from HUGS.Util import valid_site
 
 __all__ = ["RankSources"]
@@ -22,9 +22,12 @@ class RankSources:
             raise ValueError(f"{site} is not a valid site code")
 
         obs = ObsSurface.load()
-        datasource_uuids = obs.datasources()
+        obs_uuids = set(obs.datasources())
 
-        # Shallow load the Datasources (only get their JSON metadata)
+        # Use the metadata index to find the Datasources that may match so we only
+        # have to shallow load those (only get their JSON metadata)
+        index = MetadataIndex.load()
+        datasource_uuids = [uuid for uuid in index.search_values([site, species]) if uuid in obs_uuids]
         datasources = [Datasource.load(uuid=uuid, shallow=True) for uuid in datasource_uuids]
 
         matching_sources = [d for d in datasources if d.search_metadata(search_terms=[site, species], find_all=True)]
@@ -2,8 +2,9 @@ from HUGS.Processing import search as search_fn
 
 __all__ = ["Search"]
 
-from HUGS.Processing import recombine_sections
+from HUGS.Processing import recombine_resampled, recombine_sections
 from collections import defaultdict
+from pandas import Timestamp
 
 
 class Search:
@@ -44,21 +45,39 @@ class Search:
         )
 
         self._results = results
+        # Used to only read the data covering the searched dates
+        self._start_datetime = start_datetime
+        self._end_datetime = end_datetime
 
         return results
 
-    def retrieve(self, selected_keys):
+    def retrieve(self, selected_keys, variables=None, start_datetime=None, end_datetime=None, average=None,
+                 keep_missing=False):
         """ Downloads the selected keys and returns a dictionary of
             xarray Datasets
 
+            Only data within the start and end datetimes is returned, if these
+            aren't passed those passed to search are used.
+
             Args:
                 keys (str, list): Key(s) from search results to download
+                variables (list, default=None): Data variables to download, if None
+                all variables are downloaded
+                start_datetime (datetime, default=None): Download data from this time
+                end_datetime (datetime, default=None): Download data up to and including this time
+                average (str, default=None): Averaging period such as 2H, see HUGS.Processing.recombine_resampled
+                keep_missing (bool, default=False): Keep averaging periods without data
             Returns:
                 defaultdict(dict): Dictionary of Datasets
         """
         if not isinstance(selected_keys, list):
             selected_keys = [selected_keys]
 
+        if start_datetime is None:
+            start_datetime = self._start_datetime
+        if end_datetime is None:
+            end_datetime = self._end_datetime
+
         # Select the keys we want to download
         key_dict = {key: self._results[key]["keys"] for key in selected_keys}
 
@@ -68,7 +87,16 @@ class Search:
                 # Create a key for this range
                 data_keys = key_dict[key][daterange]
                 # Retrieve the data from the object store and combine into a NetCDF
-                recombined_data = recombine_sections(data_keys)
+                if average is not None:
+                    # Averaged data is read from the rollups of the data where possible
+                    start_date, end_date = (Timestamp(d) for d in daterange.split("_"))
+                    recombined_data = recombine_resampled(data_keys=data_keys, average=average,
+                                                          keep_missing=keep_missing, variables=variables,
+                                                          start_date=start_datetime, end_date=end_datetime,
+                                                          daterange_start=start_date, daterange_end=end_date)
+                else:
+                    recombined_data = recombine_sections(data_keys=data_keys, variables=variables,
+                                                         start_date=start_datetime, end_date=end_datetime)
 
                 results[key][daterange] = recombined_data
 
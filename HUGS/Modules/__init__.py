@@ -10,6 +10,9 @@ from ._eurocom import EUROCOM
 from ._footprint import Footprint
 from ._gcwerks import GCWERKS
 from ._icos import ICOS
+from ._lazy_segments import LazySegments
+from ._metadata_index import MetadataIndex
 from ._noaa import NOAA
 from ._thamesbarrier import THAMESBARRIER
 from ._obs_surface import ObsSurface
+from ._segment_cache import SegmentCache, get_segment_cache
@@ -58,8 +58,8 @@ class CRDS():
             Returns:
                 dict: Dictionary containing metadata, data and attributes keys
         """
-        from datetime import datetime
-        from pandas import RangeIndex, read_csv, NaT
+        from pandas import RangeIndex, read_csv
+        from HUGS.Util import set_datetime_index
 
         # At the moment we're using the filename as the source name
         source_name = data_filepath.stem
@@ -70,24 +70,17 @@ class CRDS():
         if "m" not in inlet.lower():
             raise ValueError("No inlet found, we expect filenames such as: bsd.picarro.1minute.108m.dat")
 
-        # Function to parse the datetime format found in the datafile
-        def parse_date(date):
-            try:
-                return datetime.strptime(date, "%y%m%d %H%M%S")
-            except ValueError:
-                return NaT
-
+        # Read the date and time columns as strings to keep their leading zeros
         data = read_csv(
             data_filepath,
             header=None,
             skiprows=1,
             sep=r"\s+",
-            index_col=["0_1"],
-            parse_dates=[[0, 1]],
-            date_parser=parse_date,
+            dtype={0: str, 1: str},
         )
 
-        data.index.name = "time"
+        # Any datetimes that can't be parsed are set as NaT
+        data = set_datetime_index(data=data, columns=[0, 1], format="%y%m%d %H%M%S", name="time", errors="coerce")
 
         # Drop any rows with NaNs
         # This is now done before creating metadata
@@ -1,5 +1,12 @@
 __all___ = ["Datasource"]
 
+# The netCDF4 / HDF5 libraries aren't thread safe. Each conversion of a Dataset to or
+# from NetCDF holds xarray's HDF5_LOCK, the lock xarray takes for its own HDF5 calls such
+# as to_netcdf and load_dataset, so only one thread in the process uses HDF5 at a time.
+# This means reads of local NetCDF files are serialised, reading segments concurrently
+# only overlaps the reads of objects that aren't local files. The xarray stores we create
+# are given no lock of their own as HDF5_LOCK is already held and isn't reentrant.
+
 
 class Datasource:
     """ A Datasource holds data relating to a single source, such as a specific species
@@ -12,17 +19,23 @@ class Datasource:
     _datasource_root = "datasource"
     _datavalues_root = "values"
     _data_root = "data"
+    # Formats data can be stored in, see set_storage_format
+    _storage_formats = ["netcdf", "chunked"]
+    # Default maximum size of the stored data segments kept in memory, see LazySegments
+    _segment_max_bytes = 256 * 1024 * 1024
 
     def __init__(self, name=None):
         from Acquire.ObjectStore import create_uuid, get_datetime_now
         from collections import defaultdict
+        from HUGS.Modules import LazySegments
 
         self._uuid = create_uuid()
         self._name = name
         self._creation_datetime = get_datetime_now()
         self._metadata = {}
-        # Dictionary keyed by daterange of data in each Dataset
-        self._data = {}
+        # Dictionary keyed by daterange of data in each Dataset, stored
+        # Datasets are only read from the object store when accessed
+        self._data = LazySegments(max_bytes=Datasource._segment_max_bytes)
 
         self._start_datetime = None
         self._end_datetime = None
@@ -30,6 +43,10 @@ class Datasource:
         self._stored = False
         # This dictionary stored the keys for each version of data uploaded
         self._data_keys = defaultdict(dict)
+        # The keys of versions before the latest are stored separately and only
+        # read from the object store when needed, see _load_history
+        self._history_loaded = True
+        self._bucket = None
         self._data_type = None
         # Hold information regarding the versions of the data
         # Currently unused
@@ -37,6 +54,14 @@ class Datasource:
         self._versions = {}
         # A rank of -1 is unset, 1 is a primary source, 2 secondary
         self._rank = defaultdict(list)
+        # Sorted start and end times of the latest data segments, used by in_daterange
+        self._date_index = {}
+        # Set when the latest data keys may have changed since the index was created
+        self._date_index_stale = True
+        # Which versions of data to keep when the Datasource is saved, see set_retention
+        self._retention = {}
+        # Format used to store data segments in the object store
+        self._storage_format = "netcdf"
 
     def start_datetime(self):
         """ Returns the starting datetime for the data in this Datasource
@@ -138,6 +163,7 @@ class Datasource:
                 overwrite (bool, default=False): Overwrite existing data
                 None
         """
+        from HUGS.Modules import LazySegments
         from HUGS.Util import date_overlap
 
         data_types = ["footprint", "timeseries"]
@@ -190,24 +216,24 @@ class Datasource:
                     daterange_str = self.get_dataset_daterange_str(dataset=month)
                     additional_data[daterange_str] = month
 
-        if self._data:
-            # We don't want the same data twice, this will be stored in previous versions
-            # Check for overlap between exisiting and new dateranges
-            to_keep = []
-            for current_daterange in self._data:
-                for new_daterange in additional_data:
-                    if not date_overlap(daterange_a=current_daterange, daterange_b=new_daterange):
-                        to_keep.append(current_daterange)
-
-            updated_data = {}
-            for k in to_keep:
-                updated_data[k] = self._data[k]
-            # Add in the additional new data
-            updated_data.update(additional_data)
-
-            self._data = updated_data
-        else:
-            self._data = additional_data
+        if self._data is None:
+            self._data = LazySegments(max_bytes=Datasource._segment_max_bytes)
+
+        # The keys of the latest data change when the new data is saved
+        self._date_index_stale = True
+
+        # We don't want the same data twice, this will be stored in previous versions
+        # Only keep the exisiting data that doesn't overlap any of the new data
+        for current_daterange in list(self._data):
+            overlap = any(date_overlap(daterange_a=current_daterange, daterange_b=new_daterange)
+                          for new_daterange in additional_data)
+            if overlap:
+                del self._data[current_daterange]
+
+        # Add in the additional new data, only this data needs to be
+        # written to the object store on save
+        for daterange, dataset in additional_data.items():
+            self._data[daterange] = dataset
 
         if data_type == "timeseries":
             self._data_type = data_type
@@ -309,13 +335,73 @@ class Datasource:
         data["creation_datetime"] = datetime_to_string(self._creation_datetime)
         data["metadata"] = self._metadata
         data["stored"] = self._stored
-        data["data_keys"] = self._data_keys
+        # Only the keys of the latest version are stored with the Datasource, the keys
+        # of all versions are stored separately, see history_to_data
+        data["data_keys"] = {"latest": self._data_keys["latest"]} if "latest" in self._data_keys else {}
         data["data_type"] = self._data_type
         data["latest_version"] = self._latest_version
         data["rank"] = self._rank
+        data["date_index"] = self._date_index
+        data["storage_format"] = self._storage_format
+        data["retention"] = self._retention
 
         return data
 
+    def history_to_data(self):
+        """ Return a JSON-serialisable dictionary of the keys of each
+            version of data stored by this Datasource
+
+            Returns:
+                dict: Dictionary of keys keyed by version
+        """
+        self._load_history()
+
+        return {version: keys for version, keys in self._data_keys.items() if version != "latest"}
+
+    @staticmethod
+    def history_key(uuid):
+        """ Returns the object store key of the version history of a Datasource
+
+            Args:
+                uuid (str): UUID of Datasource
+            Returns:
+                str: Key of version history
+        """
+        return f"{Datasource._datasource_root}/history/{uuid}"
+
+    def _load_history(self):
+        """ Read the keys of previous versions of data from the object store
+            if they haven't already been read
+
+            Returns:
+                None
+        """
+        from HUGS.ObjectStore import exists, get_bucket, get_object_from_json
+
+        if self._history_loaded:
+            return
+
+        bucket = self._bucket if self._bucket is not None else get_bucket()
+        key = Datasource.history_key(self._uuid)
+
+        if exists(bucket=bucket, key=key):
+            for version, keys in get_object_from_json(bucket=bucket, key=key).items():
+                self._data_keys.setdefault(version, keys)
+
+        self._history_loaded = True
+
+    def _save_history(self, bucket):
+        """ Write the keys of each version of data to the object store
+
+            Args:
+                bucket (dict): Bucket to hold data
+            Returns:
+                None
+        """
+        from HUGS.ObjectStore import set_object_from_json
+
+        set_object_from_json(bucket=bucket, key=Datasource.history_key(self._uuid), data=self.history_to_data())
+
     @staticmethod
     def load_dataframe(bucket, key):
         """ Loads data from the object store for creation of a Datasource object
@@ -333,65 +419,261 @@ class Datasource:
         return Datasource.hdf_to_dataframe(data)
 
     @staticmethod
-    def load_dataset(bucket, key):
+    def load_dataset(bucket, key, variables=None, start_date=None, end_date=None):
         """ Loads a xarray Dataset from the passed key for creation of a Datasource object
 
-            Currently this function gets binary data back from the object store, writes it
-            to a temporary file and then gets xarray to read from this file.
-
-            This is done in a long winded way due to xarray not being able to create a Dataset
-            from binary data at the moment.
+            If the object store holds the data in a local file the NetCDF file is read
+            directly and only the requested variables and times are read into memory.
+            Otherwise NetCDF data is read from memory, see netcdf_to_dataset. For data stored
+            in the chunked format only the chunks holding the requested variables and times are read.
 
             Args:
                 bucket (dict): Bucket containing data
                 key (str): Key for data
+                variables (list, default=None): Data variables to load, if None all are loaded
+                start_date (datetime, default=None): Load data from this time
+                end_date (datetime, default=None): Load data up to and including this time
             Returns:
                 xarray.Dataset: Dataset from NetCDF file
         """
-        from HUGS.ObjectStore import get_object
-        from xarray import load_dataset
-        import tempfile
-        from pathlib import Path
+        return Datasource.load_datasets(bucket=bucket, keys=[key], variables=variables,
+                                        start_date=start_date, end_date=end_date)[0]
 
-        data = get_object(bucket, key)
+    @staticmethod
+    def load_datasets(bucket, keys, variables=None, start_date=None, end_date=None, max_workers=None,
+                      use_cache=True):
+        """ Loads the xarray Datasets at the passed keys. Data not held in local files
+            is read from the object store in a single request, see load_dataset.
+
+            Datasets are read through the segment cache shared by this process so
+            data read recently isn't decoded again, see SegmentCache. When use_cache
+            is True the arrays of the returned Datasets are read-only.
+
+            Args:
+                bucket (dict): Bucket containing data
+                keys (list): Keys for data
+                variables (list, default=None): Data variables to load, if None all are loaded
+                start_date (datetime, default=None): Load data from this time
+                end_date (datetime, default=None): Load data up to and including this time
+                max_workers (int, default=None): Maximum number of objects to read at once
+                use_cache (bool, default=True): Read and store Datasets in the segment cache
+            Returns:
+                list: List of xarray.Dataset in the order of keys
+        """
+        from json import loads
+        from HUGS.ObjectStore import get_objects, get_object_path
+        from HUGS.Processing import is_chunked_manifest, read_chunked_dataset
+        from HUGS.Modules import get_segment_cache
+
+        cache = get_segment_cache()
+
+        datasets = {}
+        cache_keys = {}
+        for key in keys:
+            if use_cache and key not in cache_keys:
+                cache_keys[key] = cache.cache_key(bucket=bucket, key=key, variables=variables,
+                                                  start_date=start_date, end_date=end_date)
+                cached = cache.get(cache_keys[key])
+
+                if cached is not None:
+                    datasets[key] = cached
+
+        to_read = [key for key in dict.fromkeys(keys) if key not in datasets]
+
+        filepaths = {}
+        for key in to_read:
+            filepath = get_object_path(bucket, key)
+
+            if filepath is not None:
+                with open(filepath, "rb") as f:
+                    header = f.read(64)
+
+                if not is_chunked_manifest(header):
+                    filepaths[key] = filepath
+
+        objects = get_objects(bucket=bucket, keys=[k for k in to_read if k not in filepaths], max_workers=max_workers)
+
+        for key in to_read:
+            if key in filepaths:
+                ds = Datasource.netcdf_file_to_dataset(filepath=filepaths[key], variables=variables,
+                                                       start_date=start_date, end_date=end_date)
+            elif is_chunked_manifest(objects[key]):
+                manifest = loads(objects[key])
+                ds = read_chunked_dataset(bucket=bucket, manifest=manifest, variables=variables,
+                                          start_date=start_date, end_date=end_date, max_workers=max_workers)
+            else:
+                ds = Datasource.netcdf_to_dataset(objects[key])
+                ds = Datasource._select_data(ds, variables=variables, start_date=start_date, end_date=end_date)
 
-        # TODO - is there a cleaner way of doing this?
-        with tempfile.TemporaryDirectory() as tmpdir:
-            tmp_path = Path(tmpdir).joinpath("tmp.nc")
+            if use_cache:
+                cache.set(cache_keys[key], ds)
 
-            with open(tmp_path, "wb") as f:
-                f.write(data)
+            datasets[key] = ds
 
-            ds = load_dataset(tmp_path)
+        return [datasets[key] for key in keys]
 
-            return ds
+    @staticmethod
+    def _select_data(ds, variables=None, start_date=None, end_date=None):
+        """ Select variables and times from the passed Dataset
 
-    # These functions don't work, placeholders for when it's possible to get
-    # an in memory NetCDF4 file
-    # def dataset_to_netcdf(data):
-    #     """ Write the passed dataset to a compressed in-memory NetCDF file
-    #     """
-    #     import netCDF4
-    #     import xarray
+            Args:
+                ds (xarray.Dataset): Dataset
+                variables (list, default=None): Data variables to select, if None all are selected
+                start_date (datetime, default=None): Select data from this time
+                end_date (datetime, default=None): Select data up to and including this time
+            Returns:
+                xarray.Dataset: Selected data
+        """
+        from HUGS.Util import timestamp_tzaware
+
+        if variables is not None:
+            if not isinstance(variables, list):
+                variables = [variables]
+            ds = ds[[v for v in variables if v in ds.data_vars]]
+
+        if start_date is not None or end_date is not None:
+            # The time coordinate of stored data is timezone naive UTC
+            if start_date is not None:
+                start_date = timestamp_tzaware(start_date).tz_localize(None)
+            if end_date is not None:
+                end_date = timestamp_tzaware(end_date).tz_localize(None)
+
+            ds = ds.sel(time=slice(start_date, end_date))
+
+        return ds
+
+    @staticmethod
+    def delete_dataset(bucket, key):
+        """ Delete the data stored at key. This also removes the chunks of data
+            stored in the chunked format and the rollups of the data.
+
+            Args:
+                bucket (dict): Bucket containing data
+                key (str): Key for data
+            Returns:
+                None
+        """
+        from HUGS.ObjectStore import delete_object, get_object_names
+        from HUGS.Modules import get_segment_cache
+
+        segment_cache = get_segment_cache()
+
+        for chunk_key in get_object_names(bucket=bucket, prefix=f"{key}/"):
+            delete_object(bucket=bucket, key=chunk_key)
+            segment_cache.invalidate(bucket=bucket, key=chunk_key)
+
+        delete_object(bucket=bucket, key=key)
+
+        segment_cache.invalidate(bucket=bucket, key=key)
+
+    @staticmethod
+    def hash_dataset(dataset):
+        """ Calculate the SHA1 hash of the contents of a Dataset. This is used
+            as the key of the stored data so identical data is only stored once.
+
+            Args:
+                dataset (xarray.Dataset): Dataset
+            Returns:
+                str: SHA1 hash
+        """
+        import hashlib
+        import json
+        import numpy as np
+
+        sha1 = hashlib.sha1()
+        sha1.update(json.dumps(dataset.attrs, sort_keys=True, default=str).encode())
+
+        for name in sorted(dataset.variables, key=str):
+            variable = dataset.variables[name]
+            description = [str(name), name in dataset.coords, list(variable.dims), variable.dtype.str,
+                           list(variable.shape), variable.attrs]
+            sha1.update(json.dumps(description, sort_keys=True, default=str).encode())
+
+            values = variable.values
+            if values.dtype.kind == "O":
+                sha1.update("\0".join(str(v) for v in values.ravel()).encode())
+            else:
+                sha1.update(np.ascontiguousarray(values).tobytes())
+
+        return sha1.hexdigest()
+
+    @staticmethod
+    def dataset_to_netcdf(data):
+        """ Writes the passed Dataset to an in-memory NetCDF4 file
+
+            This function is partnered with netcdf_to_dataset()
+            which reads a Dataset from the in-memory NetCDF4 bytes object
+
+            Args:
+                data (xarray.Dataset): Dataset
+            Returns:
+                bytes: NetCDF4 file as bytes object
+        """
+        import netCDF4
+        from xarray.backends import NetCDF4DataStore
+        from xarray.backends.locks import HDF5_LOCK
+
+        with HDF5_LOCK:
+            # The memory argument gives the initial size of the buffer, this grows as required
+            nc4_ds = netCDF4.Dataset("in_memory.nc", mode="w", memory=1024)
+
+            try:
+                data.dump_to_store(NetCDF4DataStore(nc4_ds, lock=False))
+            except Exception:
+                nc4_ds.close()
+                raise
+
+            return nc4_ds.close().tobytes()
+
+    @staticmethod
+    def netcdf_to_dataset(data):
+        """ Reads a Dataset from the passed NetCDF4 bytes object buffer
+
+            This function is partnered with dataset_to_netcdf()
+            which writes a Dataset to an in-memory NetCDF4 file
+
+            Args:
+                data (bytes): Bytes object containing NetCDF4 file
+            Returns:
+                xarray.Dataset: Dataset read from NetCDF4 file buffer
+        """
+        import netCDF4
+        from xarray import open_dataset
+        from xarray.backends import NetCDF4DataStore
+        from xarray.backends.locks import HDF5_LOCK
+
+        with HDF5_LOCK:
+            nc4_ds = netCDF4.Dataset("in_memory.nc", mode="r", memory=data)
+
+            with open_dataset(NetCDF4DataStore(nc4_ds, lock=False)) as ds:
+                return ds.load()
+
+    @staticmethod
+    def netcdf_file_to_dataset(filepath, variables=None, start_date=None, end_date=None):
+        """ Reads a Dataset from the NetCDF4 file at filepath. Only the requested
+            variables and times are read from the file.
 
-    #     store = xarray.backends.NetCDF4DataStore(data)
-    #     nc4_ds = netCDF4.Dataset(store)
-    #     nc_buf = nc4_ds.close()
+            The file is read while holding the HDF5 lock so files are read one at a time.
 
-    # def netcdf_to_dataset(data):
-    #     """ Converts the binary data in data to xarray.Dataset
+            Args:
+                filepath (str): Path to NetCDF4 file
+                variables (list, default=None): Data variables to read, if None all are read
+                start_date (datetime, default=None): Read data from this time
+                end_date (datetime, default=None): Read data up to and including this time
+            Returns:
+                xarray.Dataset: Dataset read from NetCDF4 file
+        """
+        import netCDF4
+        from xarray import open_dataset
+        from xarray.backends import NetCDF4DataStore
+        from xarray.backends.locks import HDF5_LOCK
 
-    #         Args:
-    #             data: Binary data
-    #         Returns:
-    #             xarray.Dataset: Dataset created from data
-    #     """
-    #     import netCDF4c
-    #     import xarray
+        with HDF5_LOCK:
+            nc4_ds = netCDF4.Dataset(filepath, mode="r")
 
-    #     nc4_ds = netCDF4.Dataset("in_memory.nc", memory=data)
-    #     store = xarray.backends.NetCDF4DataStore(nc4_ds)
-    #     return xarray.open_dataset(store)
+            with open_dataset(NetCDF4DataStore(nc4_ds, lock=False)) as ds:
+                ds = Datasource._select_data(ds, variables=variables, start_date=start_date, end_date=end_date)
+                return ds.load()
 
     # Modified from
     # https://github.com/pandas-dev/pandas/issues/9246
@@ -445,18 +727,22 @@ class Datasource:
             return read_hdf(data)
 
     @staticmethod
-    def from_data(bucket, data, shallow):
+    def from_data(bucket, data, shallow, max_bytes=None):
         """ Construct from a JSON-deserialised dictionary
 
             Args:
                 bucket (dict): Bucket containing data
                 data (dict): JSON data
                 shallow (bool): Load only the JSON data, do not retrieve data from the object store
+                max_bytes (int, default=None): Maximum size of the stored data segments kept in memory,
+                the least recently used are released and read again when next accessed. If None
+                a default of 256 MiB is used, see LazySegments
             Returns:
                 Datasource: Datasource created from JSON
         """
         from Acquire.ObjectStore import string_to_datetime
         from collections import defaultdict
+        from HUGS.Modules import LazySegments
 
         d = Datasource()
         d._uuid = data["UUID"]
@@ -464,61 +750,116 @@ class Datasource:
         d._creation_datetime = string_to_datetime(data["creation_datetime"])
         d._metadata = data["metadata"]
         d._stored = data["stored"]
-        d._data_keys = data["data_keys"]
-        d._data = {}
+        d._data_keys = defaultdict(dict, data["data_keys"])
+        # Records saved before the version history was stored separately hold the keys
+        # of every version, otherwise only the latest keys are held and the rest are
+        # read when needed
+        d._history_loaded = any(version != "latest" for version in d._data_keys)
+        d._bucket = bucket
         d._data_type = data["data_type"]
         d._latest_version = data["latest_version"]
         d._rank = defaultdict(list, data["rank"])
+        # Older records may not have a date index, it will be created when first needed
+        d._date_index = data.get("date_index", {})
+        latest_keys = d._data_keys.get("latest", {}).get("keys", {})
+        d._date_index_stale = latest_keys.keys() != set(d._date_index.get("daterange", []))
+        d._storage_format = data.get("storage_format", "netcdf")
+        d._retention = data.get("retention", {})
+
+        # The Datasets are read from the object store when they're first accessed
+        if max_bytes is None:
+            max_bytes = Datasource._segment_max_bytes
 
         if d._stored and not shallow:
-            for date_key in d._data_keys["latest"]["keys"]:
-                data_key = d._data_keys["latest"]["keys"][date_key]
-                d._data[date_key] = Datasource.load_dataset(bucket=bucket, key=data_key)
+            d._data = LazySegments(bucket=bucket, keys=d._data_keys["latest"]["keys"], max_bytes=max_bytes)
+        else:
+            d._data = LazySegments(bucket=bucket, max_bytes=max_bytes)
 
         d._stored = False
 
         return d
 
-    def save(self, bucket=None):
+    def save(self, bucket=None, update_index=True):
         """ Save this Datasource object as JSON to the object store
 
+            Only data added since the Datasource was loaded or last saved is written
+            to the object store. The keys of unchanged data are carried over from the
+            previous version so each save costs time proportional to the new data.
+            Rollups of new timeseries data are stored alongside it, see HUGS.Processing.create_rollup.
+
+            Data is stored at a key given by the hash of its contents, see hash_dataset.
+            Versions hold references to these keys so data that is the same in
+            several versions is only stored once.
+
             Args:
                 bucket (str, default=None): Bucket to hold data
+                update_index (bool, default=True): Add this Datasource to the MetadataIndex. When
+                saving many Datasources pass False and add them to the index together using
+                MetadataIndex.update
             Returns:
                 None
         """
-        import tempfile
         from copy import deepcopy
 
         from Acquire.ObjectStore import get_datetime_now_to_string
-        from HUGS.ObjectStore import get_bucket, set_object_from_file, set_object_from_json
+        from HUGS.ObjectStore import exists, get_bucket, set_objects, set_object_from_json
+        from HUGS.Modules import MetadataIndex
+        from HUGS.Processing import create_rollup, rollup_key, rollup_levels, write_chunked_dataset
 
         if bucket is None:
             bucket = get_bucket()
 
         if self._data:
+            # We're adding a version so need the keys of the previous versions
+            self._load_history()
+
             # Ensure we have the latest key
             if "latest" not in self._data_keys:
                 self._data_keys["latest"] = {}
 
-            # Backup the old data keys at "latest"
-            version_str = f"v{str(len(self._data_keys))}"
+            # Backup the old data keys at "latest", older versions may have been
+            # removed by compact so we number from the newest version
+            version_numbers = [int(v[1:]) for v in self._data_keys if v != "latest"]
+            version_str = f"v{max(version_numbers, default=0) + 1}"
             # Store the keys for the new data
             new_keys = {}
+            # NetCDF data to write, this is written in a single request
+            to_write = {}
 
             # Iterate over the keys (daterange string) of the data dictionary
             for daterange in self._data:
-                data_key = f"{Datasource._data_root}/uuid/{self._uuid}/{version_str}/{daterange}"
+                # Unchanged data is referenced by its key in the previous version
+                stored_key = self._data.stored_key(daterange)
+                if stored_key is not None:
+                    new_keys[daterange] = stored_key
+                    continue
 
-                new_keys[daterange] = data_key
                 data = self._data[daterange]
+                # The daterange is kept at the end of the key as it's read by search functions
+                data_key = f"{Datasource._data_root}/uuid/{self._uuid}/{Datasource.hash_dataset(data)}/{daterange}"
+
+                new_keys[daterange] = data_key
 
-                # TODO - for now just create a temporary directory - will have to update Acquire
-                # or work on a PR for xarray to allow returning a NetCDF as bytes
-                with tempfile.TemporaryDirectory() as tmpdir:
-                    filepath = f"{tmpdir}/temp.nc"
-                    data.to_netcdf(filepath)
-                    set_object_from_file(bucket=bucket, key=data_key, filename=filepath)
+                # If this data has been stored before we reference the stored copy
+                if data_key not in to_write and not exists(bucket=bucket, key=data_key):
+                    if self._storage_format == "chunked":
+                        write_chunked_dataset(bucket=bucket, key=data_key, dataset=data)
+                    else:
+                        to_write[data_key] = Datasource.dataset_to_netcdf(data)
+
+                    # Rollups are created for new data only so appending data costs
+                    # time proportional to the new data
+                    if self._data_type == "timeseries":
+                        for level in rollup_levels:
+                            rollup = create_rollup(data=data, level=level)
+                            to_write[rollup_key(data_key=data_key, level=level)] = Datasource.dataset_to_netcdf(rollup)
+
+            set_objects(bucket=bucket, data=to_write)
+
+            # The Datasets can now be released from memory and read back when needed
+            for daterange, data_key in new_keys.items():
+                if self._data.stored_key(daterange) is None:
+                    self._data.mark_stored(daterange, data_key)
 
             # Copy the last version
             if "latest" in self._data_keys:
@@ -532,13 +873,26 @@ class Datasource:
             self._data_keys["latest"] = self._data_keys[version_str]
             self._latest_version = version_str
 
+            self.update_date_index()
+
+            if self._retention:
+                self.compact(bucket=bucket, save=False)
+
+        # The version history is only changed if it has been read
+        if self._history_loaded:
+            self._save_history(bucket=bucket)
+
         self._stored = True
         datasource_key = f"{Datasource._datasource_root}/uuid/{self._uuid}"
 
         set_object_from_json(bucket=bucket, key=datasource_key, data=self.to_data())
 
+        # Keep the index used for searching Datasource metadata up to date
+        if update_index:
+            MetadataIndex.update(add={self._uuid: self._metadata}, bucket=bucket)
+
     @staticmethod
-    def load(bucket=None, uuid=None, key=None, shallow=False):
+    def load(bucket=None, uuid=None, key=None, shallow=False, max_bytes=None):
         """ Load a Datasource from the object store either by name or UUID
 
             uuid or name must be passed to the function
@@ -548,8 +902,10 @@ class Datasource:
                 uuid (str, default=None): UID of Datasource
                 name (str, default=None): Name of Datasource
                 shallow (bool, default=False): Only load JSON data, do not
-                read Datasets from object store. This will speed up creation
-                of the Datasource object.
+                read Datasets from object store. Otherwise Datasets are read
+                from the object store when they're first accessed.
+                max_bytes (int, default=None): Maximum size of the stored data segments kept in memory,
+                if None a default of 256 MiB is used, see from_data
             Returns:
                 Datasource: Datasource object created from JSON
         """
@@ -566,13 +922,14 @@ class Datasource:
 
         data = get_object_from_json(bucket=bucket, key=key)
 
-        return Datasource.from_data(bucket=bucket, data=data, shallow=shallow)
+        return Datasource.from_data(bucket=bucket, data=data, shallow=shallow, max_bytes=max_bytes)
 
     def data(self):
         """ Get the data stored in this Datasource
 
             Returns:
-                list: List of tuples of Pandas.DataFrame and start, end datetime tuple
+                LazySegments: Dictionary of xarray.Dataset keyed by daterange, Datasets
+                are read from the object store when accessed
         """
         return self._data
 
@@ -646,46 +1003,98 @@ class Datasource:
         else:
             return True in results
 
-    def in_daterange(self, daterange):
+    def update_date_index(self):
+        """ Update the index of the start and end times of the latest data segments.
+
+            The index holds the segment dateranges sorted by start time, their start
+            and end times as nanoseconds since epoch and the running maximum of the
+            end times. As both the start times and the running maximum end times are
+            sorted, the segments overlapping a daterange can be found by bisection.
+
+            Returns:
+                None
+        """
+        from itertools import accumulate
+
+        try:
+            dateranges = list(self._data_keys["latest"]["keys"])
+        except KeyError:
+            dateranges = []
+
+        segments = []
+        for daterange in dateranges:
+            dates = daterange.split("/")[-1].split("_")
+
+            if len(dates) > 2:
+                raise ValueError("Invalid date string")
+
+            start, end = self.split_datrange_str(daterange_str=daterange)
+            segments.append((start.value, end.value, daterange))
+
+        segments.sort()
+
+        starts = [start for start, _, _ in segments]
+        ends = [end for _, end, _ in segments]
+
+        self._date_index = {
+            "daterange": [daterange for _, _, daterange in segments],
+            "start": starts,
+            "end": ends,
+            "max_end": list(accumulate(ends, max)),
+        }
+        self._date_index_stale = False
+
+    def in_daterange(self, daterange=None, start_date=None, end_date=None):
         """ Return the keys for data within the specified daterange
 
+            Either a daterange string or start and end datetimes must be passed
+
             Args:
-                daterange (str): Daterange string of the form
+                daterange (str, default=None): Daterange string of the form
                 2019-01-01T00:00:00_2019-12-31T00:00:00
+                start_date (datetime, default=None): Start datetime
+                end_date (datetime, default=None): End datetime
             Return:
                 list: List of keys to data
         """
-        from pandas import Timestamp
+        from bisect import bisect_left, bisect_right
+        from HUGS.Util import timestamp_tzaware
 
-        split_daterange = daterange.split("_")
+        if daterange is not None:
+            split_daterange = daterange.split("_")
 
-        if len(split_daterange) > 2:
-            # raise DateError("")
-            raise TypeError("Invalid daterange string passed.")
+            if len(split_daterange) > 2:
+                # raise DateError("")
+                raise TypeError("Invalid daterange string passed.")
 
-        start_date = Timestamp(split_daterange[0], tz="UTC").to_pydatetime()
-        end_date = Timestamp(split_daterange[1], tz="UTC").to_pydatetime()
+            start_date, end_date = split_daterange
+        elif start_date is None or end_date is None:
+            raise ValueError("Either a daterange or start and end datetimes must be passed")
 
-        data_keys = self._data_keys["latest"]["keys"]
+        start_date = timestamp_tzaware(start_date).value
+        end_date = timestamp_tzaware(end_date).value
 
-        in_date = []
-        for key in data_keys:
+        data_keys = self._data_keys.get("latest", {}).get("keys", {})
 
-            end_key = key.split("/")[-1]
-            dates = end_key.split("_")
+        if not data_keys:
+            return []
 
-            if len(dates) > 2:
-                raise ValueError("Invalid date string")
+        # Create the index for records that don't have one or if the keys have changed
+        if self._date_index_stale:
+            self.update_date_index()
 
-            start_key = Timestamp(dates[0], tz="UTC")
-            end_key = Timestamp(dates[1], tz="UTC")
+        starts = self._date_index["start"]
+        ends = self._date_index["end"]
+        dateranges = self._date_index["daterange"]
 
-            # For this logic see
-            # https://stackoverflow.com/a/325964
-            if (start_key <= end_date) and (end_key >= start_date):
-                in_date.append(data_keys[key])
+        # For the overlap logic see
+        # https://stackoverflow.com/a/325964
+        # Segments from hi onwards start after the end of the search range
+        hi = bisect_right(starts, end_date)
+        # All segments before lo end before the start of the search range
+        lo = bisect_left(self._date_index["max_end"], start_date, hi=hi)
 
-        return in_date
+        return [data_keys[dateranges[i]] for i in range(lo, hi) if ends[i] >= start_date]
 
     def species(self):
         """ Returns the species of this Datasource
@@ -902,6 +1311,35 @@ class Datasource:
 
         return results
 
+    def storage_format(self):
+        """ Returns the format used to store the data of this Datasource
+
+            Returns:
+                str: Storage format
+        """
+        return self._storage_format
+
+    def set_storage_format(self, storage_format):
+        """ Set the format used to store data in the object store. Data is stored
+            as NetCDF files by default. The chunked format stores each variable
+            separately in compressed chunks along the time dimension so reads
+            of a few variables or a short time period are cheaper.
+
+            The format is used for data written on the next save, data
+            stored previously is not converted.
+
+            Args:
+                storage_format (str): netcdf or chunked
+            Returns:
+                None
+        """
+        storage_format = str(storage_format).lower()
+
+        if storage_format not in Datasource._storage_formats:
+            raise ValueError(f"Invalid storage format, please select from one of {Datasource._storage_formats}")
+
+        self._storage_format = storage_format
+
     def data_type(self):
         """ Returns the data type held by this Datasource
 
@@ -920,6 +1358,9 @@ class Datasource:
             Returns:
                 list: List of data keys
         """
+        if return_all or version != "latest":
+            self._load_history()
+
         if return_all:
             return self._data_keys
 
@@ -937,6 +1378,8 @@ class Datasource:
             Returns:
                 dict: Dictionary of versions
         """
+        self._load_history()
+
         return self._data_keys
 
     def latest_version(self):
@@ -946,3 +1389,112 @@ class Datasource:
                 str: Latest version
         """
         return self._latest_version
+
+    def set_retention(self, keep_versions=None, keep_days=None):
+        """ Set which versions of data are kept, older versions are removed
+            by compact each time the Datasource is saved. The latest version is
+            always kept. If both are None all versions are kept.
+
+            Args:
+                keep_versions (int, default=None): Number of most recent versions to keep
+                keep_days (int, default=None): Keep versions created in this number of days
+            Returns:
+                None
+        """
+        if keep_versions is not None and int(keep_versions) < 1:
+            raise ValueError("keep_versions must be at least 1")
+
+        if keep_days is not None and keep_days < 0:
+            raise ValueError("keep_days cannot be negative")
+
+        retention = {}
+        if keep_versions is not None:
+            retention["keep_versions"] = int(keep_versions)
+        if keep_days is not None:
+            retention["keep_days"] = keep_days
+
+        self._retention = retention
+
+    def retention(self):
+        """ Return the retention policy of this Datasource
+
+            Returns:
+                dict: Dictionary of retention settings
+        """
+        return self._retention
+
+    def compact(self, keep_versions=None, keep_since=None, bucket=None, save=True):
+        """ Remove old versions of data from this Datasource and delete any stored
+            data no longer referenced by the remaining versions
+
+            A version is kept if it is one of the keep_versions most recent versions
+            or was created after keep_since. If neither are passed the retention
+            policy set by set_retention is used. The latest version is always kept.
+
+            Args:
+                keep_versions (int, default=None): Number of most recent versions to keep
+                keep_since (datetime, default=None): Keep versions created after this time
+                bucket (dict, default=None): Bucket holding data
+                save (bool, default=True): Write the updated Datasource JSON to the object store
+            Returns:
+                list: Versions removed
+        """
+        from datetime import timedelta
+        from Acquire.ObjectStore import string_to_datetime
+        from HUGS.ObjectStore import get_bucket, set_object_from_json
+        from HUGS.Util import get_datetime_now, timestamp_tzaware
+
+        if keep_versions is None and keep_since is None:
+            keep_versions = self._retention.get("keep_versions")
+
+            keep_days = self._retention.get("keep_days")
+            if keep_days is not None:
+                keep_since = get_datetime_now() - timedelta(days=keep_days)
+
+        if keep_versions is None and keep_since is None:
+            return []
+
+        if bucket is None:
+            bucket = get_bucket()
+
+        self._load_history()
+
+        versions = sorted((v for v in self._data_keys if v != "latest"), key=lambda v: int(v[1:]))
+
+        keep = {self._latest_version}
+
+        if keep_versions is not None:
+            keep.update(versions[-int(keep_versions):])
+
+        if keep_since is not None:
+            keep_since = timestamp_tzaware(keep_since)
+            for version in versions:
+                created = timestamp_tzaware(string_to_datetime(self._data_keys[version]["timestamp"]))
+                if created >= keep_since:
+                    keep.add(version)
+
+        to_remove = [v for v in versions if v not in keep]
+
+        if not to_remove:
+            return []
+
+        # Data may be shared between versions so only delete data no kept version references
+        referenced = set(self._data_keys.get("latest", {}).get("keys", {}).values())
+        for version in keep:
+            referenced.update(self._data_keys[version]["keys"].values())
+
+        expired = set()
+        for version in to_remove:
+            expired.update(self._data_keys.pop(version)["keys"].values())
+
+        for key in expired - referenced:
+            Datasource.delete_dataset(bucket=bucket, key=key)
+
+        if save:
+            self._save_history(bucket=bucket)
+
+            self._stored = True
+            datasource_key = f"{Datasource._datasource_root}/uuid/{self._uuid}"
+            set_object_from_json(bucket=bucket, key=datasource_key, data=self.to_data())
+
+        return to_remove
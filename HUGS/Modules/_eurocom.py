@@ -55,10 +55,10 @@ class EUROCOM():
             Returns:
                 dict: Dictionary containing attributes, data and metadata keys
         """
-        from pandas import read_csv, Timestamp
+        from pandas import read_csv
         import numpy as np
         from HUGS.Processing import get_attributes
-        from HUGS.Util import read_header
+        from HUGS.Util import read_header, set_datetime_index
         from pathlib import Path
 
         data_filepath = Path(data_filepath)
@@ -76,10 +76,7 @@ class EUROCOM():
         n_skip = len(header) - 1
         species = "co2"
 
-        def date_parser(year, month, day, hour, minute):
-            return Timestamp(year=year, month=month, day=day, hour=hour, minute=minute)
-
-        datetime_columns = {"time": ["Year", "Month", "Day", "Hour", "Minute"]}
+        datetime_columns = ["Year", "Month", "Day", "Hour", "Minute"]
         use_cols = [
             "Day",
             "Month",
@@ -107,15 +104,14 @@ class EUROCOM():
         data = read_csv(
             data_filepath,
             skiprows=n_skip,
-            parse_dates=datetime_columns,
-            date_parser=date_parser,
-            index_col="time",
             sep=";",
             usecols=use_cols,
             dtype=dtypes,
             na_values="-999.99",
         )
 
+        data = set_datetime_index(data=data, columns=datetime_columns, name="time")
+
         data = data[data[species.lower()] >= 0.0]
         data = data.dropna(axis="rows", how="any")
         # Drop duplicate indices
@@ -84,28 +84,18 @@ class GCWERKS():
             Returns:
                 dict: Dictionary of gas data keyed by species
         """
-        from datetime import datetime
         from pandas import read_csv
         from pandas import Timedelta as pd_Timedelta
+        from HUGS.Util import set_datetime_index
 
         # Read header
         header = read_csv(data_filepath, skiprows=2, nrows=2, header=None, sep=r"\s+")
 
-        # Create a function to parse the datetime in the data file
-        def parser(date):
-            return datetime.strptime(date, "%Y %m %d %H %M")
+        data = read_csv(data_filepath, skiprows=4, sep=r"\s+")
 
-        # Read the data in and automatically create a datetime column from the 5 columns
+        # Create a datetime index from the 5 columns
         # Dropping the yyyy', 'mm', 'dd', 'hh', 'mi' columns here
-        data = read_csv(
-            data_filepath,
-            skiprows=4,
-            sep=r"\s+",
-            index_col=["yyyy_mm_dd_hh_mi"],
-            parse_dates=[[1, 2, 3, 4, 5]],
-            date_parser=parser,
-        )
-        data.index.name = "Datetime"
+        data = set_datetime_index(data=data, columns=list(data.columns[1:6]), name="Datetime")
 
         # This metadata will be added to when species are split and attributes are written
         metadata = {"instrument": instrument, "site": site, "network": network}
@@ -187,28 +177,23 @@ class GCWERKS():
                 precision data
         """
         from pandas import read_csv
-        from datetime import datetime
-
-        # Function for parsing datetime
-        def parser(date):
-            return datetime.strptime(date, "%y%m%d")
+        from HUGS.Util import set_datetime_index
 
         # Read precision species
         precision_header = read_csv(filepath, skiprows=3, nrows=1, header=None, sep=r"\s+")
 
         precision_species = precision_header.values[0][1:].tolist()
 
+        # Read the date column as strings to keep any leading zeros
         precision = read_csv(
             filepath,
             skiprows=5,
             header=None,
             sep=r"\s+",
-            index_col=0,
-            parse_dates=[0],
-            date_parser=parser,
+            dtype={0: str},
         )
 
-        precision.index.name = "Datetime"
+        precision = set_datetime_index(data=precision, columns=[0], format="%y%m%d", name="Datetime")
         # Drop any duplicates from the index
         precision = precision.loc[~precision.index.duplicated(keep="first")]
 
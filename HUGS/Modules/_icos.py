@@ -52,19 +52,16 @@ class ICOS:
             Returns:
                 dict: Dictionary containing attributes, data and metadata keys
         """
-        from pandas import read_csv, Timestamp
+        from pandas import read_csv
         import numpy as np
-        from HUGS.Util import read_header
+        from HUGS.Util import read_header, set_datetime_index
 
         # metadata = read_metadata(filepath=data_filepath, data=data, data_type="ICOS")
         header = read_header(filepath=data_filepath)
         n_skip = len(header) - 1
         species = "co2"
 
-        def date_parser(year, month, day, hour, minute):
-            return Timestamp(year, month, day, hour, minute)
-
-        datetime_columns = {"time": ["Year", "Month", "Day", "Hour", "Minute"]}
+        datetime_columns = ["Year", "Month", "Day", "Hour", "Minute"]
 
         use_cols = [
             "Year",
@@ -92,15 +89,14 @@ class ICOS:
         data = read_csv(
             data_filepath,
             skiprows=n_skip,
-            parse_dates=datetime_columns,
-            index_col="time",
             sep=" ",
             usecols=use_cols,
             dtype=dtypes,
             na_values="-999.99",
-            date_parser=date_parser,
         )
 
+        data = set_datetime_index(data=data, columns=datetime_columns, name="time")
+
         data = data[data[species.lower()] >= 0.0]
 
         # Drop duplicate indices
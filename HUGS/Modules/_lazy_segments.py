@@ -0,0 +1,163 @@
+from collections.abc import MutableMapping
+
+__all__ = ["LazySegments"]
+
+
+class LazySegments(MutableMapping):
+    """ A dictionary of the data segments of a Datasource keyed by daterange
+        that only reads a segment from the object store when it is accessed.
+
+        Segments read from the object store are unchanged copies of stored data and
+        may be released from memory at any time, they'll be read again when next
+        accessed. Segments added to the mapping are held in memory until they're
+        marked as stored.
+
+        Args:
+            bucket (dict, default=None): Bucket containing data
+            keys (dict, default=None): Object store keys of stored segments keyed by daterange
+            max_bytes (int, default=None): Maximum size of the stored segments to keep in
+            memory, the least recently used segments are released first. If None segments
+            are kept until released.
+    """
+
+    def __init__(self, bucket=None, keys=None, max_bytes=None):
+        from collections import OrderedDict
+
+        self._bucket = bucket
+        # Object store key of each segment keyed by daterange, None for unsaved segments
+        self._keys = dict(keys) if keys else {}
+        # Segments read from the object store, ordered from least to most recently used
+        self._loaded = OrderedDict()
+        # Segments that haven't been saved to the object store
+        self._unsaved = {}
+        self._max_bytes = max_bytes
+
+    def __getitem__(self, daterange):
+        if daterange in self._unsaved:
+            return self._unsaved[daterange]
+
+        if daterange in self._loaded:
+            self._loaded.move_to_end(daterange)
+            return self._loaded[daterange]
+
+        key = self._keys[daterange]
+
+        from HUGS.Modules import Datasource
+        from HUGS.ObjectStore import get_bucket
+
+        if self._bucket is None:
+            self._bucket = get_bucket()
+
+        dataset = Datasource.load_dataset(bucket=self._bucket, key=key)
+
+        self._loaded[daterange] = dataset
+        self._release_to_limit()
+
+        return dataset
+
+    def __setitem__(self, daterange, dataset):
+        self._loaded.pop(daterange, None)
+        self._keys[daterange] = None
+        self._unsaved[daterange] = dataset
+
+    def __delitem__(self, daterange):
+        del self._keys[daterange]
+        self._loaded.pop(daterange, None)
+        self._unsaved.pop(daterange, None)
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __repr__(self):
+        return f"LazySegments({list(self._keys)})"
+
+    def stored_key(self, daterange):
+        """ Returns the object store key of the segment if it is unchanged
+            since it was stored
+
+            Args:
+                daterange (str): Daterange of segment
+            Returns:
+                str or None: Object store key or None if the segment is unsaved
+        """
+        return self._keys[daterange]
+
+    def mark_stored(self, daterange, key):
+        """ Record that the segment has been written to the object store at key. The
+            segment may now be released from memory.
+
+            Args:
+                daterange (str): Daterange of segment
+                key (str): Object store key
+            Returns:
+                None
+        """
+        self._keys[daterange] = key
+
+        if daterange in self._unsaved:
+            self._loaded[daterange] = self._unsaved.pop(daterange)
+            self._release_to_limit()
+
+    def is_loaded(self, daterange):
+        """ Check if the segment is held in memory
+
+            Args:
+                daterange (str): Daterange of segment
+            Returns:
+                bool: True if segment in memory
+        """
+        return daterange in self._loaded or daterange in self._unsaved
+
+    def release(self, daterange=None):
+        """ Release stored segments from memory, they will be read from the
+            object store when next accessed. Unsaved segments are kept.
+
+            Args:
+                daterange (str, default=None): Daterange of segment to release.
+                If None all stored segments are released.
+            Returns:
+                None
+        """
+        if daterange is None:
+            self._loaded.clear()
+        else:
+            self._loaded.pop(daterange, None)
+
+    def set_max_bytes(self, max_bytes):
+        """ Set the maximum size of the stored segments to keep in memory
+
+            Args:
+                max_bytes (int): Number of bytes, if None there is no limit
+            Returns:
+                None
+        """
+        self._max_bytes = max_bytes
+        self._release_to_limit()
+
+    def nbytes(self):
+        """ Returns the size of the segments held in memory
+
+            Returns:
+                int: Number of bytes
+        """
+        return sum(ds.nbytes for ds in self._loaded.values()) + sum(ds.nbytes for ds in self._unsaved.values())
+
+    def _release_to_limit(self):
+        """ Release the least recently used stored segments until those held
+            in memory are within the size limit. The most recently used segment
+            is always kept.
+
+            Returns:
+                None
+        """
+        if self._max_bytes is None:
+            return
+
+        loaded_bytes = sum(ds.nbytes for ds in self._loaded.values())
+
+        while loaded_bytes > self._max_bytes and len(self._loaded) > 1:
+            _, dataset = self._loaded.popitem(last=False)
+            loaded_bytes -= dataset.nbytes
@@ -0,0 +1,364 @@
+__all__ = ["MetadataIndex"]
+
+
+class MetadataIndex:
+    """ An inverted index over the metadata of the Datasources in the object store.
+
+        This allows a search to find the UUIDs of Datasources matching a set of
+        terms without having to load the JSON record of every Datasource.
+
+        Two lookups are held. search matches values of the indexed fields, such as
+        site="bsd". search_values matches values of any metadata field, as
+        Datasource.search_metadata does, and is used to find the Datasources that
+        search_metadata need be called on.
+
+        The index is kept up to date by Datasource.save, ObsSurface.read_file and
+        ObsSurface.delete using update, which locks the stored index while it's changed.
+    """
+
+    _root = "MetadataIndex"
+    _uuid = "8b89cb93-1919-4ffc-922b-af7008484c38"
+    # The metadata keys we index
+    _indexed_fields = ["site", "species", "inlet", "instrument", "network", "data_type"]
+
+    def __init__(self):
+        from Acquire.ObjectStore import get_datetime_now
+
+        self._creation_datetime = get_datetime_now()
+        self._stored = False
+        # Keyed by metadata field then by value, holds a list of Datasource UUIDs
+        self._index = {field: {} for field in MetadataIndex._indexed_fields}
+        # The indexed metadata of each Datasource keyed by UUID, allows us to
+        # remove stale entries when a Datasource is updated or deleted
+        self._records = {}
+        # Keyed by the value of any metadata field, holds a list of Datasource UUIDs
+        self._values = {}
+        # The metadata values of each Datasource keyed by UUID
+        self._value_records = {}
+
+    def to_data(self):
+        """ Return a JSON-serialisable dictionary of object
+            for storage in object store
+
+            Returns:
+                dict: Dictionary version of object
+        """
+        from Acquire.ObjectStore import datetime_to_string
+
+        data = {}
+        data["creation_datetime"] = datetime_to_string(self._creation_datetime)
+        data["stored"] = self._stored
+        data["index"] = self._index
+        data["records"] = self._records
+        data["values"] = self._values
+        data["value_records"] = self._value_records
+
+        return data
+
+    @staticmethod
+    def from_data(data):
+        """ Construct from a JSON-deserialised dictionary
+
+            Args:
+                data (dict): JSON data
+            Returns:
+                MetadataIndex: MetadataIndex created from JSON
+        """
+        from Acquire.ObjectStore import string_to_datetime
+
+        if not data:
+            raise ValueError("Unable to create object with empty dictionary")
+
+        index = MetadataIndex()
+        index._creation_datetime = string_to_datetime(data["creation_datetime"])
+        index._records = data["records"]
+        index._values = data.get("values", {})
+        index._value_records = data.get("value_records", {})
+
+        for field in MetadataIndex._indexed_fields:
+            index._index[field] = data["index"].get(field, {})
+
+        index._stored = False
+
+        return index
+
+    @staticmethod
+    def key():
+        """ Returns the object store key of the index
+
+            Returns:
+                str: Object store key
+        """
+        return f"{MetadataIndex._root}/uuid/{MetadataIndex._uuid}"
+
+    @staticmethod
+    def exists(bucket=None):
+        """ Check if a MetadataIndex is already saved in the object store
+
+            Args:
+                bucket (dict, default=None): Bucket for data storage
+            Returns:
+                bool: True if object exists
+        """
+        from HUGS.ObjectStore import exists, get_bucket
+
+        if bucket is None:
+            bucket = get_bucket()
+
+        return exists(bucket=bucket, key=MetadataIndex.key())
+
+    def save(self, bucket=None):
+        """ Save the object to the object store
+
+            Args:
+                bucket (dict, default=None): Bucket for data
+            Returns:
+                None
+        """
+        from HUGS.ObjectStore import get_bucket, set_object_from_json
+
+        if bucket is None:
+            bucket = get_bucket()
+
+        self._stored = True
+        set_object_from_json(bucket=bucket, key=MetadataIndex.key(), data=self.to_data())
+
+    @staticmethod
+    def load(bucket=None):
+        """ Load the MetadataIndex from the object store. If no index has been
+            stored, or the stored index was written before all metadata values
+            were indexed, one is built from the Datasources recorded by ObsSurface.
+
+            Args:
+                bucket (dict, default=None): Bucket holding data
+            Returns:
+                MetadataIndex: MetadataIndex object
+        """
+        from HUGS.ObjectStore import get_bucket, get_object_from_json
+
+        if bucket is None:
+            bucket = get_bucket()
+
+        if not MetadataIndex.exists(bucket=bucket):
+            return MetadataIndex.rebuild(bucket=bucket)
+
+        data = get_object_from_json(bucket=bucket, key=MetadataIndex.key())
+
+        if "values" not in data:
+            return MetadataIndex.rebuild(bucket=bucket)
+
+        return MetadataIndex.from_data(data=data)
+
+    @staticmethod
+    def update(add=None, remove=None, bucket=None):
+        """ Add and remove Datasources from the stored index
+
+            The stored index is locked while it's read, changed and written back so
+            concurrent updates aren't lost, see HUGS.ObjectStore.lock_object. Callers
+            adding many Datasources should pass them together so the index is
+            only written once.
+
+            Args:
+                add (dict, default=None): Metadata of Datasources to add keyed by UUID
+                remove (list, default=None): UUIDs of Datasources to remove
+                bucket (dict, default=None): Bucket holding data
+            Returns:
+                MetadataIndex: Updated MetadataIndex
+        """
+        from HUGS.ObjectStore import get_bucket, lock_object
+
+        if bucket is None:
+            bucket = get_bucket()
+
+        with lock_object(bucket=bucket, key=MetadataIndex.key()):
+            index = MetadataIndex.load(bucket=bucket)
+
+            for uuid in remove or []:
+                index.remove(uuid=uuid)
+
+            for uuid, metadata in (add or {}).items():
+                index.add(uuid=uuid, metadata=metadata)
+
+            index.save(bucket=bucket)
+
+        return index
+
+    @staticmethod
+    def rebuild(bucket=None):
+        """ Create the index from the Datasources recorded by ObsSurface and
+            save it to the object store. This is only needed for object stores
+            populated before the index existed.
+
+            Args:
+                bucket (dict, default=None): Bucket holding data
+            Returns:
+                MetadataIndex: MetadataIndex object
+        """
+        from HUGS.Modules import Datasource, ObsSurface
+        from HUGS.ObjectStore import get_bucket
+
+        if bucket is None:
+            bucket = get_bucket()
+
+        index = MetadataIndex()
+
+        obs = ObsSurface.load(bucket=bucket)
+
+        for uuid in obs.datasources():
+            datasource = Datasource.load(bucket=bucket, uuid=uuid, shallow=True)
+            index.add(uuid=uuid, metadata=datasource.metadata())
+
+        index.save(bucket=bucket)
+
+        return index
+
+    def add(self, uuid, metadata):
+        """ Add the metadata of the Datasource with the given UUID to the index.
+            Any previous entries for this Datasource are replaced.
+
+            Args:
+                uuid (str): UUID of Datasource
+                metadata (dict): Metadata of Datasource
+            Returns:
+                None
+        """
+        self.remove(uuid=uuid)
+
+        record = {}
+        for field in MetadataIndex._indexed_fields:
+            try:
+                value = str(metadata[field]).lower()
+            except KeyError:
+                continue
+
+            record[field] = value
+            self._index[field].setdefault(value, []).append(uuid)
+
+        self._records[uuid] = record
+
+        values = sorted({str(v).lower() for v in metadata.values() if not isinstance(v, (dict, list))})
+        for value in values:
+            self._values.setdefault(value, []).append(uuid)
+
+        self._value_records[uuid] = values
+
+    def remove(self, uuid):
+        """ Remove the Datasource with the given UUID from the index
+
+            Args:
+                uuid (str): UUID of Datasource
+            Returns:
+                None
+        """
+        record = self._records.pop(uuid, {})
+
+        for field, value in record.items():
+            uuids = self._index[field].get(value, [])
+
+            if uuid in uuids:
+                uuids.remove(uuid)
+
+            if not uuids:
+                self._index[field].pop(value, None)
+
+        for value in self._value_records.pop(uuid, []):
+            uuids = self._values.get(value, [])
+
+            if uuid in uuids:
+                uuids.remove(uuid)
+
+            if not uuids:
+                self._values.pop(value, None)
+
+    def search(self, **terms):
+        """ Find the UUIDs of Datasources matching all of the passed terms.
+
+            Each term is a metadata field and the value(s) it should take,
+            a term passed a list matches any of the values in the list. Terms
+            with a value of None are ignored.
+
+            Example:
+                index.search(site="bsd", species=["co2", "ch4"], inlet="248m")
+
+            Args:
+                terms: Indexed metadata field and value(s) to match
+            Returns:
+                list: Sorted list of Datasource UUIDs
+        """
+        matching = None
+
+        for field, values in terms.items():
+            if values is None:
+                continue
+
+            if field not in self._index:
+                raise KeyError(f"{field} is not indexed, indexed fields are {MetadataIndex._indexed_fields}")
+
+            if not isinstance(values, (list, tuple, set)):
+                values = [values]
+
+            field_matches = set()
+            for value in values:
+                if value is None:
+                    continue
+                field_matches.update(self._index[field].get(str(value).lower(), []))
+
+            if matching is None:
+                matching = field_matches
+            else:
+                matching &= field_matches
+
+        if matching is None:
+            matching = set(self._records)
+
+        return sorted(matching)
+
+    def search_values(self, values):
+        """ Find the UUIDs of Datasources that have all of the passed values
+            in any of their metadata fields
+
+            This finds the Datasources that may match Datasource.search_metadata
+            with find_all=True, values are compared as lower case strings.
+
+            Args:
+                values (str, list): Value(s) to match, values of None are ignored
+            Returns:
+                list: Sorted list of Datasource UUIDs
+        """
+        if not isinstance(values, (list, tuple, set)):
+            values = [values]
+
+        matching = None
+        for value in values:
+            if value is None:
+                continue
+
+            uuids = set(self._values.get(str(value).lower(), []))
+
+            if matching is None:
+                matching = uuids
+            else:
+                matching &= uuids
+
+        if matching is None:
+            matching = set(self._records)
+
+        return sorted(matching)
+
+    def record(self, uuid):
+        """ Return the indexed metadata of the Datasource with the given UUID
+
+            Args:
+                uuid (str): UUID of Datasource
+            Returns:
+                dict: Indexed metadata
+        """
+        return self._records[uuid]
+
+    def datasources(self):
+        """ Return the UUIDs of all the Datasources in the index
+
+            Returns:
+                list: List of Datasource UUIDs
+        """
+        return list(self._records.keys())
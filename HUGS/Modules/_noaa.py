@@ -62,27 +62,22 @@ class NOAA(BaseModule):
             Returns:
                 dict: Dictionary containing attributes, data and metadata keys
         """
-        from HUGS.Util import read_header
-        from pandas import read_csv, Timestamp
+        from HUGS.Util import read_header, set_datetime_index
+        from pandas import read_csv
         import numpy as np
 
         header = read_header(filepath=data_filepath)
 
         column_names = header[-1][14:].split()
 
-        def date_parser(year, month, day, hour, minute, second):
-            return Timestamp(year, month, day, hour, minute, second)
-
-        date_parsing = {
-            "time": [
-                "sample_year",
-                "sample_month",
-                "sample_day",
-                "sample_hour",
-                "sample_minute",
-                "sample_seconds",
-            ]
-        }
+        datetime_columns = [
+            "sample_year",
+            "sample_month",
+            "sample_day",
+            "sample_hour",
+            "sample_minute",
+            "sample_seconds",
+        ]
 
         data_types = {
             "sample_year": np.int,
@@ -102,12 +97,11 @@ class NOAA(BaseModule):
             names=column_names,
             sep=r"\s+",
             dtype=data_types,
-            parse_dates=date_parsing,
-            date_parser=date_parser,
-            index_col="time",
             skipinitialspace=True,
         )
 
+        data = set_datetime_index(data=data, columns=datetime_columns, name="time")
+
         data = data.loc[~data.index.duplicated(keep="first")]
 
         # Check if the index is sorted
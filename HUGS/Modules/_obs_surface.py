@@ -62,78 +62,126 @@ class ObsSurface(BaseModule):
         set_object_from_json(bucket=bucket, key=obs_key, data=self.to_data())
 
     @staticmethod
-    def read_file(filepath, data_type, site=None, network=None, instrument=None, overwrite=False):
+    def read_file(filepath, data_type, site=None, network=None, instrument=None, overwrite=False, storage_format=None,
+                  max_workers=None, batch_size=None):
         """ Read file(s) with the processing module given by data_type
 
+            When a list of files is passed they're read in parallel in chunks of batch_size
+            files. The data of each chunk is written to the object store before the next
+            chunk is read so only one chunk of data is held in memory. Each Datasource is
+            loaded and saved once for each chunk it has data in.
+
+            All the files are hashed before any are read so a batch holding a file that's
+            been uploaded before is rejected without anything being written.
+
             Args:
                 filepath (str, pathlib.Path, list): Filepath(s)
                 data_type (str): Data type
                 site (str, default=None): Site code/name
                 network (str, default=None): Network name
                 overwrite (bool, default=False): Should we overwrite previously seend data
+                storage_format (str, default=None): Format to store data in, netcdf or chunked.
+                If None Datasources keep their current format, netcdf for new Datasources
+                max_workers (int, default=None): Maximum number of processes used to read files,
+                if None the number of CPUs is used
+                batch_size (int, default=None): Number of files read before their data is written,
+                if None one file for each process
             Returns:
-                None
+                dict: Dictionary of the Datasources created for each file
         """
+        import os
         from collections import defaultdict
+        from concurrent.futures import ProcessPoolExecutor
         from pathlib import Path
-        from HUGS.Util import load_object, hash_file
-        from HUGS.Processing import assign_data, DataTypes
+        from HUGS.Processing import assign_data_batch, DataTypes
+        from HUGS.Util import hash_file
 
         if not isinstance(filepath, list):
             filepath = [filepath]
 
         data_type = DataTypes[data_type.upper()].name
-        data_obj = load_object(class_name=data_type)
-
-        obs = ObsSurface.load()
-
-        results = {}
 
         for fp in filepath:
             if data_type == "GCWERKS":
                 if not isinstance(fp, tuple):
                     raise TypeError("To process GCWERKS data a data filepath and a precision filepath must be suppled as a tuple")
+            elif isinstance(fp, tuple):
+                raise TypeError("Only a single data file may be passed for this data type. Please check you have the correct type selected.")
 
-                data_filepath = Path(fp[0])
-                precision_filepath = Path(fp[1])
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
 
-                data = data_obj.read_file(data_filepath=data_filepath, precision_filepath=precision_filepath, site=site, network=network)
-            else:
-                if isinstance(fp, tuple):
-                    raise TypeError("Only a single data file may be passed for this data type. Please check you have the correct type selected.")
+        n_workers = max(1, min(int(max_workers), len(filepath)))
 
-                data_filepath = Path(fp)
-                data = data_obj.read_file(data_filepath=data_filepath, site=site, network=network)
+        if batch_size is None:
+            batch_size = n_workers
+        elif batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
 
-            # TODO - need a new way of creating the source name
-            source_name = data_filepath.stem
+        obs = ObsSurface.load()
 
-            # Hash the file and if we've seen this file before raise an error
+        # Check all the hashes before we write anything so a batch is either processed or rejected
+        file_hashes = []
+        batch_hashes = {}
+        for fp in filepath:
+            data_filepath = Path(fp[0]) if isinstance(fp, tuple) else Path(fp)
             file_hash = hash_file(filepath=data_filepath)
+            # If we've seen this file before raise an error
             if file_hash in obs._file_hashes and not overwrite:
                 raise ValueError(f"This file has been uploaded previously with the filename : {obs._file_hashes[file_hash]}.")
+            if file_hash in batch_hashes and not overwrite:
+                raise ValueError(f"The same file has been passed twice with the filenames : "
+                                 f"{batch_hashes[file_hash]} and {data_filepath.name}.")
 
-            datasource_table = defaultdict(dict)
-            # For each species check if we have a Datasource
-            for species in data:
-                name = "_".join([source_name, species])
-                datasource_table[species]["uuid"] = obs._datasource_names.get(name, False)
-                datasource_table[species]["name"] = name
-
-            # Create Datasources, save them to the object store and get their UUIDs
-            datasource_uuids = assign_data(gas_data=data, lookup_results=datasource_table, overwrite=overwrite)
-
-            results[data_filepath.name] = datasource_uuids
+            batch_hashes[file_hash] = data_filepath.name
+            file_hashes.append(file_hash)
 
-            # Record the Datasources we've created / appended to
-            obs.add_datasources(datasource_uuids)
+        executor = ProcessPoolExecutor(max_workers=n_workers) if n_workers > 1 else None
 
-            # Store the hash as the key for easy searching, store the filename as well for
-            # ease of checking by user
-            obs._file_hashes[file_hash] = data_filepath.name
-
-        # Save this object back to the object store
-        obs.save()
+        results = {}
+        try:
+            for chunk_start in range(0, len(filepath), batch_size):
+                chunk = filepath[chunk_start:chunk_start + batch_size]
+
+                # Read the files, keeping the order they were passed in
+                if executor is not None:
+                    file_data = list(executor.map(_read_file, [data_type] * len(chunk), chunk,
+                                                  [site] * len(chunk), [network] * len(chunk)))
+                else:
+                    file_data = [_read_file(data_type, fp, site, network) for fp in chunk]
+
+                # Collect the data for each Datasource from all the files
+                datasource_data = {}
+                file_datasources = defaultdict(list)
+                for f in file_data:
+                    # TODO - need a new way of creating the source name
+                    for species, species_data in f["data"].items():
+                        name = "_".join([f["source_name"], species])
+
+                        if name not in datasource_data:
+                            datasource_data[name] = {"uuid": obs._datasource_names.get(name, False), "data": []}
+
+                        datasource_data[name]["data"].append(species_data)
+                        file_datasources[f["filename"]].append(name)
+
+                # Create Datasources, save them to the object store and get their UUIDs
+                datasource_uuids = assign_data_batch(datasource_data=datasource_data, overwrite=overwrite,
+                                                     storage_format=storage_format)
+
+                # Record the Datasources we've created / appended to
+                obs.add_datasources(datasource_uuids)
+
+                for f, file_hash in zip(file_data, file_hashes[chunk_start:chunk_start + batch_size]):
+                    results[f["filename"]] = {name: datasource_uuids[name] for name in file_datasources[f["filename"]]}
+                    # Store the hash as the key for easy searching, store the filename as well for
+                    # ease of checking by user
+                    obs._file_hashes[file_hash] = f["filename"]
+
+                # Save this object back to the object store so the data written so far is recorded
+                obs.save()
+        finally:
+            if executor is not None:
+                executor.shutdown()
 
         return results
 
@@ -170,8 +218,8 @@ class ObsSurface(BaseModule):
             Returns:
                 None
         """
-        from HUGS.ObjectStore import delete_object, get_bucket
-        from HUGS.Modules import Datasource
+        from HUGS.ObjectStore import delete_object, get_bucket, get_object_names
+        from HUGS.Modules import Datasource, MetadataIndex, get_segment_cache
 
         bucket = get_bucket()
         # Load the Datasource and get all its keys
@@ -180,19 +228,64 @@ class ObsSurface(BaseModule):
 
         data_keys = datasource.data_keys(return_all=True)
 
+        # Versions may share keys for data that didn't change between them
+        keys = set()
         for version in data_keys:
-            key_data = data_keys[version]["keys"]
+            keys.update(data_keys[version]["keys"].values())
+
+        for key in keys:
+            Datasource.delete_dataset(bucket=bucket, key=key)
 
-            for daterange in key_data:
-                key = key_data[daterange]
-                delete_object(bucket=bucket, key=key)
+        # Remove any data left that isn't referenced by a version, such as
+        # data written by a save that didn't complete
+        for key in get_object_names(bucket=bucket, prefix=f"{Datasource._data_root}/uuid/{uuid}/"):
+            delete_object(bucket=bucket, key=key)
+            get_segment_cache().invalidate(bucket=bucket, key=key)
 
-        # Then delete the Datasource itself
+        # Then delete the Datasource itself and its version history
         key = f"{Datasource._datasource_root}/uuid/{uuid}"
         delete_object(bucket=bucket, key=key)
+        delete_object(bucket=bucket, key=Datasource.history_key(uuid))
+
+        # Remove it from the search index
+        MetadataIndex.update(remove=[uuid], bucket=bucket)
 
         # First remove from our dictionary of Datasources
         name = self._datasource_uuids[uuid]
 
         del self._datasource_names[name]
         del self._datasource_uuids[uuid]
+
+
+def _read_file(data_type, filepath, site, network):
+    """ Read a single data file, this is a module level function
+        so it can be run by the process pool in ObsSurface.read_file
+
+        Args:
+            data_type (str): Data type
+            filepath (str, pathlib.Path, tuple): Filepath, for GCWERKS data a tuple
+            of data filepath and precision filepath
+            site (str): Site code/name
+            network (str): Network name
+        Returns:
+            dict: Dictionary of the filename, source name and data read
+    """
+    from pathlib import Path
+    from HUGS.Util import load_object
+
+    data_obj = load_object(class_name=data_type)
+
+    if data_type == "GCWERKS":
+        data_filepath = Path(filepath[0])
+        precision_filepath = Path(filepath[1])
+
+        data = data_obj.read_file(data_filepath=data_filepath, precision_filepath=precision_filepath, site=site, network=network)
+    else:
+        data_filepath = Path(filepath)
+        data = data_obj.read_file(data_filepath=data_filepath, site=site, network=network)
+
+    return {
+        "filename": data_filepath.name,
+        "source_name": data_filepath.stem,
+        "data": data,
+    }
@@ -0,0 +1,200 @@
+from threading import RLock
+
+__all__ = ["SegmentCache", "get_segment_cache"]
+
+# Default maximum size of the decoded segments held by the shared cache
+_default_max_bytes = 256 * 1024 * 1024
+
+
+class SegmentCache:
+    """ An in-process cache of segments of data decoded from the object store,
+        used by Datasource.load_datasets and so recombine_sections.
+
+        Segments are stored at keys given by the hash of their contents so the
+        object key identifies the version of the data held. Cached segments are
+        keyed by bucket, object key and the variables and times selected.
+
+        The arrays of cached segments are shared with the Datasets returned by get
+        so they're made read-only when the segment is added. Copy a variable's
+        values before changing them.
+
+        The least recently used segments are evicted once the total size of the
+        cached segments is larger than max_bytes. If ttl is given segments are
+        also evicted ttl seconds after they were cached.
+
+        Args:
+            max_bytes (int, default=None): Maximum size of cached segments in bytes,
+            if None a default of 256 MiB is used
+            ttl (float, default=None): Number of seconds to keep segments, if None
+            segments are kept until evicted by size
+    """
+
+    def __init__(self, max_bytes=None, ttl=None):
+        self._lock = RLock()
+        self._hits = 0
+        self._misses = 0
+        self.configure(max_bytes=max_bytes, ttl=ttl)
+
+    def configure(self, max_bytes=None, ttl=None):
+        """ Set the size limit and time to live of cached segments. This empties the cache.
+
+            Args:
+                max_bytes (int, default=None): Maximum size of cached segments in bytes,
+                if None a default of 256 MiB is used. If 0 no segments are cached.
+                ttl (float, default=None): Number of seconds to keep segments, if None
+                segments are kept until evicted by size
+            Returns:
+                None
+        """
+        from cachetools import LRUCache, TTLCache
+
+        if max_bytes is None:
+            max_bytes = _default_max_bytes
+
+        max_bytes = int(max_bytes)
+
+        if max_bytes < 0:
+            raise ValueError("max_bytes must not be negative")
+
+        if ttl is not None and ttl <= 0:
+            raise ValueError("ttl must be a positive number of seconds")
+
+        def getsizeof(dataset):
+            return dataset.nbytes
+
+        with self._lock:
+            if ttl is None:
+                self._cache = LRUCache(maxsize=max_bytes, getsizeof=getsizeof)
+            else:
+                self._cache = TTLCache(maxsize=max_bytes, ttl=ttl, getsizeof=getsizeof)
+
+            self._max_bytes = max_bytes
+            self._ttl = ttl
+
+    @staticmethod
+    def cache_key(bucket, key, variables=None, start_date=None, end_date=None):
+        """ Create the key for a segment in the cache
+
+            Args:
+                bucket (dict): Bucket containing data
+                key (str): Object store key for data
+                variables (list, default=None): Data variables selected
+                start_date (datetime, default=None): Start of selected times
+                end_date (datetime, default=None): End of selected times
+            Returns:
+                tuple: Cache key
+        """
+        from HUGS.Util import timestamp_tzaware
+
+        if variables is not None:
+            if not isinstance(variables, list):
+                variables = [variables]
+            variables = tuple(variables)
+
+        if start_date is not None:
+            start_date = timestamp_tzaware(start_date).value
+        if end_date is not None:
+            end_date = timestamp_tzaware(end_date).value
+
+        return (str(bucket), key, variables, start_date, end_date)
+
+    def get(self, cache_key):
+        """ Get a segment from the cache
+
+            Args:
+                cache_key (tuple): Cache key, see cache_key
+            Returns:
+                xarray.Dataset or None: A shallow copy of the segment, with read-only arrays,
+                or None if not cached
+        """
+        with self._lock:
+            dataset = self._cache.get(cache_key)
+
+            if dataset is None:
+                self._misses += 1
+                return None
+
+            self._hits += 1
+
+        # Copy so callers can change the variables and attributes of the Dataset
+        return dataset.copy(deep=False)
+
+    def set(self, cache_key, dataset):
+        """ Add a segment to the cache. Segments larger than the cache are not added.
+
+            The arrays of the Dataset are made read-only as they're shared with
+            the Datasets returned by get.
+
+            Args:
+                cache_key (tuple): Cache key, see cache_key
+                dataset (xarray.Dataset): Segment
+            Returns:
+                None
+        """
+        import numpy as np
+
+        if dataset.nbytes > self._max_bytes:
+            return
+
+        for variable in dataset.variables.values():
+            if isinstance(variable.data, np.ndarray):
+                variable.data.flags.writeable = False
+
+        with self._lock:
+            self._cache[cache_key] = dataset.copy(deep=False)
+
+    def invalidate(self, bucket, key):
+        """ Remove the cached segments read from key
+
+            Args:
+                bucket (dict): Bucket containing data
+                key (str): Object store key for data
+            Returns:
+                None
+        """
+        bucket = str(bucket)
+
+        with self._lock:
+            for cache_key in list(self._cache.keys()):
+                if cache_key[0] == bucket and cache_key[1] == key:
+                    self._cache.pop(cache_key, None)
+
+    def clear(self):
+        """ Remove all segments from the cache and reset the statistics
+
+            Returns:
+                None
+        """
+        with self._lock:
+            self._cache.clear()
+            self._hits = 0
+            self._misses = 0
+
+    def stats(self):
+        """ Returns the statistics of the cache
+
+            Returns:
+                dict: Number of hits and misses, number of segments cached, size
+                of cached segments and the maximum size in bytes
+        """
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "segments": len(self._cache),
+                "nbytes": int(self._cache.currsize),
+                "max_bytes": self._max_bytes,
+                "ttl": self._ttl,
+            }
+
+
+_segment_cache = SegmentCache()
+
+
+def get_segment_cache():
+    """ Returns the segment cache shared by this process
+
+        Returns:
+            SegmentCache: Segment cache
+    """
+    return _segment_cache
@@ -8,11 +8,17 @@ from ._local_store import (
     get_bucket,
     get_local_bucket,
     get_object,
+    get_objects,
+    get_object_path,
     set_object,
+    set_objects,
     set_object_from_json,
     set_object_from_file,
     get_object_from_json,
     exists,
+    lock_object,
+    enable_listing_cache,
+    clear_listing_cache,
     query_store
 )
 
@@ -1,18 +1,27 @@
 """ Query the object store for data uploaded by a certain user etc
 
 """
+from contextlib import contextmanager
 from Acquire.ObjectStore import ObjectStore
 
+# Number of objects read or written at once by get_objects and set_objects
+_default_max_workers = 8
+
 
 __all__ = [
     "delete_object",
     "get_object_names",
     "get_object",
+    "get_objects",
+    "get_object_path",
     "get_object_from_json",
     "get_local_bucket",
+    "set_object",
+    "set_objects",
     "set_object_from_json",
     "set_object_from_file",
     "exists",
+    "lock_object",
     "get_abs_filepaths",
     "get_md5",
     "get_md5_bytes",
@@ -43,7 +52,7 @@ def get_object_names(bucket, prefix=None):
         Returns:
             list: List of keys in object store
     """
-    return ObjectStore.get_all_object_names(bukcet=bucket, prefix=prefix)
+    return ObjectStore.get_all_object_names(bucket=bucket, prefix=prefix)
 
 
 def get_object(bucket, key):
@@ -60,9 +69,50 @@ def get_object(bucket, key):
     return ObjectStore.get_object(bucket, key)
 
 
+def get_objects(bucket, keys, max_workers=None):
+    """ Gets the objects at the passed keys in the bucket, the
+        objects are read concurrently
+
+        Args:
+            bucket (dict): Bucket containing data
+            keys (list): Keys for data in bucket
+            max_workers (int, default=None): Maximum number of objects to read at once
+        Returns:
+            dict: Objects keyed by key
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    keys = list(keys)
+
+    if not keys:
+        return {}
+
+    if max_workers is None:
+        max_workers = _default_max_workers
+
+    n_workers = max(1, min(int(max_workers), len(keys)))
+
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        objects = executor.map(lambda key: ObjectStore.get_object(bucket, key), keys)
+
+        return dict(zip(keys, objects))
+
+
+def get_object_path(bucket, key):
+    """ Objects in the cloud object store aren't held in local files
+
+        Args:
+            bucket (str): Bucket containing data
+            key (str): Key for data in bucket
+        Returns:
+            None
+    """
+    return None
+
+
 def get_object_from_json(bucket, key):
-    """ Removes the daterange from the passed key and uses the reduced
-        key to get an object from the object store.
+    """ Gets the object at key in the passed bucket and decodes
+        it from JSON
 
         Wraps the Acquire get_object_from_json function
 
@@ -72,28 +122,94 @@ def get_object_from_json(bucket, key):
         Returns:
             Object: Object from store
     """
-    # Get the object and use the key as a prefix
-    name = ObjectStore.get_all_object_names(bucket, prefix=key)
-
-    if len(name) > 1:
-        raise ValueError("There should only be one object with this key")
-
-    return ObjectStore.get_object_from_json(bucket, name[0])
+    return ObjectStore.get_object_from_json(bucket, key)
 
 
 def exists(bucket, key):
     """ Checks if there is an object in the object store with the given key
 
+        This reads only the size and checksum of the object, use
+        get_object_names to find objects with keys starting with a prefix
+
         Args:
             bucket (dict): Bucket containing data
-            key (str): Prefix for key in object store
+            key (str): Key in object store
         Returns:
             bool: True if exists in store
     """
-    # Get the object and use the key as a prefix
-    name = ObjectStore.get_all_object_names(bucket, prefix=key)
+    from Acquire.ObjectStore import ObjectStoreError
+
+    try:
+        ObjectStore.get_size_and_checksum(bucket, key)
+    except ObjectStoreError:
+        return False
+
+    return True
+
+
+@contextmanager
+def lock_object(bucket, key, timeout=60):
+    """ Hold an exclusive lock on key in bucket, used to read, change and
+        write back an object without losing the changes of other writers
+
+        Wraps the Acquire Mutex
+
+        Args:
+            bucket (dict): Bucket containing data
+            key (str): Key to lock
+            timeout (int, default=60): Seconds to wait for the lock
+        Returns:
+            None
+    """
+    from Acquire.ObjectStore import Mutex
+
+    mutex = Mutex(key=f"lock/{key}", bucket=bucket, timeout=timeout)
+    try:
+        yield
+    finally:
+        mutex.unlock()
+
+
+def set_object(bucket, key, data):
+    """ Wraps the Acquire set_object function
+
+        Args:
+            bucket (str): Bucket for data storage
+            key (str): Key for data in bucket
+            data (bytes): Binary data
+        Returns:
+            None
+    """
+    return ObjectStore.set_object(bucket=bucket, key=key, data=data)
+
+
+def set_objects(bucket, data, max_workers=None):
+    """ Store each object in the passed dictionary in bucket at its key,
+        the objects are written concurrently
+
+        Args:
+            bucket (dict): Bucket for data storage
+            data (dict): Binary data keyed by key
+            max_workers (int, default=None): Maximum number of objects to write at once
+        Returns:
+            None
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    if not data:
+        return
+
+    if max_workers is None:
+        max_workers = _default_max_workers
+
+    n_workers = max(1, min(int(max_workers), len(data)))
+
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        futures = [executor.submit(ObjectStore.set_object, bucket=bucket, key=key, data=value)
+                   for key, value in data.items()]
 
-    return len(name) > 0
+        for future in futures:
+            future.result()
 
 
 def set_object_from_json(bucket, key, data):
@@ -1,13 +1,24 @@
-import glob
 import json
 import os
 import sys
 from pathlib import Path
 import threading
+from contextlib import contextmanager
 from Acquire.ObjectStore import ObjectStoreError
 
+# Guards the listing cache
 rlock = threading.RLock()
 
+# Writes and deletes of a key are serialised by one of a fixed set of locks
+# chosen by the hash of the key. Reads don't take a lock as objects are
+# written to a temporary file and then moved into place.
+_n_key_locks = 64
+_key_locks = [threading.Lock() for _ in range(_n_key_locks)]
+
+# Cache of object names keyed by bucket, prefix and without_prefix, see enable_listing_cache
+_listing_cache = {}
+_listing_cache_enabled = False
+
 __all__ = ["delete_object", 
             "get_hugs_local_path", 
             "get_all_object_names", 
@@ -15,11 +26,43 @@ __all__ = ["delete_object",
             "get_bucket", 
             "get_local_bucket", 
             "get_object", 
+            "get_objects",
+            "get_object_path",
             "set_object", 
+            "set_objects",
             "set_object_from_json", 
             "set_object_from_file", 
             "get_object_from_json", 
-            "exists"]
+            "exists",
+            "lock_object",
+            "enable_listing_cache",
+            "clear_listing_cache"]
+
+
+def _read_umask():
+    """ Returns the umask of this process without changing it
+
+        Setting the umask to read it would change the permissions of files
+        created by other threads while it's set. If the umask can't be read
+        the common default of 0o022 is used.
+
+        Returns:
+            int: umask
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("Umask:"):
+                    return int(line.split()[1], 8)
+    except (OSError, ValueError, IndexError):
+        pass
+
+    return 0o022
+
+
+# Temporary files are created readable only by their owner, objects
+# are given the permissions of files created with open
+_object_mode = 0o666 & ~_read_umask()
 
 
 def get_hugs_local_path():
@@ -40,6 +83,10 @@ def get_hugs_local_path():
 def get_all_object_names(bucket, prefix=None, without_prefix=False):
     """ Returns the names of all objects in the passed bucket
 
+        Only the directories that can hold keys starting with the prefix are
+        read. If the listing cache is enabled the result is cached until an
+        object in the bucket starting with the prefix is set or deleted.
+
         Args:
             bucket (str): Bucket path
             prefix (str, default=None): Prefix for keys
@@ -47,47 +94,136 @@ def get_all_object_names(bucket, prefix=None, without_prefix=False):
         Returns:
             list: List of object names
     """
-    root = bucket
+    if _listing_cache_enabled:
+        cache_key = (str(bucket), prefix, without_prefix)
 
-    if prefix is not None:
-        root = f"{bucket}/{prefix}"
+        with rlock:
+            if cache_key not in _listing_cache:
+                _listing_cache[cache_key] = _list_object_names(bucket, prefix, without_prefix)
 
-    root_len = len(bucket) + 1
+            return list(_listing_cache[cache_key])
 
-    if without_prefix:
-        prefix_len = len(prefix)
+    return _list_object_names(bucket, prefix, without_prefix)
 
-    subdir_names = glob.glob(f"{root}*")
+
+def _list_object_names(bucket, prefix, without_prefix):
+    """ Walks the directories of the bucket that can hold keys
+        starting with prefix and returns the names of the objects
+
+        Args:
+            bucket (str): Bucket path
+            prefix (str): Prefix for keys
+            withot_prefix (bool)
+        Returns:
+            list: List of object names
+    """
+    if prefix is None:
+        prefix = ""
+
+    # The prefix may end part way through a directory or object name
+    # so we start in the directory holding that name
+    if "/" in prefix:
+        prefix_dir, name_start = prefix.rsplit("/", 1)
+        start_dir = f"{bucket}/{prefix_dir}"
+    else:
+        name_start = prefix
+        start_dir = str(bucket)
+
+    root_len = len(str(bucket)) + 1
+    prefix_len = len(prefix)
 
     object_names = []
 
-    while True:
-        names = subdir_names
-        subdir_names = []
+    try:
+        entries = [e for e in os.scandir(start_dir) if e.name.startswith(name_start)]
+    except (FileNotFoundError, NotADirectoryError):
+        return object_names
 
-        for name in names:
-            if name.endswith("._data"):
+    while entries:
+        subdir_entries = []
+
+        for entry in entries:
+            # Hidden files, such as partially written objects, are not objects
+            if entry.name.startswith("."):
+                continue
+
+            if entry.name.endswith("._data") and entry.is_file():
                 # remove the  ._data at the end
-                name = name[root_len:-6]
-                while name.endswith("/"):
-                    name = name[0:-1]
+                name = entry.path[root_len:-6]
 
                 if without_prefix:
-                    name = name[prefix_len:]
-                    while name.startswith("/"):
-                        name = name[1:]
+                    name = name[prefix_len:].lstrip("/")
 
-                if len(name) > 0:
+                if name:
                     object_names.append(name)
-            elif os.path.isdir(name):
-                subdir_names += glob.glob(f"{name}/*")
+            elif entry.is_dir():
+                subdir_entries.extend(os.scandir(entry.path))
 
-        if len(subdir_names) == 0:
-            break
+        entries = subdir_entries
 
     return object_names
 
 
+def enable_listing_cache(enabled=True):
+    """ Enable or disable caching of object names. Object names listed are cached
+        and the cache is updated when this process sets or deletes objects.
+        Only enable this if no other process writes to the object store.
+
+        Args:
+            enabled (bool, default=True): Enable the cache
+        Returns:
+            None
+    """
+    global _listing_cache_enabled
+
+    with rlock:
+        _listing_cache_enabled = bool(enabled)
+        _listing_cache.clear()
+
+
+def clear_listing_cache():
+    """ Clear the cache of object names
+
+        Returns:
+            None
+    """
+    with rlock:
+        _listing_cache.clear()
+
+
+def _invalidate_listing_cache(bucket, key):
+    """ Remove the cached listings that may hold key
+
+        Args:
+            bucket (str): Bucket path
+            key (str): Key of object set or deleted
+        Returns:
+            None
+    """
+    if not _listing_cache_enabled:
+        return
+
+    bucket = str(bucket)
+
+    with rlock:
+        for cache_key in list(_listing_cache):
+            cache_bucket, prefix, _ = cache_key
+            if cache_bucket == bucket and key.startswith(prefix or ""):
+                del _listing_cache[cache_key]
+
+
+def _key_lock(bucket, key):
+    """ Returns the lock used to serialise writes to key in bucket
+
+        Args:
+            bucket (str): Bucket path
+            key (str): Key to data in bucket
+        Returns:
+            threading.Lock: Lock for key
+    """
+    return _key_locks[hash((str(bucket), key)) % _n_key_locks]
+
+
 def delete_object(bucket, key):
     """ Remove object at key in bucket
 
@@ -97,11 +233,42 @@ def delete_object(bucket, key):
         Returns:
             None
     """
-    key = f"{bucket}/{key}._data"
-    try:
-        os.remove(key)
-    except FileNotFoundError:
-        pass
+    filename = f"{bucket}/{key}._data"
+
+    with _key_lock(bucket, key):
+        try:
+            os.remove(filename)
+        except FileNotFoundError:
+            pass
+
+    _invalidate_listing_cache(bucket=bucket, key=key)
+
+
+@contextmanager
+def lock_object(bucket, key):
+    """ Hold an exclusive lock on key in bucket, used to read, change and
+        write back an object without losing the changes of other writers
+
+        The lock is an flock on a hidden file next to the object so it
+        serialises threads and processes using the same bucket.
+
+        Args:
+            bucket (str): Bucket path
+            key (str): Key to lock
+        Returns:
+            None
+    """
+    import fcntl
+
+    directory, name = f"{bucket}/{key}".rsplit("/", 1)
+    os.makedirs(directory, exist_ok=True)
+
+    with open(f"{directory}/.{name}._lock", "a") as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
 
 
 def get_object_names(bucket, prefix=None):
@@ -124,18 +291,64 @@ def get_object(bucket, key):
         Returns:
             Object: Object from store
     """
-    with rlock:
-        filepath = Path(f"{bucket}/{key}._data")
+    try:
+        with open(f"{bucket}/{key}._data", "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        raise ObjectStoreError(f"No object at key '{key}'")
+
+
+def get_objects(bucket, keys, max_workers=None):
+    """ Gets the objects at the passed keys in the bucket, the
+        objects are read concurrently
+
+        Args:
+            bucket (str): Bucket containing data
+            keys (list): Keys for data in bucket
+            max_workers (int, default=None): Maximum number of objects to read at once,
+            if None objects are read in turn
+        Returns:
+            dict: Objects keyed by key
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    keys = list(keys)
 
-        if filepath.exists():
-            return filepath.read_bytes()
-        else:
-            raise ObjectStoreError(f"No object at key '{key}'")
+    n_workers = max(1, min(int(max_workers or 1), len(keys)))
+
+    if n_workers == 1:
+        return {key: get_object(bucket=bucket, key=key) for key in keys}
+
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        objects = executor.map(lambda key: get_object(bucket=bucket, key=key), keys)
+
+        return dict(zip(keys, objects))
+
+
+def get_object_path(bucket, key):
+    """ Returns the path of the file holding the object at key in the passed bucket.
+        The file may be read directly to avoid copying the object into memory.
+
+        Args:
+            bucket (str): Bucket containing data
+            key (str): Key for data in bucket
+        Returns:
+            str: Path to file
+    """
+    filepath = f"{bucket}/{key}._data"
+
+    if not os.path.isfile(filepath):
+        raise ObjectStoreError(f"No object at key '{key}'")
+
+    return filepath
 
 
 def set_object(bucket, key, data):
     """ Store data in bucket at key
 
+        The data is written to a hidden temporary file next to the object
+        which then replaces the object so readers never see a partial write.
+
         Args:
             bucket (str): Bucket path
             key (str): Key to store data in bucket
@@ -143,18 +356,46 @@ def set_object(bucket, key, data):
         Returns:
             None
     """
+    from tempfile import mkstemp
+
     filename = f"{bucket}/{key}._data"
+    directory, name = filename.rsplit("/", 1)
 
-    with rlock:
+    with _key_lock(bucket, key):
         try:
-            with open(filename, 'wb') as f:
-                f.write(data)
+            fd, tmp_filename = mkstemp(dir=directory, prefix=f".{name}.", suffix=".tmp")
         except FileNotFoundError:
-            dir = "/".join(filename.split("/")[0:-1])
-            os.makedirs(dir, exist_ok=True)
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_filename = mkstemp(dir=directory, prefix=f".{name}.", suffix=".tmp")
 
-            with open(filename, 'wb') as f:
+        try:
+            with open(fd, 'wb') as f:
                 f.write(data)
+                os.fchmod(f.fileno(), _object_mode)
+
+            os.replace(tmp_filename, filename)
+        except BaseException:
+            try:
+                os.remove(tmp_filename)
+            except FileNotFoundError:
+                pass
+            raise
+
+    _invalidate_listing_cache(bucket=bucket, key=key)
+
+
+def set_objects(bucket, data, max_workers=None):
+    """ Store each object in the passed dictionary in bucket at its key
+
+        Args:
+            bucket (str): Bucket path
+            data (dict): Data keyed by key
+            max_workers (int, default=None): Not used, local objects are written in turn
+        Returns:
+            None
+    """
+    for key, value in data.items():
+        set_object(bucket=bucket, key=key, data=value)
 
 
 def set_object_from_json(bucket, key, data):
@@ -205,13 +446,11 @@ def exists(bucket, key):
 
         Args:
             bucket (dict): Bucket containing data
-            key (str): Prefix for key in object store
+            key (str): Key in object store
         Returns:
             bool: True if key exists in store
     """
-    names = get_all_object_names(bucket, prefix=key)
-
-    return len(names) > 0
+    return os.path.isfile(f"{bucket}/{key}._data")
 
 
 def get_bucket():
@@ -245,6 +484,7 @@ def get_local_bucket(empty=False):
         if empty is True:
             shutil.rmtree(local_buckets_dir)
             local_buckets_dir.mkdir(parents=True)
+            clear_listing_cache()
     else:
         local_buckets_dir.mkdir(parents=True)
 
@@ -259,20 +499,24 @@ def query_store():
 
     """
     from collections import defaultdict
-    from HUGS.Modules import Datasource, ObsSurface
+    from HUGS.Modules import Datasource, MetadataIndex, ObsSurface
 
     obs = ObsSurface.load()
 
-    datasource_uuids = obs.datasources()
-    datasources = (Datasource.load(uuid=uuid, shallow=True) for uuid in datasource_uuids)
+    # The metadata we want is held by the index so we don't need to load each Datasource
+    index = MetadataIndex.load()
 
     data = defaultdict(dict)
 
-    for d in datasources:
-        metadata = d.metadata()
+    for uuid in obs.datasources():
+        try:
+            metadata = index.record(uuid)
+        except KeyError:
+            # Datasources saved without updating the index
+            metadata = Datasource.load(uuid=uuid, shallow=True).metadata()
         result = {"site": metadata["site"], "species": metadata["species"], 
                     "instrument": metadata.get("instrument", "Unknown"), "network": metadata.get("network")}
-        data[d.uuid()] = result
+        data[uuid] = result
 
     return data
 
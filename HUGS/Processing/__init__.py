@@ -1,7 +1,11 @@
 from ._attributes import *
+from ._chunked_store import *
+from ._downsample import *
 from ._enums import *
 from ._export import *
 from ._process import *
 from ._recombination import *
+from ._resample import *
+from ._rollup import *
 from ._search import *
 from ._segment import *
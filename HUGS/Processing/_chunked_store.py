@@ -0,0 +1,265 @@
+""" Store xarray Datasets in the object store as per-variable, time-chunked
+    and compressed arrays.
+
+    A Dataset stored in this format has a JSON manifest at its key. The manifest
+    records the dimensions, attributes and dtype of each variable and the time
+    covered by each chunk. The data of each variable is stored separately in chunks
+    along the time dimension at <key>/<variable>/<chunk number>. This allows the
+    variables and times wanted by a query to be read without reading the rest of
+    the data.
+
+"""
+__all__ = [
+    "write_chunked_dataset",
+    "read_chunked_dataset",
+    "is_chunked_manifest",
+]
+
+# Format recorded in the manifest so we can recognise it when reading
+_manifest_format = "hugs_chunked"
+_manifest_version = 1
+# Number of time points in each chunk, a week of 1 minute data
+_default_chunk_size = 10080
+
+
+def write_chunked_dataset(bucket, key, dataset, chunk_size=None):
+    """ Write the passed Dataset to the object store as a manifest
+        and chunks of compressed array data
+
+        Args:
+            bucket (str): Bucket for data storage
+            key (str): Key for Dataset manifest
+            dataset (xarray.Dataset): Dataset to store
+            chunk_size (int, default=None): Number of time points in each chunk
+        Returns:
+            dict: Manifest of stored Dataset
+    """
+    from HUGS.ObjectStore import set_objects, set_object_from_json
+
+    if chunk_size is None:
+        chunk_size = _default_chunk_size
+
+    chunk_size = int(chunk_size)
+
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be a positive integer")
+
+    if "time" in dataset.dims:
+        n_times = dataset.sizes["time"]
+        times = dataset["time"].values.astype("datetime64[ns]").view("int64")
+    else:
+        n_times = 0
+        times = None
+
+    # Record the time covered by each chunk so we can select chunks without reading them
+    chunks = []
+    for start in range(0, n_times, chunk_size):
+        chunk_times = times[start:start + chunk_size]
+        chunks.append({"start": int(chunk_times.min()), "end": int(chunk_times.max()), "size": len(chunk_times)})
+
+    manifest = {
+        "format": _manifest_format,
+        "version": _manifest_version,
+        "chunk_size": chunk_size,
+        "chunks": chunks,
+        "attrs": _json_safe(dataset.attrs),
+        "coords": {},
+        "variables": {},
+    }
+
+    # The chunks are written together before the manifest that references them
+    chunk_data = {}
+
+    for name, variable in dataset.variables.items():
+        dims = list(variable.dims)
+        values = variable.values
+
+        record = {
+            "dims": dims,
+            "dtype": values.dtype.str,
+            "shape": list(values.shape),
+            "attrs": _json_safe(variable.attrs),
+            "keys": [],
+        }
+
+        if "time" in dims:
+            axis = dims.index("time")
+            sections = []
+            for start in range(0, n_times, chunk_size):
+                index = [slice(None)] * values.ndim
+                index[axis] = slice(start, start + chunk_size)
+                sections.append(values[tuple(index)])
+        else:
+            sections = [values]
+
+        for i, section in enumerate(sections):
+            chunk_key = f"{key}/{name}/{i}"
+            chunk_data[chunk_key] = _encode_array(section)
+            record["keys"].append(chunk_key)
+
+        if name in dataset.coords:
+            manifest["coords"][name] = record
+        else:
+            manifest["variables"][name] = record
+
+    set_objects(bucket=bucket, data=chunk_data)
+    set_object_from_json(bucket=bucket, key=key, data=manifest)
+
+    return manifest
+
+
+def read_chunked_dataset(bucket, manifest, variables=None, start_date=None, end_date=None, max_workers=None):
+    """ Read a Dataset from the object store using its manifest. Only the chunks
+        holding the requested variables and times are read.
+
+        Args:
+            bucket (str): Bucket containing data
+            manifest (dict): Manifest of stored Dataset
+            variables (list, default=None): Data variables to read, if None all are read
+            start_date (datetime, default=None): Read data from this time
+            end_date (datetime, default=None): Read data up to and including this time
+            max_workers (int, default=None): Maximum number of chunks to read at once
+        Returns:
+            xarray.Dataset: Dataset
+    """
+    import numpy as np
+    from xarray import Dataset, Variable
+    from HUGS.ObjectStore import get_objects
+    from HUGS.Util import timestamp_tzaware
+
+    if not is_chunked_manifest(manifest):
+        raise ValueError("Invalid chunked Dataset manifest")
+
+    start = timestamp_tzaware(start_date).value if start_date is not None else None
+    end = timestamp_tzaware(end_date).value if end_date is not None else None
+
+    # Select the chunks that overlap the requested times
+    selected = [i for i, c in enumerate(manifest["chunks"])
+                if (end is None or c["start"] <= end) and (start is None or c["end"] >= start)]
+
+    if variables is None:
+        data_vars = list(manifest["variables"])
+    else:
+        if not isinstance(variables, list):
+            variables = [variables]
+        data_vars = [v for v in variables if v in manifest["variables"]]
+
+    records = list(manifest["coords"].values()) + [manifest["variables"][name] for name in data_vars]
+
+    # Read all the chunks we need at once
+    chunk_keys = []
+    for record in records:
+        if "time" in record["dims"]:
+            chunk_keys.extend(record["keys"][i] for i in selected)
+        else:
+            chunk_keys.append(record["keys"][0])
+
+    chunk_data = get_objects(bucket=bucket, keys=chunk_keys, max_workers=max_workers)
+
+    def read_variable(record):
+        dims = record["dims"]
+        dtype = np.dtype(record["dtype"])
+
+        if "time" in dims:
+            axis = dims.index("time")
+            shape = list(record["shape"])
+            sections = []
+            for i in selected:
+                shape[axis] = manifest["chunks"][i]["size"]
+                sections.append(_decode_array(chunk_data[record["keys"][i]], dtype, shape))
+
+            if sections:
+                values = np.concatenate(sections, axis=axis)
+            else:
+                shape[axis] = 0
+                values = np.empty(shape, dtype=dtype)
+        else:
+            values = _decode_array(chunk_data[record["keys"][0]], dtype, record["shape"])
+
+        return Variable(dims=dims, data=values, attrs=record["attrs"])
+
+    coords = {name: read_variable(record) for name, record in manifest["coords"].items()}
+    data = {name: read_variable(manifest["variables"][name]) for name in data_vars}
+
+    ds = Dataset(data_vars=data, coords=coords, attrs=manifest["attrs"])
+
+    # Trim the data in the chunks to the requested times
+    if "time" in ds.dims and (start is not None or end is not None):
+        times = ds["time"].values.astype("datetime64[ns]").view("int64")
+        mask = np.ones(len(times), dtype=bool)
+        if start is not None:
+            mask &= times >= start
+        if end is not None:
+            mask &= times <= end
+        ds = ds.isel(time=np.flatnonzero(mask))
+
+    return ds
+
+
+def is_chunked_manifest(data):
+    """ Check if the passed data is the manifest of a chunked Dataset
+
+        Args:
+            data (dict, bytes): Data read from the object store
+        Returns:
+            bool: True if data is a manifest
+    """
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return bytes(data[:1]) == b"{" and _manifest_format.encode() in bytes(data[:64])
+
+    return isinstance(data, dict) and data.get("format") == _manifest_format
+
+
+def _encode_array(array):
+    """ Compress the bytes of a numpy array
+
+        Args:
+            array (numpy.ndarray): Array
+        Returns:
+            bytes: Compressed array data
+    """
+    import zlib
+    import numpy as np
+
+    if array.dtype.kind == "O":
+        raise TypeError("Variables of object dtype cannot be stored in chunked format")
+
+    return zlib.compress(np.ascontiguousarray(array).tobytes(), 6)
+
+
+def _decode_array(data, dtype, shape):
+    """ Decompress array data written by _encode_array
+
+        Args:
+            data (bytes): Compressed data
+            dtype (numpy.dtype): dtype of array
+            shape (list): Shape of array
+        Returns:
+            numpy.ndarray: Array
+    """
+    import zlib
+    import numpy as np
+
+    return np.frombuffer(zlib.decompress(data), dtype=dtype).reshape(shape).copy()
+
+
+def _json_safe(attrs):
+    """ Convert numpy types in an attributes dictionary to their Python equivalents
+        so they can be stored as JSON
+
+        Args:
+            attrs (dict): Attributes
+        Returns:
+            dict: JSON serialisable attributes
+    """
+    import numpy as np
+
+    safe = {}
+    for k, v in attrs.items():
+        if isinstance(v, np.ndarray):
+            v = v.tolist()
+        elif isinstance(v, np.generic):
+            v = v.item()
+        safe[str(k)] = v
+
+    return safe
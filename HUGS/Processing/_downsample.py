@@ -0,0 +1,184 @@
+""" Reduce the number of points in a timeseries for plotting
+
+    Only the points needed to draw the shape of the data at the width of
+    the plot are kept so large amounts of data can be plotted in the browser.
+
+"""
+__all__ = ["minmax_indices", "lttb_indices", "downsample_timeseries"]
+
+
+def _to_float(x):
+    """ Convert x values, which may be datetimes, to floats relative to the first value
+
+        Args:
+            x (numpy.ndarray): Sorted x values
+        Returns:
+            numpy.ndarray: Float values
+    """
+    import numpy as np
+
+    x = np.asarray(x)
+
+    if x.dtype.kind in "mM":
+        x = x.view("int64")
+
+    if x.size == 0:
+        return x.astype(float)
+
+    return (x - x[0]).astype(float)
+
+
+def minmax_indices(x, y, n_buckets):
+    """ Find the points to keep to draw the data in n_buckets equal width buckets of x,
+        such as the pixel columns of a plot
+
+        The points with the minimum and maximum y values in each bucket are kept
+        along with the first and last points, so peaks aren't lost. The first
+        missing value after each run of values is kept so gaps in the data are still drawn.
+
+        Args:
+            x (numpy.ndarray): Sorted x values, may be datetimes
+            y (numpy.ndarray): y values
+            n_buckets (int): Number of buckets
+        Returns:
+            numpy.ndarray: Sorted indices of the points to keep, at most 2 * n_buckets + 2
+            plus one for each gap in the data
+    """
+    import numpy as np
+
+    if n_buckets < 1:
+        raise ValueError("n_buckets must be at least 1")
+
+    y = np.asarray(y, dtype=float)
+    n_points = y.size
+
+    if n_points <= 2 * n_buckets:
+        return np.arange(n_points)
+
+    x = _to_float(x)
+
+    span = x[-1]
+    if span > 0:
+        bucket = np.minimum((x / span * n_buckets).astype(int), n_buckets - 1)
+    else:
+        bucket = np.zeros(n_points, dtype=int)
+
+    finite = ~np.isnan(y)
+    finite_idx = np.flatnonzero(finite)
+
+    gap_starts = np.flatnonzero(~finite & np.concatenate(([True], finite[:-1])))
+
+    # With no values there are no minima or maxima, only the gaps to draw
+    if finite_idx.size == 0:
+        return np.unique(np.concatenate((gap_starts, [0, n_points - 1])))
+
+    # Sort by bucket then value so each bucket's minimum is first and its maximum is last
+    order = finite_idx[np.lexsort((y[finite_idx], bucket[finite_idx]))]
+    sorted_buckets = bucket[order]
+    bucket_change = sorted_buckets[1:] != sorted_buckets[:-1]
+    minima = order[np.concatenate(([True], bucket_change))]
+    maxima = order[np.concatenate((bucket_change, [True]))]
+
+    return np.unique(np.concatenate((minima, maxima, gap_starts, [0, n_points - 1])))
+
+
+def lttb_indices(x, y, n_out):
+    """ Find the points to keep using the largest triangle three buckets algorithm
+
+        This keeps n_out points that preserve the visual shape of the data,
+        see https://skemman.is/handle/1946/15343. Missing values are ignored.
+
+        Args:
+            x (numpy.ndarray): Sorted x values, may be datetimes
+            y (numpy.ndarray): y values
+            n_out (int): Number of points to keep, must be at least 3
+        Returns:
+            numpy.ndarray: Sorted indices of the points to keep
+    """
+    import numpy as np
+
+    if n_out < 3:
+        raise ValueError("n_out must be at least 3")
+
+    y = np.asarray(y, dtype=float)
+    finite_idx = np.flatnonzero(~np.isnan(y))
+
+    n_points = finite_idx.size
+    if n_points <= n_out:
+        return finite_idx
+
+    x = _to_float(x)[finite_idx]
+    y = y[finite_idx]
+
+    # The first and last points are always kept, the rest are split into n_out - 2 buckets
+    edges = np.linspace(1, n_points - 1, n_out - 1).astype(int)
+
+    selected = np.empty(n_out, dtype=int)
+    selected[0] = 0
+    selected[-1] = n_points - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+
+        # The third point of the triangle is the average of the next bucket
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], edges[i + 2]
+        else:
+            next_start, next_end = n_points - 1, n_points
+
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        areas = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+
+    return finite_idx[selected]
+
+
+def downsample_timeseries(variable, n_buckets, start_date=None, end_date=None, method="minmax"):
+    """ Select the points of a timeseries to plot
+
+        If start_date or end_date are passed only the data between them, and the
+        points either side of them, is downsampled so zooming in shows more detail.
+
+        Args:
+            variable (xarray.DataArray): Variable with a time dimension
+            n_buckets (int): Number of buckets to split the data into, the width of
+            the plot in pixels works well
+            start_date (datetime, default=None): Start of plotted times
+            end_date (datetime, default=None): End of plotted times
+            method (str, default="minmax"): Downsampling method, minmax or lttb,
+            see minmax_indices and lttb_indices
+        Returns:
+            tuple (numpy.ndarray, numpy.ndarray): Times and values to plot
+    """
+    import numpy as np
+    from HUGS.Util import timestamp_tzaware
+
+    times = variable.time.values
+    values = variable.values
+
+    # The time coordinate of stored data is timezone naive UTC
+    start = 0
+    end = times.size
+    if start_date is not None:
+        start_date = timestamp_tzaware(start_date).tz_localize(None)
+        start = max(int(np.searchsorted(times, start_date.to_datetime64(), side="left")) - 1, 0)
+    if end_date is not None:
+        end_date = timestamp_tzaware(end_date).tz_localize(None)
+        end = min(int(np.searchsorted(times, end_date.to_datetime64(), side="right")) + 1, times.size)
+
+    times = times[start:end]
+    values = values[start:end]
+
+    if method == "minmax":
+        idx = minmax_indices(x=times, y=values, n_buckets=n_buckets)
+    elif method == "lttb":
+        idx = lttb_indices(x=times, y=values, n_out=2 * n_buckets)
+    else:
+        raise ValueError(f"Invalid method {method}, valid methods are minmax and lttb")
+
+    return times[idx], values[idx]
@@ -2,42 +2,145 @@
     into the data requested by the user
 
 """
-__all__ = ["recombine_sections"]
+__all__ = ["recombine_sections", "recombine_resampled"]
 
 
-def recombine_sections(data_keys):
+def recombine_sections(data_keys, variables=None, start_date=None, end_date=None, max_workers=None):
     """ Combines separate dataframes into a single dataframe for
         processing to NetCDF for output
 
+        The segments are read from the object store together and combined
+        in time order, see Datasource.load_datasets.
+
         Args:
             data_keys (list): Dictionary of object store keys keyed by search
             term
+            variables (list, default=None): Data variables to read, if None all are read
+            start_date (datetime, default=None): Only read data from this time
+            end_date (datetime, default=None): Only read data up to and including this time
+            max_workers (int, default=None): Maximum number of segments to read at once
+            from the object store
         Returns:
             Pandas.Dataframe or list: Combined dataframes
     """
-    # from pandas import concat as _concat
     from xarray import concat as xr_concat
     from HUGS.ObjectStore import get_bucket
     from HUGS.Modules import Datasource
 
     bucket = get_bucket()
 
-    data = [Datasource.load_dataset(bucket=bucket, key=k) for k in data_keys]
+    # Keys end with the daterange of the segment, ordering by the daterange
+    # orders the segments by their start time
+    data_keys = sorted(data_keys, key=lambda k: k.split("/")[-1])
+
+    data = Datasource.load_datasets(bucket=bucket, keys=data_keys, variables=variables, start_date=start_date,
+                                    end_date=end_date, max_workers=max_workers)
+
+    # Each data segment is sorted by time but segments can overlap. Data is segmented
+    # by season within each year so the DJF segment of a year holds January, February
+    # and December. The segments are merged in time order without sorting the combined data
+    data = [ds if ds.indexes["time"].is_monotonic_increasing else ds.sortby("time") for ds in data]
 
     combined = xr_concat(data, dim="time")
 
-    combined = combined.sortby("time")
+    order = _merge_order([ds.time.values for ds in data])
+
+    if order is not None:
+        combined = combined.isel(time=order)
 
     # Check for duplicates?
     # This is taken from https://stackoverflow.com/questions/51058379/drop-duplicate-times-in-xarray
     # _, index = np.unique(f['time'], return_index=True)
     # f.isel(time=index)
 
-    # Check that the dataframe's index is sorted by date
-    # if not combined.time.is_monotonic_increasing:
-    #     combined = combined.sortby("time")
+    return combined
 
-    # if not combined.index.is_unique:
-    #     raise ValueError("Dataframe index is not unique")
 
-    return combined
+def _merge_order(times):
+    """ Find the order of the times of several sorted segments once merged
+
+        Pairs of segments are merged in turn, each merge finds where the times of one
+        segment fall in the other by bisection, so k segments of n times in total are
+        merged in O(n log k) merges rather than sorting all the times.
+
+        Args:
+            times (list): List of sorted arrays of times
+        Returns:
+            numpy.ndarray or None: Indices of the concatenated times in time order, None if
+            the concatenated times are already in order
+    """
+    import numpy as np
+
+    # Segments that don't overlap the previous segment don't need merging
+    non_empty = [t for t in times if t.size]
+    if all(a[-1] <= b[0] for a, b in zip(non_empty, non_empty[1:])):
+        return None
+
+    offsets = np.cumsum([0] + [t.size for t in times[:-1]])
+    runs = [(t, np.arange(t.size) + offset) for t, offset in zip(times, offsets)]
+
+    while len(runs) > 1:
+        merged = []
+        for i in range(0, len(runs) - 1, 2):
+            (times_a, idx_a), (times_b, idx_b) = runs[i], runs[i + 1]
+
+            # Equal times from the earlier segment come first
+            positions_b = np.searchsorted(times_a, times_b, side="right") + np.arange(times_b.size)
+            from_b = np.zeros(times_a.size + times_b.size, dtype=bool)
+            from_b[positions_b] = True
+
+            merged_times = np.empty(from_b.size, dtype=times_a.dtype)
+            merged_times[from_b] = times_b
+            merged_times[~from_b] = times_a
+
+            merged_idx = np.empty(from_b.size, dtype=idx_a.dtype)
+            merged_idx[from_b] = idx_b
+            merged_idx[~from_b] = idx_a
+
+            merged.append((merged_times, merged_idx))
+
+        if len(runs) % 2:
+            merged.append(runs[-1])
+
+        runs = merged
+
+    return runs[0][1]
+
+
+def recombine_resampled(data_keys, average, keep_missing=False, variables=None, start_date=None, end_date=None,
+                        daterange_start=None, daterange_end=None):
+    """ Combines separate dataframes and averages the combined data
+
+        If the data has rollups that can be averaged to the requested period they're read
+        instead of the data itself, see HUGS.Processing.rollup_level. Otherwise the data is
+        read and averaged, see HUGS.Processing.resample_observations.
+
+        Args:
+            data_keys (list): Object store keys of data
+            average (str): Averaging period such as 2H
+            keep_missing (bool, default=False): If True add periods with no data between
+            daterange_start and daterange_end
+            variables (list, default=None): Data variables to read, if None all are read
+            start_date (datetime, default=None): Only read data from this time
+            end_date (datetime, default=None): Only read data up to and including this time
+            daterange_start (Timestamp, default=None): Start of the daterange of the data
+            daterange_end (Timestamp, default=None): End of the daterange of the data
+        Returns:
+            xarray.Dataset: Averaged data
+    """
+    from HUGS.Processing import recombine_rollups, resample_observations, resample_rollup, rollup_level
+
+    level = rollup_level(average=average, start_date=start_date, end_date=end_date)
+
+    if level is not None:
+        rollup = recombine_rollups(data_keys=data_keys, level=level, variables=variables, start_date=start_date,
+                                   end_date=end_date)
+
+        if rollup is not None:
+            return resample_rollup(rollup=rollup, average=average, keep_missing=keep_missing,
+                                   start_date=daterange_start, end_date=daterange_end)
+
+    combined = recombine_sections(data_keys=data_keys, variables=variables, start_date=start_date, end_date=end_date)
+
+    return resample_observations(combined, average=average, keep_missing=keep_missing, start_date=daterange_start,
+                                 end_date=daterange_end)
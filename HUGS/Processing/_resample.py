@@ -0,0 +1,168 @@
+""" Resample observation data to a lower time resolution
+
+"""
+__all__ = ["grouped_statistics", "resample_observations", "period_codes", "averaged_values"]
+
+
+def grouped_statistics(values, codes, n_groups):
+    """ Calculate the statistics of each group of values in a single pass over the data
+
+        Values are shifted by the first finite value before the sums are taken
+        so the variance is accurate for data with a large mean and small spread.
+
+        Args:
+            values (numpy.ndarray): 1D array of values
+            codes (numpy.ndarray): Index of the group of each value
+            n_groups (int): Number of groups
+        Returns:
+            dict: Arrays of mean, std, count, sum_squares and n_missing for each group.
+            The mean and std skip NaNs, the standard deviation has zero degrees of freedom.
+            sum_squares is the sum of the squares of the unshifted values.
+    """
+    import numpy as np
+
+    values = np.asarray(values, dtype=float)
+    missing = np.isnan(values)
+
+    finite = values[~missing]
+    shift = finite[0] if finite.size else 0.0
+
+    filled = np.where(missing, 0.0, values)
+    shifted = np.where(missing, 0.0, values - shift)
+
+    count = np.bincount(codes, weights=~missing, minlength=n_groups)
+    n_missing = np.bincount(codes, weights=missing, minlength=n_groups)
+    shifted_sum = np.bincount(codes, weights=shifted, minlength=n_groups)
+    shifted_sum_squares = np.bincount(codes, weights=shifted * shifted, minlength=n_groups)
+    sum_squares = np.bincount(codes, weights=filled * filled, minlength=n_groups)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        shifted_mean = shifted_sum / count
+        variance = np.maximum(shifted_sum_squares / count - shifted_mean ** 2, 0.0)
+
+    return {
+        "mean": shifted_mean + shift,
+        "std": np.sqrt(variance),
+        "count": count,
+        "sum_squares": sum_squares,
+        "n_missing": n_missing,
+    }
+
+
+def resample_observations(data, average, keep_missing=False, start_date=None, end_date=None):
+    """ Resample observation data to the averaging period
+
+        Each variable is averaged using the mean of the values in each period.
+        Variables with repeatability in their name are combined in quadrature and
+        divided by the number of measurements and variables with variability in
+        their name are given the standard deviation of the values in each period.
+        If a period has any missing values its mean and variability are missing.
+        The periods added by keep_missing don't change the averages of periods
+        holding data, including the periods start_date and end_date fall in.
+
+        All the statistics are calculated together in a single pass over each variable,
+        see grouped_statistics.
+
+        Args:
+            data (xarray.Dataset): Observation data
+            average (str): Averaging period in a format that pandas can interpret such as 2H
+            keep_missing (bool, default=False): If True add periods with no data between
+            start_date and end_date
+            start_date (Timestamp, default=None): Start of data, used if keep_missing is True
+            end_date (Timestamp, default=None): End of data, used if keep_missing is True
+        Returns:
+            xarray.Dataset: Resampled data
+    """
+    from pandas import DatetimeIndex
+    from xarray import Dataset
+
+    if not data.indexes["time"].is_monotonic_increasing:
+        data = data.sortby("time")
+
+    codes, periods = period_codes(times=DatetimeIndex(data.time.values), average=average, keep_missing=keep_missing,
+                                  start_date=start_date, end_date=end_date)
+
+    data_vars = {}
+    for name, variable in data.data_vars.items():
+        if variable.dims != ("time",):
+            data_vars[name] = variable
+            continue
+
+        if variable.dtype.kind not in "biuf":
+            continue
+
+        stats = grouped_statistics(values=variable.values, codes=codes, n_groups=len(periods))
+
+        attrs = {k: variable.attrs[k] for k in ("long_name", "units") if k in variable.attrs}
+        data_vars[name] = ("time", averaged_values(name=name, stats=stats), attrs)
+
+    resampled = Dataset(data_vars=data_vars, coords={"time": periods.values}, attrs=data.attrs.copy())
+
+    return resampled
+
+
+def period_codes(times, average, keep_missing=False, start_date=None, end_date=None):
+    """ Find the averaging period of each time
+
+        Args:
+            times (pandas.DatetimeIndex): Sorted timezone naive UTC times
+            average (str): Averaging period in a format that pandas can interpret such as 2H
+            keep_missing (bool, default=False): If True add periods with no data between
+            start_date and end_date
+            start_date (Timestamp, default=None): Start of data, used if keep_missing is True
+            end_date (Timestamp, default=None): End of data, used if keep_missing is True
+        Returns:
+            tuple (numpy.ndarray, pandas.DatetimeIndex): Index of the period of each time and the
+            start of each period
+    """
+    import numpy as np
+    from pandas import DatetimeIndex, Series, Timedelta
+    from HUGS.Util import timestamp_tzaware
+
+    # Empty periods are added by including the start and end dates when creating the periods,
+    # the time coordinate of the data is timezone naive UTC
+    pad_start = None
+    pad_end = None
+    if keep_missing and len(times) > 0:
+        if start_date is not None and times[0] > timestamp_tzaware(start_date).tz_localize(None):
+            pad_start = timestamp_tzaware(start_date).tz_localize(None)
+        if end_date is not None and times[-1] < timestamp_tzaware(end_date).tz_localize(None):
+            pad_end = timestamp_tzaware(end_date).tz_localize(None) - Timedelta("1ns")
+
+    period_times = times
+    if pad_start is not None:
+        period_times = DatetimeIndex([pad_start]).append(period_times)
+    if pad_end is not None:
+        period_times = period_times.append(DatetimeIndex([pad_end]))
+
+    # The times are sorted so each period holds a run of values
+    period_counts = Series(np.ones(len(period_times)), index=period_times).resample(average).count()
+    codes = np.repeat(np.arange(len(period_counts)), period_counts.values.astype(int))
+
+    # Remove the codes of the padding times
+    if pad_start is not None:
+        codes = codes[1:]
+    if pad_end is not None:
+        codes = codes[:-1]
+
+    return codes, period_counts.index
+
+
+def averaged_values(name, stats):
+    """ Select the averaged values of a variable from the statistics of each period
+
+        Args:
+            name (str): Name of variable
+            stats (dict): Statistics of each period, see grouped_statistics
+        Returns:
+            numpy.ndarray: Averaged values
+    """
+    import numpy as np
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        if "repeatability" in name:
+            return np.sqrt(stats["sum_squares"]) / stats["count"]
+        elif "variability" in name:
+            return np.where(stats["n_missing"] > 0, np.nan, stats["std"])
+        else:
+            return np.where(stats["n_missing"] > 0, np.nan, stats["mean"])
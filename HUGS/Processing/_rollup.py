@@ -0,0 +1,272 @@
+""" Rollups hold the statistics of observation data over fixed periods so
+    averaged data can be created without reading every measurement
+
+    A rollup is stored next to each segment of data for each level in
+    rollup_levels. The statistics of each period are those of grouped_statistics
+    and combine exactly so the rollups of several segments can be averaged to
+    any period that's a whole number of rollup periods.
+
+"""
+__all__ = [
+    "rollup_levels",
+    "rollup_key",
+    "rollup_level",
+    "create_rollup",
+    "combine_rollups",
+    "resample_rollup",
+    "recombine_rollups",
+]
+
+# Rollup levels and the pandas frequency of their periods, coarsest first
+rollup_levels = {"1mo": "MS", "1d": "1D", "1h": "1H"}
+
+# Statistics held for each variable in a rollup
+_statistics = ["count", "n_missing", "mean", "std", "sum_squares"]
+
+
+def rollup_key(data_key, level):
+    """ Returns the object store key of the rollup of the data at data_key
+
+        Args:
+            data_key (str): Object store key of data
+            level (str): Rollup level, see rollup_levels
+        Returns:
+            str: Object store key
+    """
+    return f"{data_key}/rollup/{level}"
+
+
+def rollup_level(average, start_date=None, end_date=None):
+    """ Find the coarsest rollup level that can be averaged to give data
+        averaged over the passed period
+
+        Each averaging period must be a whole number of rollup periods and
+        start_date and end_date, if passed, must be at the start of a rollup period.
+
+        Args:
+            average (str): Averaging period in a format that pandas can interpret such as 2H
+            start_date (datetime, default=None): Start of selected times
+            end_date (datetime, default=None): End of selected times, this time is included
+        Returns:
+            str or None: Rollup level or None if no level can be used
+    """
+    from pandas import Timedelta
+    from pandas.tseries.frequencies import to_offset
+    from pandas.tseries.offsets import MonthBegin, Tick, YearBegin
+    from HUGS.Util import timestamp_tzaware
+
+    try:
+        offset = to_offset(average)
+    except ValueError:
+        return None
+
+    levels = []
+    if isinstance(offset, (MonthBegin, YearBegin)):
+        levels = list(rollup_levels)
+    elif isinstance(offset, Tick):
+        levels = [level for level, freq in rollup_levels.items()
+                  if freq != "MS" and offset.nanos % Timedelta(freq).value == 0]
+
+    # The selected times must cover whole rollup periods
+    bounds = []
+    if start_date is not None:
+        bounds.append(timestamp_tzaware(start_date).tz_localize(None))
+    if end_date is not None:
+        bounds.append(timestamp_tzaware(end_date).tz_localize(None) + Timedelta("1ns"))
+
+    for level in levels:
+        if all(_is_period_start(timestamp=b, level=level) for b in bounds):
+            return level
+
+    return None
+
+
+def _is_period_start(timestamp, level):
+    """ Check if the timestamp is at the start of a rollup period
+
+        Args:
+            timestamp (Timestamp): Timezone naive UTC timestamp
+            level (str): Rollup level, see rollup_levels
+        Returns:
+            bool: True if at the start of a period
+    """
+    freq = rollup_levels[level]
+
+    if freq == "MS":
+        return timestamp == timestamp.normalize() and timestamp.day == 1
+
+    return timestamp == timestamp.floor(freq)
+
+
+def create_rollup(data, level):
+    """ Create the rollup of observation data
+
+        Only numeric variables with a time dimension are included.
+
+        Args:
+            data (xarray.Dataset): Observation data
+            level (str): Rollup level, see rollup_levels
+        Returns:
+            xarray.Dataset: Statistics of each period that holds data, each variable
+            has time and statistic dimensions
+    """
+    import numpy as np
+    from pandas import DatetimeIndex
+    from xarray import Dataset
+    from HUGS.Processing import grouped_statistics, period_codes
+
+    if not data.indexes["time"].is_monotonic_increasing:
+        data = data.sortby("time")
+
+    codes, periods = period_codes(times=DatetimeIndex(data.time.values), average=rollup_levels[level])
+    n_periods = len(periods)
+
+    # Periods without any data aren't stored
+    occupied = np.bincount(codes, minlength=n_periods) > 0
+
+    data_vars = {}
+    for name, variable in data.data_vars.items():
+        if variable.dims != ("time",) or variable.dtype.kind not in "biuf":
+            continue
+
+        stats = grouped_statistics(values=variable.values, codes=codes, n_groups=n_periods)
+        values = np.stack([stats[s] for s in _statistics], axis=1)[occupied]
+
+        attrs = {k: variable.attrs[k] for k in ("long_name", "units") if k in variable.attrs}
+        data_vars[name] = (("time", "statistic"), values, attrs)
+
+    coords = {"time": periods.values[occupied], "statistic": _statistics}
+
+    return Dataset(data_vars=data_vars, coords=coords, attrs=data.attrs.copy())
+
+
+def _merge_statistics(values, codes, n_groups):
+    """ Combine the statistics of each group of periods
+
+        Args:
+            values (numpy.ndarray): Array of statistics with shape (periods, statistics)
+            codes (numpy.ndarray): Index of the group of each period
+            n_groups (int): Number of groups
+        Returns:
+            dict: Arrays of mean, std, count, sum_squares and n_missing for each group
+    """
+    import numpy as np
+
+    count, n_missing, mean, std, sum_squares = (values[:, i] for i in range(len(_statistics)))
+
+    occupied = count > 0
+    # Shift the means to keep the combined variance accurate, see grouped_statistics
+    shift = mean[occupied][0] if occupied.any() else 0.0
+    shifted_mean = np.where(occupied, mean - shift, 0.0)
+
+    total_count = np.bincount(codes, weights=count, minlength=n_groups)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        total_mean = np.bincount(codes, weights=count * shifted_mean, minlength=n_groups) / total_count
+        # Sum of squared deviations from the mean of each group
+        deviations = np.where(occupied, count * (std ** 2 + (shifted_mean - total_mean[codes]) ** 2), 0.0)
+        variance = np.bincount(codes, weights=deviations, minlength=n_groups) / total_count
+
+    return {
+        "mean": total_mean + shift,
+        "std": np.sqrt(variance),
+        "count": total_count,
+        "sum_squares": np.bincount(codes, weights=sum_squares, minlength=n_groups),
+        "n_missing": np.bincount(codes, weights=n_missing, minlength=n_groups),
+    }
+
+
+def combine_rollups(rollups):
+    """ Combine the rollups of several segments of data
+
+        Statistics of periods held by more than one rollup are combined.
+
+        Args:
+            rollups (list): List of rollup Datasets
+        Returns:
+            xarray.Dataset: Combined rollup
+    """
+    import numpy as np
+    from xarray import Dataset, concat as xr_concat
+
+    combined = xr_concat(rollups, dim="time")
+
+    times, codes = np.unique(combined.time.values, return_inverse=True)
+
+    if len(times) == combined.time.size:
+        if not combined.indexes["time"].is_monotonic_increasing:
+            combined = combined.sortby("time")
+        return combined
+
+    data_vars = {}
+    for name, variable in combined.data_vars.items():
+        stats = _merge_statistics(values=variable.values, codes=codes, n_groups=len(times))
+        values = np.stack([stats[s] for s in _statistics], axis=1)
+        data_vars[name] = (("time", "statistic"), values, variable.attrs)
+
+    coords = {"time": times, "statistic": _statistics}
+
+    return Dataset(data_vars=data_vars, coords=coords, attrs=combined.attrs)
+
+
+def resample_rollup(rollup, average, keep_missing=False, start_date=None, end_date=None):
+    """ Average data over the passed period using its rollup
+
+        This gives the same result as resample_observations on the data the rollup
+        was created from as long as each averaging period is made up of whole
+        rollup periods, see rollup_level.
+
+        Args:
+            rollup (xarray.Dataset): Rollup, see combine_rollups
+            average (str): Averaging period in a format that pandas can interpret such as 2H
+            keep_missing (bool, default=False): If True add periods with no data between
+            start_date and end_date
+            start_date (Timestamp, default=None): Start of data, used if keep_missing is True
+            end_date (Timestamp, default=None): End of data, used if keep_missing is True
+        Returns:
+            xarray.Dataset: Resampled data
+    """
+    from pandas import DatetimeIndex
+    from xarray import Dataset
+    from HUGS.Processing import averaged_values, period_codes
+
+    codes, periods = period_codes(times=DatetimeIndex(rollup.time.values), average=average,
+                                  keep_missing=keep_missing, start_date=start_date, end_date=end_date)
+
+    data_vars = {}
+    for name, variable in rollup.data_vars.items():
+        stats = _merge_statistics(values=variable.values, codes=codes, n_groups=len(periods))
+        data_vars[name] = ("time", averaged_values(name=name, stats=stats), variable.attrs)
+
+    return Dataset(data_vars=data_vars, coords={"time": periods.values}, attrs=rollup.attrs.copy())
+
+
+def recombine_rollups(data_keys, level, variables=None, start_date=None, end_date=None, max_workers=None):
+    """ Read and combine the rollups of the data at the passed keys
+
+        Args:
+            data_keys (list): Object store keys of data
+            level (str): Rollup level, see rollup_levels
+            variables (list, default=None): Data variables to read, if None all are read
+            start_date (datetime, default=None): Only read periods starting from this time
+            end_date (datetime, default=None): Only read periods starting up to and including this time
+            max_workers (int, default=None): Maximum number of rollups to read at once
+            from the object store
+        Returns:
+            xarray.Dataset or None: Combined rollup or None if any of the data doesn't have a rollup
+    """
+    from HUGS.ObjectStore import exists, get_bucket
+    from HUGS.Modules import Datasource
+
+    bucket = get_bucket()
+
+    keys = [rollup_key(data_key=k, level=level) for k in data_keys]
+
+    # Data stored before rollups were added doesn't have them
+    if not keys or not all(exists(bucket=bucket, key=k) for k in keys):
+        return None
+
+    rollups = Datasource.load_datasets(bucket=bucket, keys=keys, variables=variables, start_date=start_date,
+                                       end_date=end_date, max_workers=max_workers)
+
+    return combine_rollups(rollups)
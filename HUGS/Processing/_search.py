@@ -40,9 +40,8 @@ def search(
     """
     from collections import defaultdict
     from json import load
-    from HUGS.Modules import Datasource, ObsSurface
-    from HUGS.Util import (get_datetime_now, get_datetime_epoch, create_daterange_str, 
-                            timestamp_tzaware, get_datapath)
+    from HUGS.Modules import Datasource, MetadataIndex, ObsSurface
+    from HUGS.Util import get_datetime_now, get_datetime_epoch, timestamp_tzaware, get_datapath
 
     # if species is not None and not isinstance(species, list):
     if not isinstance(species, list):
@@ -82,18 +81,32 @@ def search(
 
     # Here we want to load in the ObsSurface module for now
     obs = ObsSurface.load()
-    datasource_uuids = obs.datasources()
+    obs_uuids = set(obs.datasources())
 
-    # Shallow load the Datasources so we can search their metadata
-    datasources = [Datasource.load(uuid=uuid, shallow=True) for uuid in datasource_uuids]
+    # Use the metadata index to find the Datasources that may match our search terms
+    # so we only have to shallow load those Datasources. The index matches values
+    # of any metadata field so the search_metadata checks below still decide the results
+    index = MetadataIndex.load()
 
+    # Datasources loaded so far, keyed by UUID
+    loaded = {}
     # First we find the Datasources from locations we want to narrow down our search
     location_sources = defaultdict(list)
     # If we have locations to search
     for location in locations:
-        for datasource in datasources:
-            if datasource.search_metadata(search_terms=location):
-                location_sources[location].append(datasource)
+        uuids = set()
+        for sp in species:
+            uuids.update(index.search_values([location, sp, inlet, instrument]))
+
+        for uuid in sorted(uuids):
+            if uuid not in obs_uuids:
+                continue
+
+            if uuid not in loaded:
+                loaded[uuid] = Datasource.load(uuid=uuid, shallow=True)
+
+            if loaded[uuid].search_metadata(search_terms=location):
+                location_sources[location].append(loaded[uuid])
 
     # This is returned to the caller
     results = defaultdict(dict)
@@ -105,9 +118,8 @@ def search(
                 for datasource in sources:
                     # Just match the single source here
                     if datasource.search_metadata(search_terms=[sp, site, inlet, instrument], find_all=True):
-                        daterange_str = create_daterange_str(start=start_datetime, end=end_datetime)
                         # Get the data keys for the data in the matching daterange
-                        in_date = datasource.in_daterange(daterange=daterange_str)
+                        in_date = datasource.in_daterange(start_date=start_datetime, end_date=end_datetime)
 
                         data_date_str = strip_dates_keys(in_date)
 
@@ -157,8 +169,7 @@ def search(
                 for source in sources:
                     key = f"{source.species()}_{source.site()}_{source.inlet()}_{source.instrument()}".lower()
 
-                    daterange_str = create_daterange_str(start=start_datetime, end=end_datetime)
-                    data_keys = source.in_daterange(daterange=daterange_str)
+                    data_keys = source.in_daterange(start_date=start_datetime, end_date=end_datetime)
 
                     if not data_keys:
                         continue
@@ -209,14 +220,15 @@ def strip_dates_keys(keys):
 
         Args:
             keys (list): List of keys containing data
-            data/uuid/<uuid>/<version>/2019-03-01-04:14:30+00:00_2019-05-31-20:44:30+00:00
+            data/uuid/<uuid>/<hash>/2019-03-01-04:14:30+00:00_2019-05-31-20:44:30+00:00
         Returns:
             str: Daterange string
     """
     if not isinstance(keys, list):
         keys = [keys]
 
-    keys.sort()
+    # Sort by the daterange at the end of the key
+    keys.sort(key=lambda k: k.split("/")[-1])
     start_key = keys[0]
     end_key = keys[-1]
     # Get the first and last dates from the keys in the search results
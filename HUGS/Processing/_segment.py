@@ -1,7 +1,7 @@
 """ Segment the data into Datasources
 
 """
-__all__ = ["get_split_frequency", "create_footprint_datasources", "assign_data"]
+__all__ = ["get_split_frequency", "create_footprint_datasources", "assign_data", "assign_data_batch"]
 
 # def create_datasources(gas_data):
 #     """ Create or get an existing Datasource for each gas in the file
@@ -43,23 +43,48 @@ __all__ = ["get_split_frequency", "create_footprint_datasources", "assign_data"]
 #     return uuids
 
 
-def assign_data(gas_data, lookup_results, overwrite):
+def assign_data(gas_data, lookup_results, overwrite, storage_format=None):
     """ Create or get an existing Datasource for each gas in the file
 
         Args:
             gas_data (dict): Dictionary containing data and metadata for species
+            lookup_results (dict): Dictionary of Datasource names and UUIDs keyed by species
+            overwrite (bool): Should existing data be overwritten
+            storage_format (str, default=None): Format to store data in, see
+            Datasource.set_storage_format
         Returns:
             dict: Dictionary of UUIDs of Datasources data has been assigned to keyed by species name
     """
-    from HUGS.Modules import Datasource
+    datasource_data = {}
+    for species in gas_data:
+        name = lookup_results[species]["name"]
+        datasource_data[name] = {"uuid": lookup_results[species]["uuid"], "data": [gas_data[species]]}
+
+    return assign_data_batch(datasource_data=datasource_data, overwrite=overwrite, storage_format=storage_format)
+
+
+def assign_data_batch(datasource_data, overwrite, storage_format=None):
+    """ Add data from a batch of files to Datasources. Each Datasource is loaded
+        (or created) and saved only once, however many files hold data for it,
+        and the MetadataIndex is updated once for the whole batch.
+
+        Args:
+            datasource_data (dict): Keyed by Datasource name, each value a dictionary containing
+            the UUID of the Datasource ("uuid", False if new) and a list of dictionaries of
+            data and metadata to add ("data"), in the order it should be added
+            overwrite (bool): Should existing data be overwritten
+            storage_format (str, default=None): Format to store data in, see
+            Datasource.set_storage_format
+        Returns:
+            dict: Dictionary of UUIDs of Datasources data has been assigned to keyed by Datasource name
+    """
+    from HUGS.Modules import Datasource, MetadataIndex
 
     uuids = {}
+    metadata = {}
     # Add in copying of attributes, or add attributes to the metadata at an earlier state.
-    for species in gas_data:
-        metadata = gas_data[species]["metadata"]
-        data = gas_data[species]["data"]
-        name = lookup_results[species]["name"]
-        uuid = lookup_results[species]["uuid"]
+    for name, datasource_info in datasource_data.items():
+        uuid = datasource_info["uuid"]
 
         # If we have a UUID for this Datasource load the existing object
         # from the object store
@@ -68,12 +93,21 @@ def assign_data(gas_data, lookup_results, overwrite):
         else:
             datasource = Datasource(name=name)
 
-        # Add the dataframe to the datasource
-        datasource.add_data(metadata=metadata, data=data, overwrite=overwrite)
+        if storage_format is not None:
+            datasource.set_storage_format(storage_format)
+
+        # Add the data from each file to the datasource
+        for species_data in datasource_info["data"]:
+            datasource.add_data(metadata=species_data["metadata"], data=species_data["data"], overwrite=overwrite)
+
         # Save Datasource to object store
-        datasource.save()
+        datasource.save(update_index=False)
 
         uuids[name] = datasource.uuid()
+        metadata[datasource.uuid()] = datasource.metadata()
+
+    if metadata:
+        MetadataIndex.update(add=metadata)
 
     return uuids
 
@@ -6,4 +6,5 @@ from ._util import (date_overlap, get_datapath, get_datetime, get_datetime_epoch
                     hash_file, load_hugs_json, load_object, read_header,
                     timestamp_tzaware, unanimous, valid_site, 
                     daterange_from_str, daterange_to_str, create_daterange_str,
-                    create_aligned_timestamp, create_daterange, is_number)
+                    create_aligned_timestamp, create_daterange, is_number,
+                    dataset_to_chunks, chunks_to_dataset, set_datetime_index)
@@ -20,9 +20,15 @@ __all__ = [
     "create_daterange_str",
     "create_daterange",
     "create_aligned_timestamp",
-    "is_number"
+    "is_number",
+    "dataset_to_chunks",
+    "chunks_to_dataset",
+    "set_datetime_index",
 ]
 
+# Size in bytes of the chunks of binary Dataset data returned by the retrieve service
+_dataset_chunk_size = 4 * 1024 * 1024
+
 
 def get_datetime_epoch():
     """ Returns the UNIX epoch time
@@ -390,4 +396,113 @@ def is_number(s):
         float(s)
         return True
     except ValueError:
-        return False
\ No newline at end of file
+        return False
+
+
+def dataset_to_chunks(dataset, chunk_size=None):
+    """ Convert a Dataset to NetCDF bytes and split these into base64 encoded
+        chunks that can be returned by a service and decoded as they arrive.
+
+        The time coordinate is stored as int64 nanoseconds since the UNIX epoch.
+
+        This function is partnered with chunks_to_dataset()
+
+        Args:
+            dataset (xarray.Dataset): Dataset
+            chunk_size (int, default=None): Size of each chunk in bytes
+        Returns:
+            list: List of base64 encoded strings
+    """
+    from base64 import b64encode
+    from HUGS.Modules import Datasource
+
+    if chunk_size is None:
+        chunk_size = _dataset_chunk_size
+
+    # Copy so we don't change the encoding of the passed Dataset
+    dataset = dataset.copy()
+
+    if "time" in dataset.coords:
+        dataset["time"].encoding = {"units": "nanoseconds since 1970-01-01", "dtype": "int64"}
+
+    data = memoryview(Datasource.dataset_to_netcdf(dataset))
+
+    return [b64encode(data[i:i + chunk_size]).decode("ascii") for i in range(0, len(data), chunk_size)]
+
+
+def chunks_to_dataset(chunks):
+    """ Recreate a Dataset from the chunks created by dataset_to_chunks()
+
+        Args:
+            chunks (iterable): base64 encoded strings
+        Returns:
+            xarray.Dataset: Dataset
+    """
+    from base64 import b64decode
+    from HUGS.Modules import Datasource
+
+    data = bytearray()
+    for chunk in chunks:
+        data += b64decode(chunk)
+
+    return Datasource.netcdf_to_dataset(bytes(data))
+
+
+def set_datetime_index(data, columns, format=None, name="time", errors="raise"):
+    """ Create a DatetimeIndex from the date and time columns of a DataFrame and set
+        it as the index. The datetimes are created for the whole column at once
+        rather than by calling a function on each row.
+
+        If a format is given the columns are parsed as if joined with spaces, for example
+        columns of "200130" and "105230" with the format "%y%m%d %H%M%S".
+        Otherwise the columns must contain the numeric year, month, day and optionally
+        hour, minute and second, in that order.
+
+        Args:
+            data (Pandas.DataFrame): Data
+            columns (list): Date and time column(s), these are removed from the data
+            format (str, default=None): strftime format of the joined columns
+            name (str, default="time"): Name of the index
+            errors (str, default="raise"): If "coerce" invalid datetimes are set as NaT
+        Returns:
+            Pandas.DataFrame: Data indexed by datetime
+    """
+    from pandas import DataFrame, DatetimeIndex, Timestamp, factorize, to_datetime
+
+    if not isinstance(columns, list):
+        columns = [columns]
+
+    if format is not None:
+        column_formats = format.split(" ")
+
+        if len(column_formats) == len(columns):
+            # Dates and times are each repeated many times in a file so we parse
+            # each column separately and only parse each unique value once
+            def parse_column(column, column_format):
+                codes, uniques = factorize(data[column].astype(str))
+                parsed = DatetimeIndex(to_datetime(uniques, format=column_format, errors=errors))
+                return parsed.take(codes, allow_fill=True)
+
+            datetimes = parse_column(columns[0], column_formats[0])
+            for column, column_format in zip(columns[1:], column_formats[1:]):
+                # Values without a date are given the date 1900-01-01
+                datetimes = datetimes + (parse_column(column, column_format) - Timestamp("1900-01-01"))
+        else:
+            date_strings = data[columns[0]].astype(str)
+            for column in columns[1:]:
+                date_strings = date_strings + " " + data[column].astype(str)
+
+            datetimes = to_datetime(date_strings, format=format, errors=errors)
+    else:
+        components = ["year", "month", "day", "hour", "minute", "second"]
+
+        if not 3 <= len(columns) <= len(components):
+            raise ValueError("Columns must be the year, month, day and optionally hour, minute and second")
+
+        date_parts = DataFrame({part: data[column].to_numpy() for part, column in zip(components, columns)})
+        datetimes = to_datetime(date_parts, errors=errors)
+
+    data = data.drop(columns=columns)
+    data.index = DatetimeIndex(datetimes, name=name)
+
+    return data
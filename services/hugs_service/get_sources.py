@@ -1,4 +1,4 @@
-from HUGS.Modules import Datasource, ObsSurface
+from HUGS.Modules import Datasource, MetadataIndex, ObsSurface
 from HUGS.Processing import DataTypes
 from HUGS.Util import load_object
 
@@ -23,9 +23,12 @@ def get_sources(args):
         raise KeyError("Species must be specified")
 
     obs = ObsSurface.load()
-   
-    datasource_uuids = obs.datasources()
-    # Shallow load the Datasources (only get their JSON metadata)
+    obs_uuids = set(obs.datasources())
+
+    # Use the metadata index to find the Datasources that may match so we only
+    # have to shallow load those (only get their JSON metadata)
+    index = MetadataIndex.load()
+    datasource_uuids = [uuid for uuid in index.search_values([site, species]) if uuid in obs_uuids]
     datasources = [Datasource.load(uuid=uuid, shallow=True) for uuid in datasource_uuids]
 
     matching_sources = [d for d in datasources if d.search_metadata(search_terms=[site, species], find_all=True)]
@@ -2,14 +2,24 @@ def retrieve(args):
     """ Calls the HUGS function to retrieve data stored at the given key
         and combine them into a single Pandas DataFrame for download / visualization
 
+        The return_type argument selects how each Dataset is returned, "netcdf"
+        returns a list of base64 encoded chunks of a NetCDF file, see HUGS.Util.chunks_to_dataset.
+        "json" returns the Dataset as a JSON dictionary and is kept for older clients.
+
+        If a variables list or start_datetime and end_datetime strings are passed only
+        those variables and the data within those times is returned. If an average period
+        is passed the data is averaged before it's returned, see HUGS.Processing.recombine_resampled.
+
         Args:
             args (dict): Dictionary of arguments
         Returns:
             dict: Dictionary of results
 
     """
-    from HUGS.Processing import recombine_sections
-    from Acquire.ObjectStore import datetime_to_string
+    from HUGS.Processing import recombine_resampled, recombine_sections
+    from pandas import Timestamp
+    from HUGS.Util import dataset_to_chunks
+    from Acquire.ObjectStore import datetime_to_string, string_to_datetime
     from json import dumps as json_dumps
     from collections import defaultdict
 
@@ -20,6 +30,24 @@ def retrieve(args):
     
     return_type = args.get("return_type", "json")
 
+    if return_type not in ("json", "netcdf"):
+        raise NotImplementedError(f"Return type {return_type} not implemented, valid types are json and netcdf")
+
+    variables = args.get("variables")
+
+    if "start_datetime" in args:
+        start_datetime = string_to_datetime(args["start_datetime"])
+    else:
+        start_datetime = None
+
+    if "end_datetime" in args:
+        end_datetime = string_to_datetime(args["end_datetime"])
+    else:
+        end_datetime = None
+
+    average = args.get("average")
+    keep_missing = args.get("keep_missing", False)
+
     # if not isinstance(key_dict, dict):
     #     raise TypeError("Keys must be passed in dictionary format. For example {bsd_co2: [key_list]}")
 
@@ -29,9 +57,19 @@ def retrieve(args):
             # Create a key for this range
             data_keys = key_dict[key][daterange]
             # Retrieve the data from the object store and combine into a NetCDF
-            combined = recombine_sections(data_keys)
+            if average is not None:
+                start_date, end_date = (Timestamp(d) for d in daterange.split("_"))
+                combined = recombine_resampled(data_keys, average=average, keep_missing=keep_missing,
+                                               variables=variables, start_date=start_datetime,
+                                               end_date=end_datetime, daterange_start=start_date,
+                                               daterange_end=end_date)
+            else:
+                combined = recombine_sections(data_keys, variables=variables, start_date=start_datetime,
+                                              end_date=end_datetime)
 
-            if return_type == "json":
+            if return_type == "netcdf":
+                combined_data[key][daterange] = dataset_to_chunks(combined)
+            else:
                 dataset_dict = combined.to_dict()
 
                 # Need to convert the time data to string and then back again on the other side
@@ -43,7 +81,5 @@ def retrieve(args):
 
                 json_data = json_dumps(dataset_dict, indent=4)
                 combined_data[key][daterange] = json_data
-            else:
-                raise NotImplementedError("Not yet implemented")
 
     return {"results": combined_data}
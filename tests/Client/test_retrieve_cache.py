@@ -0,0 +1,133 @@
+import os
+import time
+
+import pytest
+
+from HUGS.Client import RetrieveCache
+
+
+def test_get_set(tmp_path, make_dataset):
+    cache = RetrieveCache(cache_dir=tmp_path)
+
+    keys = ["data/uuid/abc/hash_1/2019_2020", "data/uuid/abc/hash_2/2020_2021"]
+    ds = make_dataset(n_times=100)
+
+    assert cache.get(keys) is None
+
+    cache.set(keys, ds)
+
+    # The order of the keys doesn't matter
+    assert cache.get(keys[::-1]).equals(ds)
+    assert cache.get(keys[:1]) is None
+    assert cache.size() > 0
+
+    cache.clear()
+
+    assert cache.get(keys) is None
+    assert cache.size() == 0
+
+
+def test_evicts_least_recently_used(tmp_path, make_dataset):
+    ds = make_dataset(n_times=100)
+
+    cache = RetrieveCache(cache_dir=tmp_path)
+    cache.set(["key_0"], ds)
+    file_size = cache.size()
+
+    cache = RetrieveCache(cache_dir=tmp_path, max_bytes=2 * file_size)
+    cache.set(["key_1"], ds)
+
+    # Make key_0 the most recently used
+    now = time.time()
+    os.utime(tmp_path.joinpath(f"{RetrieveCache.cache_key(['key_1'])}.nc"), (now - 10, now - 10))
+    cache.get(["key_0"])
+
+    cache.set(["key_2"], ds)
+
+    assert cache.get(["key_1"]) is None
+    assert cache.get(["key_0"]) is not None
+    assert cache.get(["key_2"]) is not None
+    assert cache.size() <= 2 * file_size
+
+
+def test_negative_size_raises(tmp_path):
+    with pytest.raises(ValueError):
+        RetrieveCache(cache_dir=tmp_path, max_bytes=-1)
+
+
+def test_retrieve_only_requests_uncached_data(tmp_path, make_dataset):
+    from HUGS.Client import Retrieve
+    from HUGS.Util import dataset_to_chunks
+
+    ds = make_dataset(n_times=100)
+
+    class FakeService:
+        def __init__(self):
+            self.requested = []
+
+        def call_function(self, function, args):
+            self.requested.append(args["keys"])
+            results = {key: {daterange: dataset_to_chunks(ds) for daterange in dateranges}
+                       for key, dateranges in args["keys"].items()}
+            return {"results": results}
+
+    retrieve = Retrieve.__new__(Retrieve)
+    retrieve._service = FakeService()
+    retrieve._cache = RetrieveCache(cache_dir=tmp_path)
+
+    keys = {"bsd_ch4": {"2019_2020": ["data/uuid/abc/hash_1/2019_2020"]}}
+
+    first = retrieve.retrieve(keys=keys)
+
+    assert first["bsd_ch4"]["2019_2020"].equals(ds)
+
+    keys["bsd_co2"] = {"2019_2020": ["data/uuid/def/hash_2/2019_2020"]}
+
+    second = retrieve.retrieve(keys=keys)
+
+    assert second["bsd_ch4"]["2019_2020"].equals(ds)
+    assert second["bsd_co2"]["2019_2020"].equals(ds)
+    assert retrieve._service.requested[1] == {"bsd_co2": {"2019_2020": ["data/uuid/def/hash_2/2019_2020"]}}
+
+    retrieve.retrieve(keys=keys)
+
+    assert len(retrieve._service.requested) == 2
+
+
+def test_retrieve_passes_selection(tmp_path, make_dataset):
+    import pandas as pd
+    from HUGS.Client import Retrieve
+    from HUGS.Util import dataset_to_chunks
+
+    ds = make_dataset(n_times=100)
+
+    class FakeService:
+        def __init__(self):
+            self.args = []
+
+        def call_function(self, function, args):
+            self.args.append(args)
+            selected = ds[args.get("variables", list(ds.data_vars))]
+            results = {key: {daterange: dataset_to_chunks(selected) for daterange in dateranges}
+                       for key, dateranges in args["keys"].items()}
+            return {"results": results}
+
+    retrieve = Retrieve.__new__(Retrieve)
+    retrieve._service = FakeService()
+    retrieve._cache = RetrieveCache(cache_dir=tmp_path)
+
+    keys = {"bsd_ch4": {"2019_2020": ["data/uuid/abc/hash_1/2019_2020"]}}
+    start = pd.Timestamp("2019-01-01", tz="UTC")
+
+    retrieve.retrieve(keys=keys)
+    retrieve.retrieve(keys=keys, variables="ch4", start_datetime=start)
+
+    # Data with a different selection isn't read from the cache
+    assert len(retrieve._service.args) == 2
+    assert retrieve._service.args[1]["variables"] == ["ch4"]
+    assert "start_datetime" in retrieve._service.args[1]
+    assert "end_datetime" not in retrieve._service.args[1]
+
+    retrieve.retrieve(keys=keys, variables="ch4", start_datetime=start)
+
+    assert len(retrieve._service.args) == 2
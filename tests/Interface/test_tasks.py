@@ -0,0 +1,152 @@
+import asyncio
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+import xarray
+
+from HUGS.Interface import RetrieveTasks
+
+
+def make_dataset(start, periods=5):
+    times = pd.date_range(start, periods=periods, freq="h")
+    return xarray.Dataset({"ch4": ("time", np.arange(periods, dtype=float))}, coords={"time": times})
+
+
+def make_results(names):
+    return {name: {"keys": {f"daterange_{name}": [f"data/uuid/{name}"]}} for name in names}
+
+
+def fake_retrieve(keys):
+    return {key: {daterange: make_dataset("2019-01-01") for daterange in dateranges}
+            for key, dateranges in keys.items()}
+
+
+def test_retrieve():
+    tasks = RetrieveTasks(retrieve_fn=fake_retrieve, max_workers=2)
+
+    received = []
+    progress = []
+
+    results = asyncio.run(
+        tasks.retrieve(
+            selected_results=make_results(["bsd_ch4", "hfd_ch4", "tac_ch4"]),
+            on_result=lambda key, data: received.append(key),
+            on_progress=lambda n_done, n_total: progress.append((n_done, n_total)),
+        )
+    )
+
+    tasks.shutdown()
+
+    assert sorted(results) == ["bsd_ch4", "hfd_ch4", "tac_ch4"]
+    assert sorted(received) == sorted(results)
+    assert results["bsd_ch4"].equals(make_dataset("2019-01-01"))
+    assert progress == [(0, 3), (1, 3), (2, 3), (3, 3)]
+
+
+def test_retrieve_error():
+    def failing_retrieve(keys):
+        if "hfd_ch4" in keys:
+            raise ValueError("Unable to retrieve hfd_ch4")
+        return fake_retrieve(keys)
+
+    tasks = RetrieveTasks(retrieve_fn=failing_retrieve, max_workers=2)
+    selected_results = make_results(["bsd_ch4", "hfd_ch4", "tac_ch4"])
+
+    errors = {}
+    progress = []
+
+    results = asyncio.run(
+        tasks.retrieve(
+            selected_results=selected_results,
+            on_progress=lambda n_done, n_total: progress.append((n_done, n_total)),
+            on_error=lambda key, error: errors.update({key: error}),
+        )
+    )
+
+    assert sorted(results) == ["bsd_ch4", "tac_ch4"]
+    assert list(errors) == ["hfd_ch4"]
+    assert isinstance(errors["hfd_ch4"], ValueError)
+    # Failed search results are counted as done
+    assert progress[-1] == (3, 3)
+
+    # Without an error callback the error is raised
+    with pytest.raises(ValueError):
+        asyncio.run(tasks.retrieve(selected_results=selected_results))
+
+    tasks.shutdown()
+
+
+def test_start_and_cancel():
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def blocking_retrieve(keys):
+        calls.append(list(keys))
+        started.set()
+        release.wait(timeout=5)
+        return fake_retrieve(keys)
+
+    tasks = RetrieveTasks(retrieve_fn=blocking_retrieve, max_workers=1)
+
+    async def run():
+        received = []
+
+        first = tasks.start(selected_results=make_results(["bsd_ch4", "hfd_ch4"]),
+                            on_result=lambda key, data: received.append(key))
+
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+
+        # Starting a new retrieval cancels the first
+        second = tasks.start(selected_results=make_results(["tac_ch4"]),
+                             on_result=lambda key, data: received.append(key))
+
+        release.set()
+        results = await second
+
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+        return received, results
+
+    received, results = asyncio.run(run())
+
+    assert list(results) == ["tac_ch4"]
+    assert received == ["tac_ch4"]
+    # The queued job of the first retrieval wasn't run
+    assert calls == [["bsd_ch4"], ["tac_ch4"]]
+
+    tasks.cancel()
+    tasks.shutdown()
+
+
+def test_combine_dateranges():
+    first = make_dataset("2019-01-01 00:00")
+    second = make_dataset("2019-01-01 05:00")
+
+    dateranges = {
+        "2019-01-01-05:00:00+00:00_2019-01-01-09:00:00+00:00": second,
+        "2019-01-01-00:00:00+00:00_2019-01-01-04:00:00+00:00": first,
+    }
+
+    combined = RetrieveTasks.combine_dateranges(dateranges)
+
+    assert combined.indexes["time"].is_monotonic_increasing
+    assert combined.time.size == 10
+    assert combined["ch4"].values.tolist() == first["ch4"].values.tolist() + second["ch4"].values.tolist()
+
+    # Overlapping dateranges are sorted by time
+    overlapping = make_dataset("2019-01-01 02:30")
+    combined = RetrieveTasks.combine_dateranges({"a": second, "b": overlapping})
+
+    assert combined.indexes["time"].is_monotonic_increasing
+
+    assert RetrieveTasks.combine_dateranges(first) is first
+    assert RetrieveTasks.combine_dateranges({"a": first}) is first
+
+
+def test_invalid_max_workers_raises():
+    with pytest.raises(ValueError):
+        RetrieveTasks(retrieve_fn=fake_retrieve, max_workers=0)
@@ -78,6 +78,9 @@ def test_get_single_site_with_average():
     data_missing = result_with_missing[0]
 
     assert data_missing.time.equals(data.time)
+    # The first and last periods keep their averages when padding with missing periods
+    assert data_missing["mf"][0] == pytest.approx(414.21)
+    assert data_missing["mf"][-1] == pytest.approx(411.08)
 
 
 def test_get_single_site_datetime_selection():
@@ -36,3 +36,23 @@ def test_search_and_download(crds):
 
     assert data["co2_hfd_100m_picarro"]["2013-12-04-14:02:30_2019-05-21-15:46:30"]["co2_stdev"][-1] == pytest.approx(0.247)
     assert data["co2_hfd_100m_picarro"]["2013-12-04-14:02:30_2019-05-21-15:46:30"]["co2_n_meas"][10] == 19.0
+
+
+def test_retrieve_time_window_and_variables(crds):
+    import pandas as pd
+
+    s = Search()
+
+    s.search(species="co2", locations="hfd")
+
+    start = pd.Timestamp("2013-12-04 00:00:00", tz="UTC")
+    end = pd.Timestamp("2013-12-31 00:00:00", tz="UTC")
+
+    data = s.retrieve(selected_keys="co2_hfd_100m_picarro", variables=["co2"], start_datetime=start, end_datetime=end)
+
+    dataset = data["co2_hfd_100m_picarro"]["2013-12-04-14:02:30_2019-05-21-15:46:30"]
+
+    assert list(dataset.data_vars) == ["co2"]
+    assert dataset.time.size == 4
+    assert dataset.time.min() >= pd.Timestamp("2013-12-04 00:00:00")
+    assert dataset.time.max() <= pd.Timestamp("2013-12-31 00:00:00")
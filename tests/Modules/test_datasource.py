@@ -10,6 +10,7 @@ import xarray
 
 from HUGS.Modules import CRDS, Datasource
 from HUGS.ObjectStore import get_local_bucket, get_object_names
+from HUGS.Processing import rollup_key, rollup_levels
 from HUGS.Util import create_daterange_str
 
 mocked_uuid = "00000000-0000-0000-00000-000000000000"
@@ -111,20 +112,19 @@ def test_versioning(data):
 
     keys = d.versions()
 
-    
+    # Data is stored at keys given by the hash of its contents
+    v1_key = keys["v1"]["keys"]["2014-01-30-10:52:30+00:00_2014-01-30-12:20:30+00:00"]
+    v2_key = keys["v2"]["keys"]["2014-01-30-10:52:30+00:00_2014-01-30-13:12:30+00:00"]
+    v3_key = keys["v3"]["keys"]["2014-01-30-10:52:30+00:00_2014-01-30-13:22:30+00:00"]
 
-    assert (
-        keys["v1"]["keys"]["2014-01-30-10:52:30+00:00_2014-01-30-12:20:30+00:00"]
-        == "data/uuid/4b91f73e-3d57-47e4-aa13-cb28c35d3b3d/v1/2014-01-30-10:52:30+00:00_2014-01-30-12:20:30+00:00"
-    )
+    assert list(keys["v2"]["keys"].values()) == [v2_key]
+    assert list(keys["v3"]["keys"].values()) == [v3_key]
 
-    assert list(keys["v2"]["keys"].values()) == [
-        "data/uuid/4b91f73e-3d57-47e4-aa13-cb28c35d3b3d/v2/2014-01-30-10:52:30+00:00_2014-01-30-13:12:30+00:00"
-    ]
+    for key in (v1_key, v2_key, v3_key):
+        assert key.startswith("data/uuid/4b91f73e-3d57-47e4-aa13-cb28c35d3b3d/")
+        assert len(key.split("/")[-2]) == 40
 
-    assert list(keys["v3"]["keys"].values()) == [
-        "data/uuid/4b91f73e-3d57-47e4-aa13-cb28c35d3b3d/v3/2014-01-30-10:52:30+00:00_2014-01-30-13:22:30+00:00"
-    ]
+    assert len({v1_key, v2_key, v3_key}) == 3
 
     assert keys["v3"]["keys"] == keys["latest"]["keys"]
 
@@ -314,6 +314,68 @@ def test_load_dataset():
     assert loaded_ds.equals(ds)
 
 
+def test_load_dataset_reads_local_file(monkeypatch):
+    import HUGS.ObjectStore
+
+    filename = "WAO-20magl_EUROPE_201306_small.nc"
+    dir_path = os.path.dirname(__file__)
+    test_data = "../data/emissions"
+    filepath = os.path.join(dir_path, test_data, filename)
+
+    ds = xarray.load_dataset(filepath)
+
+    d = Datasource("dataset_test")
+    d.add_data(metadata={"some": "metadata"}, data=ds, data_type="footprint")
+    d.save()
+
+    key = d.data_keys()[0]
+    bucket = get_local_bucket()
+
+    def no_copy(bucket, key):
+        raise AssertionError("Object should be read from its file")
+
+    monkeypatch.setattr(HUGS.ObjectStore, "get_object", no_copy)
+
+    loaded_ds = Datasource.load_dataset(bucket=bucket, key=key)
+
+    assert loaded_ds.equals(ds)
+
+    variable = list(ds.data_vars)[0]
+    start = ds.time[0].values
+    subset = Datasource.load_dataset(bucket=bucket, key=key, variables=[variable], start_date=start, end_date=start)
+
+    assert list(subset.data_vars) == [variable]
+    assert subset.equals(ds[[variable]].sel(time=slice(start, start)))
+
+
+def test_load_datasets():
+    filename = "WAO-20magl_EUROPE_201306_small.nc"
+    dir_path = os.path.dirname(__file__)
+    test_data = "../data/emissions"
+    filepath = os.path.join(dir_path, test_data, filename)
+
+    ds = xarray.load_dataset(filepath)
+
+    bucket = get_local_bucket(empty=True)
+
+    d = Datasource("netcdf_test")
+    d.add_data(metadata={"some": "metadata"}, data=ds, data_type="footprint")
+    d.save()
+
+    d_chunked = Datasource("chunked_test")
+    d_chunked.set_storage_format("chunked")
+    d_chunked.add_data(metadata={"some": "metadata"}, data=ds, data_type="footprint")
+    d_chunked.save()
+
+    keys = d_chunked.data_keys() + d.data_keys()
+
+    loaded = Datasource.load_datasets(bucket=bucket, keys=keys)
+
+    assert len(loaded) == 2
+    assert loaded[1].equals(ds)
+    assert loaded[0].equals(ds)
+
+
 def test_search_metadata():
     d = Datasource(name="test_search")
 
@@ -462,3 +524,443 @@ def test_in_daterange(data):
 
 
 
+
+
+def test_date_index():
+    get_local_bucket(empty=True)
+
+    times = pd.date_range("2019-01-01", "2019-05-31", freq="D")
+    ds = xarray.Dataset({"ch4": ("time", np.arange(len(times), dtype=float))}, coords={"time": times})
+
+    d = Datasource()
+    d.add_data(metadata={"site": "bsd", "species": "ch4"}, data=ds)
+    d.save()
+
+    djf = "2019-01-01-00:00:00+00:00_2019-02-28-00:00:00+00:00"
+    mam = "2019-03-01-00:00:00+00:00_2019-05-31-00:00:00+00:00"
+
+    date_index = d.to_data()["date_index"]
+
+    assert date_index["daterange"] == [djf, mam]
+    assert date_index["start"] == [pd.Timestamp("2019-01-01", tz="UTC").value, pd.Timestamp("2019-03-01", tz="UTC").value]
+    assert date_index["end"] == [pd.Timestamp("2019-02-28", tz="UTC").value, pd.Timestamp("2019-05-31", tz="UTC").value]
+
+    keys = d._data_keys["latest"]["keys"]
+
+    assert d.in_daterange(start_date="2019-02-01", end_date="2019-04-01") == [keys[djf], keys[mam]]
+    assert d.in_daterange(start_date="2019-06-01", end_date="2019-07-01") == []
+
+    # Segments starting or ending on the boundary of the search range are included
+    assert d.in_daterange(start_date="2018-12-01", end_date="2019-01-01") == [keys[djf]]
+    assert d.in_daterange(start_date="2019-02-28", end_date="2019-02-28") == [keys[djf]]
+    assert d.in_daterange(start_date="2019-05-31", end_date="2019-06-30") == [keys[mam]]
+
+
+def test_date_index_empty_datasource():
+    d = Datasource()
+
+    assert d.in_daterange(start_date="2019-01-01", end_date="2020-01-01") == []
+
+    d._data_keys["latest"] = {"keys": {}}
+
+    assert d.in_daterange(start_date="2019-01-01", end_date="2020-01-01") == []
+
+
+def test_stale_date_index_rebuilt():
+    d = Datasource()
+
+    d._data_keys["latest"]["keys"] = {"2014-01-01-00:00:00+00:00_2014-02-28-00:00:00+00:00": "djf_2014"}
+    d.update_date_index()
+
+    # A record whose index doesn't match its keys, the index has the same length
+    data = d.to_data()
+    data["data_keys"]["latest"]["keys"] = {"2015-01-01-00:00:00+00:00_2015-02-28-00:00:00+00:00": "djf_2015"}
+
+    d_2 = Datasource.from_data(bucket=None, data=data, shallow=True)
+
+    assert d_2.in_daterange(daterange="2015-02-01-00:00:00_2015-03-01-00:00:00") == ["djf_2015"]
+    assert d_2.in_daterange(daterange="2014-02-01-00:00:00_2014-03-01-00:00:00") == []
+
+    # The index isn't rebuilt while the keys are unchanged
+    d_2.update_date_index = None
+
+    assert d_2.in_daterange(daterange="2015-02-01-00:00:00_2015-03-01-00:00:00") == ["djf_2015"]
+
+
+def test_in_daterange_overlapping_segments():
+    d = Datasource()
+
+    d._data_keys["latest"]["keys"] = {
+        "2014-01-01-00:00:00+00:00_2014-12-31-00:00:00+00:00": "djf_2014",
+        "2014-03-01-00:00:00+00:00_2014-05-31-00:00:00+00:00": "mam_2014",
+        "2015-01-01-00:00:00+00:00_2015-02-28-00:00:00+00:00": "djf_2015",
+    }
+
+    assert d.in_daterange(daterange="2014-06-01-00:00:00_2014-07-01-00:00:00") == ["djf_2014"]
+    assert d.in_daterange(daterange="2014-04-01-00:00:00_2015-01-02-00:00:00") == ["djf_2014", "mam_2014", "djf_2015"]
+    assert d.in_daterange(daterange="2016-01-01-00:00:00_2017-01-01-00:00:00") == []
+
+
+def test_dataset_netcdf_roundtrip():
+    filename = "WAO-20magl_EUROPE_201306_small.nc"
+    dir_path = os.path.dirname(__file__)
+    test_data = "../data/emissions"
+    filepath = os.path.join(dir_path, test_data, filename)
+
+    ds = xarray.load_dataset(filepath)
+
+    netcdf_bytes = Datasource.dataset_to_netcdf(ds)
+
+    assert isinstance(netcdf_bytes, bytes)
+    assert netcdf_bytes[:4] == b"\x89HDF"
+
+    loaded_ds = Datasource.netcdf_to_dataset(netcdf_bytes)
+
+    assert loaded_ds.equals(ds)
+    assert loaded_ds.attrs == ds.attrs
+
+
+def test_save_only_writes_new_data():
+    bucket = get_local_bucket(empty=True)
+
+    times = pd.date_range("2019-01-01", "2019-08-31", freq="D")
+    ds = xarray.Dataset({"ch4": ("time", np.arange(len(times), dtype=float))}, coords={"time": times})
+
+    metadata = {"site": "bsd", "species": "ch4"}
+
+    d = Datasource(name="append_test")
+    d.add_data(metadata=metadata, data=ds.sel(time=slice("2019-01-01", "2019-05-31")))
+    d.save()
+
+    v1_keys = d._data_keys["v1"]["keys"]
+
+    assert len(v1_keys) == 2
+
+    d.add_data(metadata=metadata, data=ds.sel(time=slice("2019-06-01", "2019-08-31")))
+    d.save()
+
+    v2_keys = d._data_keys["v2"]["keys"]
+
+    assert len(v2_keys) == 3
+
+    # The unchanged data is referenced from the first version
+    for daterange, key in v1_keys.items():
+        assert v2_keys[daterange] == key
+
+    new_daterange = "2019-06-01-00:00:00+00:00_2019-08-31-00:00:00+00:00"
+    new_data = d.data()[new_daterange]
+    assert v2_keys[new_daterange] == f"data/uuid/{d.uuid()}/{Datasource.hash_dataset(new_data)}/{new_daterange}"
+
+    # Only the new data and its rollups have been written to the object store
+    stored = get_object_names(bucket, prefix=f"data/uuid/{d.uuid()}/")
+    expected = [rollup_key(data_key=k, level=level) for k in v2_keys.values() for level in rollup_levels]
+    assert sorted(stored) == sorted(list(v2_keys.values()) + expected)
+
+    d_2 = Datasource.load(uuid=d.uuid())
+
+    assert sorted(d_2.data()) == sorted(v2_keys)
+
+
+def test_save_load_chunked():
+    bucket = get_local_bucket(empty=True)
+
+    times = pd.date_range("2014-01-30 10:52:30", "2014-01-30 14:20:30", freq="30s")
+    n_times = len(times)
+    ch4_data = xarray.Dataset(
+        {
+            "ch4": ("time", np.linspace(1950.0, 1990.0, n_times)),
+            "ch4_stdev": ("time", np.full(n_times, 0.5)),
+            "ch4_n_meas": ("time", np.arange(n_times, dtype=float)),
+        },
+        coords={"time": times},
+        attrs={"station_long_name": "Bilsdale, UK", "inlet_height_magl": "248m"},
+    )
+    metadata = {"site": "bsd", "species": "ch4", "inlet": "248m"}
+
+    d = Datasource(name="chunked_test")
+    d.set_storage_format("chunked")
+    d.add_data(metadata=metadata, data=ch4_data)
+    d.save()
+
+    key = d.data_keys()[0]
+
+    loaded = Datasource.load_dataset(bucket=bucket, key=key)
+
+    assert loaded["ch4"].equals(ch4_data["ch4"])
+    assert loaded.attrs == ch4_data.attrs
+
+    start = pd.Timestamp("2014-01-30 11:00:00")
+    end = pd.Timestamp("2014-01-30 12:00:00")
+
+    subset = Datasource.load_dataset(bucket=bucket, key=key, variables=["ch4"], start_date=start, end_date=end)
+
+    assert list(subset.data_vars) == ["ch4"]
+    assert subset["ch4"].equals(ch4_data["ch4"].sel(time=slice(start, end)))
+
+    d_2 = Datasource.load(uuid=d.uuid())
+
+    assert d_2.storage_format() == "chunked"
+
+    Datasource.delete_dataset(bucket=bucket, key=key)
+
+    assert get_object_names(bucket, prefix=key) == []
+
+
+def test_netcdf_conversion_uses_xarray_hdf5_lock():
+    import threading
+    from xarray.backends.locks import HDF5_LOCK
+
+    times = pd.date_range("2019-01-01", periods=10, freq="H")
+    ds = xarray.Dataset({"ch4": ("time", np.arange(10, dtype=float))}, coords={"time": times})
+
+    netcdf_bytes = Datasource.dataset_to_netcdf(ds)
+
+    results = []
+    thread = threading.Thread(target=lambda: results.append(Datasource.netcdf_to_dataset(netcdf_bytes)))
+
+    # A conversion waits for HDF5 calls made by xarray, such as to_netcdf, to complete
+    with HDF5_LOCK:
+        thread.start()
+        thread.join(timeout=0.2)
+
+        assert thread.is_alive()
+
+    thread.join()
+
+    assert results[0].equals(ds)
+
+
+def test_set_invalid_storage_format_raises():
+    d = Datasource()
+
+    with pytest.raises(ValueError):
+        d.set_storage_format("parquet")
+
+
+def test_load_reads_data_on_access():
+    get_local_bucket(empty=True)
+
+    times = pd.date_range("2019-01-01", "2019-08-31", freq="D")
+    ds = xarray.Dataset({"ch4": ("time", np.arange(len(times), dtype=float))}, coords={"time": times})
+
+    d = Datasource(name="lazy_test")
+    d.add_data(metadata={"site": "bsd", "species": "ch4"}, data=ds)
+    d.save()
+
+    d_2 = Datasource.load(uuid=d.uuid())
+    data = d_2.data()
+
+    dateranges = sorted(data)
+
+    assert dateranges == sorted(d.data_keys(return_all=True)["latest"]["keys"])
+    assert not any(data.is_loaded(daterange) for daterange in dateranges)
+
+    first = data[dateranges[0]]
+
+    assert data.is_loaded(dateranges[0])
+    assert first["ch4"].equals(d.data()[dateranges[0]]["ch4"])
+
+    data.release()
+
+    assert not data.is_loaded(dateranges[0])
+    assert data[dateranges[0]]["ch4"].equals(first["ch4"])
+
+
+def test_lazy_data_memory_limit():
+    get_local_bucket(empty=True)
+
+    times = pd.date_range("2019-01-01", "2019-12-31", freq="D")
+    ds = xarray.Dataset({"ch4": ("time", np.arange(len(times), dtype=float))}, coords={"time": times})
+
+    d = Datasource(name="lazy_limit_test")
+    d.add_data(metadata={"site": "bsd", "species": "ch4"}, data=ds)
+    d.save()
+
+    # Loaded Datasources limit the memory used by their data by default
+    assert Datasource.load(uuid=d.uuid()).data()._max_bytes == Datasource._segment_max_bytes
+
+    data = Datasource.load(uuid=d.uuid(), max_bytes=1).data()
+
+    dateranges = sorted(data)
+
+    for daterange in dateranges:
+        data[daterange]
+
+    # Only the most recently used Dataset is kept in memory
+    assert [data.is_loaded(daterange) for daterange in dateranges] == [False] * (len(dateranges) - 1) + [True]
+
+    # Unsaved data is kept in memory regardless of the limit
+    new_times = pd.date_range("2020-01-01", "2020-01-31", freq="D")
+    new_ds = xarray.Dataset({"ch4": ("time", np.zeros(len(new_times)))}, coords={"time": new_times})
+    data["2020-01-01-00:00:00+00:00_2020-01-31-00:00:00+00:00"] = new_ds
+    data[dateranges[0]]
+
+    assert data.is_loaded("2020-01-01-00:00:00+00:00_2020-01-31-00:00:00+00:00")
+    assert data.stored_key("2020-01-01-00:00:00+00:00_2020-01-31-00:00:00+00:00") is None
+
+
+def test_identical_data_stored_once():
+    bucket = get_local_bucket(empty=True)
+
+    times = pd.date_range("2019-01-01", "2019-08-31", freq="D")
+    ds = xarray.Dataset({"ch4": ("time", np.arange(len(times), dtype=float))}, coords={"time": times})
+
+    metadata = {"site": "bsd", "species": "ch4"}
+
+    d = Datasource(name="dedup_test")
+    d.add_data(metadata=metadata, data=ds)
+    d.save()
+
+    stored = sorted(get_object_names(bucket, prefix=f"data/uuid/{d.uuid()}/"))
+
+    # Adding the same data again replaces the segments with identical copies
+    d.add_data(metadata=metadata, data=ds.copy(deep=True))
+    d.save()
+
+    assert d._data_keys["v2"]["keys"] == d._data_keys["v1"]["keys"]
+    assert sorted(get_object_names(bucket, prefix=f"data/uuid/{d.uuid()}/")) == stored
+
+
+def test_hash_dataset():
+    times = pd.date_range("2019-01-01", "2019-01-31", freq="D")
+    ds = xarray.Dataset({"ch4": ("time", np.arange(len(times), dtype=float))}, coords={"time": times})
+
+    assert Datasource.hash_dataset(ds) == Datasource.hash_dataset(ds.copy(deep=True))
+
+    changed = ds.copy(deep=True)
+    changed["ch4"][0] = -1.0
+
+    assert Datasource.hash_dataset(changed) != Datasource.hash_dataset(ds)
+
+    changed = ds.copy(deep=True)
+    changed.attrs["site"] = "bsd"
+
+    assert Datasource.hash_dataset(changed) != Datasource.hash_dataset(ds)
+
+
+def _add_versions(datasource, n_versions):
+    """ Add and save data n_versions times, each version extends the data
+        of the previous one so replaces its segment
+    """
+    times = pd.date_range("2019-01-01", periods=n_versions * 5, freq="D")
+    ds = xarray.Dataset({"ch4": ("time", np.arange(len(times), dtype=float))}, coords={"time": times})
+
+    for i in range(1, n_versions + 1):
+        datasource.add_data(metadata={"site": "bsd", "species": "ch4"}, data=ds.isel(time=slice(0, i * 5)))
+        datasource.save()
+
+
+def test_compact_keep_versions():
+    bucket = get_local_bucket(empty=True)
+
+    d = Datasource(name="compact_test")
+    _add_versions(datasource=d, n_versions=4)
+
+    v1_keys = set(d._data_keys["v1"]["keys"].values())
+    latest_keys = set(d._data_keys["latest"]["keys"].values())
+
+    removed = d.compact(keep_versions=2)
+
+    assert removed == ["v1", "v2"]
+    assert sorted(d.versions()) == ["latest", "v3", "v4"]
+
+    stored = set(get_object_names(bucket, prefix=f"data/uuid/{d.uuid()}/"))
+
+    assert not v1_keys & stored
+    assert latest_keys <= stored
+
+    d_2 = Datasource.load(uuid=d.uuid(), shallow=True)
+
+    assert sorted(d_2.versions()) == ["latest", "v3", "v4"]
+
+    # New versions continue from the newest version
+    d_2 = Datasource.load(uuid=d.uuid())
+    _add_versions(datasource=d_2, n_versions=1)
+
+    assert d_2.latest_version() == "v5"
+
+
+def test_compact_keep_since():
+    get_local_bucket(empty=True)
+
+    d = Datasource(name="compact_since_test")
+    _add_versions(datasource=d, n_versions=3)
+
+    assert d.compact(keep_since=pd.Timestamp.now(tz="UTC") + pd.Timedelta(days=1)) == ["v1", "v2"]
+    assert sorted(d.versions()) == ["latest", "v3"]
+    assert d.compact(keep_since=pd.Timestamp("2000-01-01", tz="UTC")) == []
+
+
+def test_retention_applied_on_save():
+    bucket = get_local_bucket(empty=True)
+
+    d = Datasource(name="retention_test")
+    d.set_retention(keep_versions=1)
+
+    _add_versions(datasource=d, n_versions=3)
+
+    assert sorted(d.versions()) == ["latest", "v3"]
+    stored = get_object_names(bucket, prefix=f"data/uuid/{d.uuid()}/")
+    assert sorted(k for k in stored if "/rollup/" not in k) == sorted(d.data_keys())
+
+    d_2 = Datasource.load(uuid=d.uuid(), shallow=True)
+
+    assert d_2.retention() == {"keep_versions": 1}
+
+    with pytest.raises(ValueError):
+        d.set_retention(keep_versions=0)
+
+
+def test_version_history_stored_separately():
+    from HUGS.ObjectStore import get_object_from_json
+
+    bucket = get_local_bucket(empty=True)
+
+    d = Datasource(name="history_test")
+    _add_versions(datasource=d, n_versions=3)
+
+    header = get_object_from_json(bucket=bucket, key=f"datasource/uuid/{d.uuid()}")
+    history = get_object_from_json(bucket=bucket, key=Datasource.history_key(d.uuid()))
+
+    assert list(header["data_keys"]) == ["latest"]
+    assert sorted(history) == ["v1", "v2", "v3"]
+    assert history["v3"] == header["data_keys"]["latest"]
+
+    d_2 = Datasource.load(uuid=d.uuid(), shallow=True)
+
+    assert not d_2._history_loaded
+    assert sorted(d_2.data_keys()) == sorted(d.data_keys())
+    assert not d_2._history_loaded
+
+    assert sorted(d_2.data_keys(return_all=True)) == ["latest", "v1", "v2", "v3"]
+    assert d_2.data_keys(version="v1") == d.data_keys(version="v1")
+
+
+def test_load_record_with_full_history():
+    from HUGS.ObjectStore import delete_object, get_object_from_json, set_object_from_json
+
+    bucket = get_local_bucket(empty=True)
+
+    d = Datasource(name="legacy_history_test")
+    _add_versions(datasource=d, n_versions=2)
+
+    # Records written before the history was split out hold every version
+    key = f"datasource/uuid/{d.uuid()}"
+    record = get_object_from_json(bucket=bucket, key=key)
+    record["data_keys"] = d.history_to_data()
+    record["data_keys"]["latest"] = record["data_keys"]["v2"]
+    set_object_from_json(bucket=bucket, key=key, data=record)
+    delete_object(bucket=bucket, key=Datasource.history_key(d.uuid()))
+
+    d_2 = Datasource.load(uuid=d.uuid())
+
+    assert d_2._history_loaded
+    assert sorted(d_2.versions()) == ["latest", "v1", "v2"]
+
+    _add_versions(datasource=d_2, n_versions=1)
+
+    header = get_object_from_json(bucket=bucket, key=key)
+    history = get_object_from_json(bucket=bucket, key=Datasource.history_key(d.uuid()))
+
+    assert list(header["data_keys"]) == ["latest"]
+    assert sorted(history) == ["v1", "v2", "v3"]
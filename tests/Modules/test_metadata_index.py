@@ -0,0 +1,162 @@
+import pytest
+from pathlib import Path
+
+from HUGS.Modules import Datasource, MetadataIndex, ObsSurface
+from HUGS.ObjectStore import get_local_bucket
+
+
+def get_datapath(filename, data_type):
+    return Path(__file__).resolve(strict=True).parent.joinpath(f"../data/proc_test_data/{data_type}/{filename}")
+
+
+def test_add_and_search():
+    index = MetadataIndex()
+
+    index.add(uuid="uuid_a", metadata={"site": "bsd", "species": "co2", "inlet": "248m", "instrument": "picarro"})
+    index.add(uuid="uuid_b", metadata={"site": "bsd", "species": "ch4", "inlet": "108m", "instrument": "picarro"})
+    index.add(uuid="uuid_c", metadata={"site": "HFD", "species": "co2", "inlet": "100m", "instrument": "picarro"})
+
+    assert index.search(site="bsd") == ["uuid_a", "uuid_b"]
+    assert index.search(site="hfd") == ["uuid_c"]
+    assert index.search(site="bsd", species="co2") == ["uuid_a"]
+    assert index.search(site=["bsd", "hfd"], species="CO2") == ["uuid_a", "uuid_c"]
+    assert index.search(site="bsd", species=None, inlet="108m") == ["uuid_b"]
+    assert index.search(site="tac") == []
+    assert index.search() == ["uuid_a", "uuid_b", "uuid_c"]
+
+    with pytest.raises(KeyError):
+        index.search(colour="blue")
+
+
+def test_update_and_remove():
+    index = MetadataIndex()
+
+    index.add(uuid="uuid_a", metadata={"site": "bsd", "species": "co2"})
+    index.add(uuid="uuid_a", metadata={"site": "tac", "species": "co2"})
+
+    assert index.search(site="bsd") == []
+    assert index.search(site="tac") == ["uuid_a"]
+
+    index.remove(uuid="uuid_a")
+
+    assert index.search(species="co2") == []
+    assert index.datasources() == []
+    assert index._index["site"] == {}
+
+
+def test_to_data_from_data():
+    index = MetadataIndex()
+    index.add(uuid="uuid_a", metadata={"site": "bsd", "species": "co2", "port": "8"})
+
+    data = index.to_data()
+
+    assert data["records"] == {"uuid_a": {"site": "bsd", "species": "co2"}}
+
+    index_2 = MetadataIndex.from_data(data)
+
+    assert index_2.search(site="bsd", species="co2") == ["uuid_a"]
+    assert index_2.record("uuid_a") == {"site": "bsd", "species": "co2"}
+
+
+def test_index_updated_by_save_and_delete():
+    get_local_bucket(empty=True)
+
+    filepath = get_datapath(filename="bsd.picarro.1minute.248m.dat", data_type="CRDS")
+    results = ObsSurface.read_file(filepath=filepath, data_type="CRDS")
+
+    uuids = results["bsd.picarro.1minute.248m.dat"]
+    ch4_uuid = uuids["bsd.picarro.1minute.248m_ch4"]
+
+    index = MetadataIndex.load()
+
+    assert sorted(index.search(site="bsd")) == sorted(uuids.values())
+    assert index.search(site="bsd", species="ch4", inlet="248m") == [ch4_uuid]
+
+    obs = ObsSurface.load()
+    obs.delete(uuid=ch4_uuid)
+    obs.save()
+
+    index = MetadataIndex.load()
+
+    assert index.search(site="bsd", species="ch4") == []
+    assert not Datasource.exists(datasource_id=ch4_uuid)
+
+
+def test_index_rebuilt_if_missing():
+    bucket = get_local_bucket(empty=True)
+
+    filepath = get_datapath(filename="bsd.picarro.1minute.248m.dat", data_type="CRDS")
+    results = ObsSurface.read_file(filepath=filepath, data_type="CRDS")
+
+    from HUGS.ObjectStore import delete_object
+
+    delete_object(bucket=bucket, key=f"{MetadataIndex._root}/uuid/{MetadataIndex._uuid}")
+
+    assert not MetadataIndex.exists()
+
+    index = MetadataIndex.load()
+
+    assert MetadataIndex.exists()
+    assert sorted(index.datasources()) == sorted(results["bsd.picarro.1minute.248m.dat"].values())
+
+
+def test_search_values_matches_any_field():
+    index = MetadataIndex()
+
+    index.add(uuid="uuid_a", metadata={"site": "bsd", "species": "co2", "inlet": "248m", "port": "8"})
+    index.add(uuid="uuid_b", metadata={"site": "bsd", "species": "ch4", "inlet": "108m", "port": "9"})
+
+    assert index.search_values(["BSD", "co2"]) == ["uuid_a"]
+    # Values of fields that aren't in the indexed fields are matched, as search_metadata does
+    assert index.search_values("9") == ["uuid_b"]
+    assert index.search_values(["bsd", None]) == ["uuid_a", "uuid_b"]
+    assert index.search_values(["bsd", "tac"]) == []
+
+    index.remove(uuid="uuid_b")
+
+    assert index.search_values("bsd") == ["uuid_a"]
+    assert "9" not in index._values
+
+
+def test_concurrent_updates_not_lost():
+    from concurrent.futures import ThreadPoolExecutor
+
+    get_local_bucket(empty=True)
+
+    def add(i):
+        MetadataIndex.update(add={f"uuid_{i}": {"site": "bsd", "species": f"species_{i}"}})
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(add, range(32)))
+
+    index = MetadataIndex.load()
+
+    assert len(index.datasources()) == 32
+    assert index.search_values(["bsd", "species_7"]) == ["uuid_7"]
+
+
+def test_query_store_loads_datasources_missing_from_index():
+    import pandas as pd
+    from HUGS.ObjectStore import query_store
+
+    get_local_bucket(empty=True)
+    MetadataIndex().save()
+
+    data = pd.DataFrame({"ch4": [1.0, 2.0]}, index=pd.date_range("2020-01-01", periods=2, freq="1H"))
+    data.index.name = "time"
+
+    datasource = Datasource(name="test_ds")
+    datasource.add_data(metadata={"site": "bsd", "species": "ch4", "inlet": "248m"}, data=data.to_xarray(),
+                        data_type="timeseries")
+    datasource.save(update_index=False)
+
+    obs = ObsSurface.load()
+    obs.add_datasources({"test_ds": datasource.uuid()})
+    obs.save()
+
+    assert datasource.uuid() not in MetadataIndex.load().datasources()
+
+    data = query_store()
+
+    assert data[datasource.uuid()]["site"] == "bsd"
+    assert data[datasource.uuid()]["species"] == "ch4"
@@ -381,3 +381,71 @@ def test_delete_Datasource():
     assert uuid not in obs.datasources()
 
     assert not exists(bucket=bucket, key=key)
+
+
+def test_read_batch_of_files():
+    get_local_bucket(empty=True)
+
+    filenames = ["bsd.picarro.1minute.248m.dat", "hfd.picarro.1minute.100m.min.dat", "tac.picarro.1minute.100m.min.dat"]
+    filepaths = [get_datapath(filename=f, data_type="CRDS") for f in filenames]
+
+    results = ObsSurface.read_file(filepath=filepaths, data_type="CRDS", max_workers=2)
+
+    assert sorted(results) == sorted(filenames)
+
+    obs = ObsSurface.load()
+
+    assert sorted(obs.datasources()) == sorted(uuid for r in results.values() for uuid in r.values())
+    assert len(obs._file_hashes) == 3
+
+    # Each Datasource is only saved once
+    for uuid in obs.datasources():
+        datasource = Datasource.load(uuid=uuid, shallow=True)
+        assert sorted(datasource.versions()) == ["latest", "v1"]
+
+    hfd_uuid = results["hfd.picarro.1minute.100m.min.dat"]["hfd.picarro.1minute.100m.min_co2"]
+
+    assert Datasource.load(uuid=hfd_uuid, shallow=True).metadata()["site"] == "hfd"
+
+
+def test_read_batch_in_chunks(monkeypatch):
+    import HUGS.Processing
+
+    get_local_bucket(empty=True)
+
+    filenames = ["bsd.picarro.1minute.248m.dat", "hfd.picarro.1minute.100m.min.dat", "tac.picarro.1minute.100m.min.dat"]
+    filepaths = [get_datapath(filename=f, data_type="CRDS") for f in filenames]
+
+    assign_data_batch = HUGS.Processing.assign_data_batch
+    written = []
+
+    def recording_assign_data_batch(datasource_data, overwrite, storage_format=None):
+        written.append(sorted({name.split(".")[0] for name in datasource_data}))
+        return assign_data_batch(datasource_data=datasource_data, overwrite=overwrite, storage_format=storage_format)
+
+    monkeypatch.setattr(HUGS.Processing, "assign_data_batch", recording_assign_data_batch)
+
+    results = ObsSurface.read_file(filepath=filepaths, data_type="CRDS", max_workers=1, batch_size=2)
+
+    # The data of each chunk of files is written before the next is read
+    assert written == [["bsd", "hfd"], ["tac"]]
+    assert sorted(results) == sorted(filenames)
+
+    obs = ObsSurface.load()
+
+    assert sorted(obs.datasources()) == sorted(uuid for r in results.values() for uuid in r.values())
+    assert len(obs._file_hashes) == 3
+
+    with pytest.raises(ValueError):
+        ObsSurface.read_file(filepath=filepaths, data_type="CRDS", batch_size=0, overwrite=True)
+
+
+def test_read_batch_same_file_twice_raises():
+    get_local_bucket(empty=True)
+
+    filepath = get_datapath(filename="hfd.picarro.1minute.100m.min.dat", data_type="CRDS")
+
+    with pytest.raises(ValueError):
+        ObsSurface.read_file(filepath=[filepath, filepath], data_type="CRDS")
+
+    assert not ObsSurface.load().datasources()
@@ -0,0 +1,118 @@
+import time
+
+import pytest
+
+from HUGS.Modules import Datasource, SegmentCache, get_segment_cache
+from HUGS.ObjectStore import get_local_bucket
+
+
+def test_hits_misses_and_size(make_dataset):
+    cache = SegmentCache(max_bytes=1024 * 1024)
+
+    ds = make_dataset()
+    key = cache.cache_key(bucket="bucket", key="data/uuid/abc/hash/daterange")
+
+    assert cache.get(key) is None
+
+    cache.set(key, ds)
+    cached = cache.get(key)
+
+    assert cached.equals(ds)
+
+    stats = cache.stats()
+
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["segments"] == 1
+    assert stats["nbytes"] == ds.nbytes
+
+    # Changes to the returned Dataset don't change the cached copy
+    cached.attrs["changed"] = True
+    assert "changed" not in cache.get(key).attrs
+
+    # The cached values can't be changed in place
+    with pytest.raises(ValueError):
+        cached["ch4"].values[0] = -1.0
+
+    assert cache.get(key)["ch4"].values[0] == 0.0
+
+    # New variables holding copies of the values can be changed
+    cached["ch4_copy"] = cached["ch4"].copy(deep=True)
+    cached["ch4_copy"].values[0] = -1.0
+
+
+def test_evicts_least_recently_used(make_dataset):
+    ds = make_dataset()
+    cache = SegmentCache(max_bytes=2 * ds.nbytes)
+
+    keys = [cache.cache_key(bucket="bucket", key=f"key_{i}") for i in range(3)]
+
+    cache.set(keys[0], ds)
+    cache.set(keys[1], ds)
+    cache.get(keys[0])
+    cache.set(keys[2], ds)
+
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[2]) is not None
+    assert cache.stats()["nbytes"] == 2 * ds.nbytes
+
+    # Segments larger than the cache aren't stored
+    big_key = cache.cache_key(bucket="bucket", key="big")
+    cache.set(big_key, make_dataset(n_times=100))
+
+    assert cache.get(big_key) is None
+
+
+def test_ttl_expires_segments(make_dataset):
+    cache = SegmentCache(ttl=0.05)
+
+    key = cache.cache_key(bucket="bucket", key="key")
+    cache.set(key, make_dataset())
+
+    assert cache.get(key) is not None
+
+    time.sleep(0.1)
+
+    assert cache.get(key) is None
+
+
+def test_invalid_configuration_raises():
+    with pytest.raises(ValueError):
+        SegmentCache(max_bytes=-1)
+
+    with pytest.raises(ValueError):
+        SegmentCache(ttl=0)
+
+
+def test_load_datasets_reads_through_cache(monkeypatch, make_dataset):
+    bucket = get_local_bucket(empty=True)
+
+    cache = get_segment_cache()
+    cache.clear()
+
+    d = Datasource(name="cache_test")
+    d.add_data(metadata={"site": "bsd", "species": "ch4"}, data=make_dataset())
+    d.save()
+
+    key = d.data_keys()[0]
+
+    first = Datasource.load_dataset(bucket=bucket, key=key)
+
+    def no_read(*args, **kwargs):
+        raise AssertionError("Dataset should be read from the cache")
+
+    monkeypatch.setattr(Datasource, "netcdf_file_to_dataset", no_read)
+
+    second = Datasource.load_dataset(bucket=bucket, key=key)
+
+    assert second.equals(first)
+    assert cache.stats()["hits"] == 1
+
+    # A different selection of the data isn't cached
+    with pytest.raises(AssertionError):
+        Datasource.load_dataset(bucket=bucket, key=key, variables=["ch4"])
+
+    Datasource.delete_dataset(bucket=bucket, key=key)
+
+    assert cache.stats()["segments"] == 0
@@ -27,3 +27,155 @@ def test_query_store(populate_store):
     print(data)
 
 
+def test_exists_exact_key():
+    from HUGS.ObjectStore import exists, set_object
+
+    bucket = get_local_bucket(empty=True)
+
+    set_object(bucket=bucket, key="test/exists/key_one", data=b"123")
+
+    assert exists(bucket=bucket, key="test/exists/key_one")
+    assert not exists(bucket=bucket, key="test/exists/key")
+    assert not exists(bucket=bucket, key="test/exists")
+    assert not exists(bucket=bucket, key="test/exists/key_two")
+
+
+def test_get_object_names_prefix():
+    from HUGS.ObjectStore import get_all_object_names, get_object_names, set_object
+
+    bucket = get_local_bucket(empty=True)
+
+    keys = ["data/uuid/abc/v1/2019_2020", "data/uuid/abc/v2/2019_2020", "data/uuid/abd/v1/2019_2020",
+            "datasource/uuid/abc", "datasource/uuid/abcdef"]
+
+    for key in keys:
+        set_object(bucket=bucket, key=key, data=b"123")
+
+    assert sorted(get_object_names(bucket=bucket)) == sorted(keys)
+    assert sorted(get_object_names(bucket=bucket, prefix="data/uuid/abc/")) == keys[:2]
+    assert sorted(get_object_names(bucket=bucket, prefix="data/uuid/ab")) == keys[:3]
+    assert sorted(get_object_names(bucket=bucket, prefix="datasource/uuid/abc")) == keys[3:]
+    assert get_object_names(bucket=bucket, prefix="footprint") == []
+
+    names = get_all_object_names(bucket=bucket, prefix="data/uuid/abc", without_prefix=True)
+    assert sorted(names) == ["v1/2019_2020", "v2/2019_2020"]
+
+
+def test_listing_cache_invalidated():
+    from HUGS.ObjectStore import delete_object, enable_listing_cache, get_object_names, set_object
+
+    bucket = get_local_bucket(empty=True)
+
+    enable_listing_cache()
+
+    try:
+        set_object(bucket=bucket, key="cache/uuid/one", data=b"1")
+
+        assert get_object_names(bucket=bucket, prefix="cache/") == ["cache/uuid/one"]
+
+        set_object(bucket=bucket, key="cache/uuid/two", data=b"2")
+
+        assert sorted(get_object_names(bucket=bucket, prefix="cache/")) == ["cache/uuid/one", "cache/uuid/two"]
+
+        delete_object(bucket=bucket, key="cache/uuid/one")
+
+        assert get_object_names(bucket=bucket, prefix="cache/") == ["cache/uuid/two"]
+
+        get_local_bucket(empty=True)
+
+        assert get_object_names(bucket=bucket, prefix="cache/") == []
+    finally:
+        enable_listing_cache(enabled=False)
+
+
+def test_concurrent_reads_see_complete_writes():
+    from concurrent.futures import ThreadPoolExecutor
+    from HUGS.ObjectStore import get_object, get_object_names, set_object
+
+    bucket = get_local_bucket(empty=True)
+
+    key = "test/concurrent/key"
+    payloads = [bytes([i]) * (100000 * (i + 1)) for i in range(4)]
+
+    set_object(bucket=bucket, key=key, data=payloads[0])
+
+    def write(i):
+        set_object(bucket=bucket, key=key, data=payloads[i % len(payloads)])
+
+    def read(_):
+        return get_object(bucket=bucket, key=key)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        writes = [executor.submit(write, i) for i in range(40)]
+        reads = [executor.submit(read, i) for i in range(40)]
+
+        for w in writes:
+            w.result()
+
+        for r in reads:
+            assert r.result() in payloads
+
+    # No temporary files are left behind or listed
+    assert get_object_names(bucket=bucket) == [key]
+    assert sorted(p.name for p in Path(bucket, "test/concurrent").iterdir()) == ["key._data"]
+
+
+def test_get_object_path():
+    from Acquire.ObjectStore import ObjectStoreError
+    from HUGS.ObjectStore import get_object_path, set_object
+
+    bucket = get_local_bucket(empty=True)
+
+    set_object(bucket=bucket, key="test/path/key", data=b"123")
+
+    assert Path(get_object_path(bucket=bucket, key="test/path/key")).read_bytes() == b"123"
+
+    with pytest.raises(ObjectStoreError):
+        get_object_path(bucket=bucket, key="test/path/missing")
+
+
+def test_get_set_objects():
+    from Acquire.ObjectStore import ObjectStoreError
+    from HUGS.ObjectStore import get_object, get_objects, set_objects
+
+    bucket = get_local_bucket(empty=True)
+
+    data = {f"test/bulk/{i}/key": bytes([i]) * 10 for i in range(5)}
+
+    set_objects(bucket=bucket, data=data)
+
+    assert get_object(bucket=bucket, key="test/bulk/3/key") == data["test/bulk/3/key"]
+
+    keys = list(data)[::-1]
+    objects = get_objects(bucket=bucket, keys=keys)
+
+    assert list(objects) == keys
+    assert objects == data
+
+    objects = get_objects(bucket=bucket, keys=keys, max_workers=3)
+
+    assert list(objects) == keys
+    assert objects == data
+
+    with pytest.raises(ObjectStoreError):
+        get_objects(bucket=bucket, keys=["test/bulk/0/key", "test/bulk/missing"])
+
+
+def test_object_permissions_follow_umask():
+    import os
+    import stat
+    from HUGS.ObjectStore import set_object
+    from HUGS.ObjectStore._local_store import _read_umask
+
+    bucket = get_local_bucket(empty=True)
+
+    umask = os.umask(0o022)
+    os.umask(umask)
+
+    assert _read_umask() == umask
+
+    set_object(bucket=bucket, key="test/permissions/key", data=b"data")
+
+    mode = stat.S_IMODE(os.stat(f"{bucket}/test/permissions/key._data").st_mode)
+
+    assert mode == 0o666 & ~umask
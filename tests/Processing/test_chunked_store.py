@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+import xarray
+from pathlib import Path
+
+from HUGS.Modules import Datasource
+from HUGS.ObjectStore import get_local_bucket, get_object_from_json, get_object_names
+from HUGS.Processing import is_chunked_manifest, read_chunked_dataset, write_chunked_dataset
+
+
+@pytest.fixture
+def timeseries():
+    times = pd.date_range("2019-01-01", periods=25000, freq="min")
+
+    return xarray.Dataset(
+        {
+            "co2": ("time", np.linspace(400, 410, len(times)), {"units": "ppm"}),
+            "co2_stdev": ("time", np.linspace(0, 1, len(times))),
+            "co2_n_meas": ("time", np.arange(len(times), dtype="int32")),
+        },
+        coords={"time": times},
+        attrs={"site": "bsd", "station_height_masl": np.float64(380.0)},
+    )
+
+
+def test_write_read_chunked(timeseries):
+    bucket = get_local_bucket(empty=True)
+
+    key = "data/uuid/test-uuid/v1/2019-01-01_2019-01-18"
+
+    manifest = write_chunked_dataset(bucket=bucket, key=key, dataset=timeseries)
+
+    # 25000 times in chunks of 10080
+    assert [c["size"] for c in manifest["chunks"]] == [10080, 10080, 4840]
+    assert len(get_object_names(bucket, prefix=f"{key}/co2_stdev/")) == 3
+
+    stored_manifest = get_object_from_json(bucket=bucket, key=key)
+
+    assert is_chunked_manifest(stored_manifest)
+
+    ds = read_chunked_dataset(bucket=bucket, manifest=stored_manifest)
+
+    assert ds.equals(timeseries)
+    assert ds.attrs == {"site": "bsd", "station_height_masl": 380.0}
+    assert ds["co2"].attrs == {"units": "ppm"}
+
+
+def test_read_chunked_selection(timeseries):
+    bucket = get_local_bucket(empty=True)
+
+    key = "data/uuid/test-uuid/v1/2019-01-01_2019-01-18"
+    manifest = write_chunked_dataset(bucket=bucket, key=key, dataset=timeseries)
+
+    start = pd.Timestamp("2019-01-08 01:00")
+    end = pd.Timestamp("2019-01-08 02:00")
+
+    ds = read_chunked_dataset(bucket=bucket, manifest=manifest, variables=["co2"], start_date=start, end_date=end)
+
+    assert list(ds.data_vars) == ["co2"]
+    assert ds.time[0] == start
+    assert ds.time[-1] == end
+    assert ds["co2"].equals(timeseries["co2"].sel(time=slice(start, end)))
+
+    ds = read_chunked_dataset(bucket=bucket, manifest=manifest, start_date=pd.Timestamp("2020-01-01"))
+
+    assert ds.dims["time"] == 0
+
+
+def test_chunked_footprint():
+    bucket = get_local_bucket(empty=True)
+
+    filepath = Path(__file__).resolve().parent.joinpath("../data/emissions/WAO-20magl_EUROPE_201306_small.nc")
+    footprint = xarray.load_dataset(filepath)
+
+    key = "data/uuid/test-uuid/v1/footprint"
+    manifest = write_chunked_dataset(bucket=bucket, key=key, dataset=footprint, chunk_size=2)
+
+    ds = read_chunked_dataset(bucket=bucket, manifest=manifest)
+
+    assert ds.equals(footprint)
+
+    Datasource.delete_dataset(bucket=bucket, key=key)
+
+    assert get_object_names(bucket, prefix=key) == []
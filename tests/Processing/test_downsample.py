@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+import pytest
+import xarray
+
+from HUGS.Processing import downsample_timeseries, lttb_indices, minmax_indices
+
+
+@pytest.fixture
+def timeseries():
+    rng = np.random.default_rng(seed=3)
+
+    times = pd.date_range("2015-01-01", periods=100_000, freq="min")
+    values = 400 + np.cumsum(rng.normal(0, 0.1, len(times)))
+    values[50_000:50_100] = np.nan
+
+    return xarray.DataArray(values, coords={"time": times}, dims="time")
+
+
+def test_minmax_keeps_extremes(timeseries):
+    n_buckets = 500
+
+    idx = minmax_indices(x=timeseries.time.values, y=timeseries.values, n_buckets=n_buckets)
+
+    assert len(idx) <= 2 * n_buckets + 3
+    assert np.all(np.diff(idx) > 0)
+    assert idx[0] == 0 and idx[-1] == timeseries.size - 1
+
+    values = timeseries.values
+    assert np.nanmax(values) == np.nanmax(values[idx])
+    assert np.nanmin(values) == np.nanmin(values[idx])
+    # The gap in the data is kept
+    assert 50_000 in idx
+
+
+def test_minmax_small_data_unchanged():
+    idx = minmax_indices(x=np.arange(10), y=np.arange(10), n_buckets=5)
+
+    np.testing.assert_array_equal(idx, np.arange(10))
+
+
+def test_minmax_all_missing():
+    y = np.full(100, np.nan)
+
+    np.testing.assert_array_equal(minmax_indices(x=np.arange(100), y=y, n_buckets=10), [0, 99])
+
+    # Zooming in to a period without data, such as an instrument outage
+    times = pd.date_range("2019-01-01", periods=100, freq="min")
+    variable = xarray.DataArray(y, coords={"time": times}, dims="time")
+
+    x_plot, y_plot = downsample_timeseries(variable, n_buckets=10, start_date=times[20], end_date=times[80])
+
+    assert x_plot[0] == times[19]
+    assert x_plot[-1] == times[81]
+    assert np.isnan(y_plot).all()
+
+
+def test_lttb(timeseries):
+    idx = lttb_indices(x=timeseries.time.values, y=timeseries.values, n_out=1000)
+
+    assert len(idx) == 1000
+    assert np.all(np.diff(idx) > 0)
+    assert idx[0] == 0 and idx[-1] == timeseries.size - 1
+    assert not np.isnan(timeseries.values[idx]).any()
+
+    # A single spike is always selected
+    y = np.zeros(10_000)
+    y[1234] = 10.0
+    assert 1234 in lttb_indices(x=np.arange(y.size), y=y, n_out=100)
+
+    with pytest.raises(ValueError):
+        lttb_indices(x=np.arange(10), y=np.arange(10), n_out=2)
+
+
+def test_downsample_timeseries_zoom(timeseries):
+    x, y = downsample_timeseries(variable=timeseries, n_buckets=200)
+
+    assert len(x) <= 403
+
+    start = pd.Timestamp("2015-01-10 00:00")
+    end = pd.Timestamp("2015-01-10 01:00")
+
+    x, y = downsample_timeseries(variable=timeseries, n_buckets=200, start_date=start, end_date=end)
+
+    # All of the data in a small window is plotted along with the points either side
+    expected = timeseries.sel(time=slice(start - pd.Timedelta("1min"), end + pd.Timedelta("1min")))
+    np.testing.assert_array_equal(x, expected.time.values)
+    np.testing.assert_array_equal(y, expected.values)
+
+    x, y = downsample_timeseries(variable=timeseries, n_buckets=200, method="lttb")
+    assert len(x) == 400
+
+    with pytest.raises(ValueError):
+        downsample_timeseries(variable=timeseries, n_buckets=200, method="spline")
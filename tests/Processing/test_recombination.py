@@ -94,3 +94,109 @@ def test_recombination_GC():
     assert toluene_data["toluene repeatability"].equals(toluene_data_recombined["c6h5ch3_repeatability"])
     assert toluene_data["toluene status_flag"].equals(toluene_data_recombined["c6h5ch3_status_flag"])
     assert toluene_data["toluene integration_flag"].equals(toluene_data_recombined["c6h5ch3_integration_flag"])
+
+
+def test_recombination_keys_out_of_order():
+    import numpy as np
+    import pandas as pd
+    import xarray
+    from HUGS.Modules import Datasource
+
+    get_local_bucket(empty=True)
+
+    times = pd.date_range("2019-01-01", "2019-12-31", freq="D")
+    ds = xarray.Dataset({"ch4": ("time", np.arange(len(times), dtype=float))}, coords={"time": times})
+
+    d = Datasource(name="recombination_test")
+    d.add_data(metadata={"site": "bsd", "species": "ch4"}, data=ds)
+    d.save()
+
+    keys = sorted(d.data_keys(), reverse=True)
+
+    recombined = recombine_sections(data_keys=keys, max_workers=2)
+
+    assert recombined.time.equals(ds.time)
+    assert recombined["ch4"].equals(ds["ch4"])
+
+
+def test_recombination_seasonal_segments_merged_without_sorting(monkeypatch):
+    import numpy as np
+    import pandas as pd
+    import xarray
+    from HUGS.Modules import Datasource
+
+    get_local_bucket(empty=True)
+
+    # A year of CRDS like minute data, the DJF segment holds January, February and December
+    times = pd.date_range("2019-01-01", "2019-12-31 23:59", freq="min")[::7]
+    n_times = len(times)
+    ds = xarray.Dataset(
+        {
+            "ch4": ("time", np.linspace(1900.0, 2000.0, n_times)),
+            "ch4_stdev": ("time", np.full(n_times, 0.5)),
+            "ch4_n_meas": ("time", np.full(n_times, 19.0)),
+        },
+        coords={"time": times},
+    )
+
+    d = Datasource(name="recombination_test")
+    d.add_data(metadata={"site": "bsd", "species": "ch4"}, data=ds)
+    d.save()
+
+    assert len(d.data_keys()) == 4
+
+    def sortby(*args, **kwargs):
+        raise AssertionError("Sorted data segments shouldn't be sorted again")
+
+    monkeypatch.setattr(xarray.Dataset, "sortby", sortby)
+
+    recombined = recombine_sections(data_keys=d.data_keys())
+
+    assert recombined.time.equals(ds.time)
+    assert recombined["ch4"].equals(ds["ch4"])
+
+
+def test_recombination_reads_bounded(monkeypatch):
+    import threading
+    import time
+    import numpy as np
+    import pandas as pd
+    import xarray
+    from HUGS.Modules import Datasource, get_segment_cache
+    from HUGS.ObjectStore import _local_store
+
+    get_local_bucket(empty=True)
+
+    times = pd.date_range("2019-01-01", "2019-12-31", freq="H")
+    ds = xarray.Dataset({"ch4": ("time", np.arange(len(times), dtype=float))}, coords={"time": times})
+
+    d = Datasource(name="recombination_test")
+    d.set_storage_format("chunked")
+    d.add_data(metadata={"site": "bsd", "species": "ch4"}, data=ds)
+    d.save()
+
+    get_object = _local_store.get_object
+    lock = threading.Lock()
+    in_flight = [0]
+    max_in_flight = [0]
+
+    def counting_get_object(bucket, key):
+        with lock:
+            in_flight[0] += 1
+            max_in_flight[0] = max(max_in_flight[0], in_flight[0])
+        try:
+            time.sleep(0.01)
+            return get_object(bucket=bucket, key=key)
+        finally:
+            with lock:
+                in_flight[0] -= 1
+
+    monkeypatch.setattr(_local_store, "get_object", counting_get_object)
+
+    # Read the data from the object store rather than the segment cache
+    get_segment_cache().clear()
+
+    recombined = recombine_sections(data_keys=d.data_keys(), max_workers=2)
+
+    assert 1 < max_in_flight[0] <= 2
+    assert recombined["ch4"].equals(ds["ch4"])
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+import xarray
+
+from HUGS.Processing import grouped_statistics, resample_observations
+
+
+def test_grouped_statistics():
+    values = np.array([1.0, 2.0, 3.0, np.nan, 5.0, 7.0])
+    codes = np.array([0, 0, 0, 1, 1, 2])
+
+    stats = grouped_statistics(values=values, codes=codes, n_groups=4)
+
+    np.testing.assert_allclose(stats["mean"], [2.0, 5.0, 7.0, np.nan])
+    np.testing.assert_allclose(stats["std"], [np.std([1.0, 2.0, 3.0]), 0.0, 0.0, np.nan])
+    np.testing.assert_array_equal(stats["count"], [3, 1, 1, 0])
+    np.testing.assert_array_equal(stats["n_missing"], [0, 1, 0, 0])
+    np.testing.assert_allclose(stats["sum_squares"], [14.0, 25.0, 49.0, 0.0])
+
+
+@pytest.mark.parametrize("average", ["2h", "30min", "1D"])
+def test_resample_matches_xarray(observations, average):
+    data = observations
+
+    expected = data.resample(time=average).mean(skipna=False)
+    expected["co2_repeatability"] = (np.sqrt((data["co2_repeatability"] ** 2).resample(time=average).sum())
+                                     / data["co2_repeatability"].resample(time=average).count())
+    expected["co2_variability"] = data["co2_variability"].resample(time=average).std(skipna=False)
+
+    resampled = resample_observations(data, average=average)
+
+    np.testing.assert_array_equal(resampled.time.values, expected.time.values)
+
+    for var in data.data_vars:
+        np.testing.assert_allclose(resampled[var].values, expected[var].values, rtol=1e-9, equal_nan=True)
+
+    assert resampled.attrs == data.attrs
+    assert resampled["co2"].attrs == {"units": "ppm", "long_name": "co2"}
+
+
+def test_resample_keep_missing(observations):
+    start = pd.Timestamp("2019-01-29 20:00", tz="UTC")
+    end = pd.Timestamp("2019-02-03 11:00", tz="UTC")
+
+    resampled = resample_observations(observations, average="2h")
+    with_missing = resample_observations(observations, average="2h", keep_missing=True, start_date=start, end_date=end)
+
+    assert with_missing.time[0] == pd.Timestamp("2019-01-29 20:00")
+    assert with_missing.time[-1] == pd.Timestamp("2019-02-03 10:00")
+    assert with_missing.time.size == resampled.time.size + 2 + 3
+
+    assert np.isnan(with_missing["co2"].sel(time=slice("2019-01-29", "2019-01-29")).values).all()
+
+    overlap = with_missing.sel(time=resampled.time)
+    for var in resampled.data_vars:
+        np.testing.assert_allclose(overlap[var].values, resampled[var].values, equal_nan=True)
+
+
+def test_resample_keep_missing_pads_without_masking_data():
+    times = pd.date_range("2019-01-01 01:00", "2019-01-01 04:59", freq="min")
+    data = xarray.Dataset({"co2": ("time", np.arange(len(times), dtype=float))}, coords={"time": times})
+
+    # The start and end dates fall in the first and last periods holding data
+    start = pd.Timestamp("2019-01-01 00:30", tz="UTC")
+    end = pd.Timestamp("2019-01-01 05:30", tz="UTC")
+
+    resampled = resample_observations(data, average="2h", keep_missing=True, start_date=start, end_date=end)
+
+    expected_times = pd.DatetimeIndex(["2019-01-01 00:00", "2019-01-01 02:00", "2019-01-01 04:00"])
+    assert resampled.indexes["time"].equals(expected_times)
+
+    # Padding doesn't make the averages of these periods missing
+    assert resampled["co2"].values[0] == data["co2"].sel(time=slice("2019-01-01 01:00", "2019-01-01 01:59")).mean()
+    assert resampled["co2"].values[-1] == data["co2"].sel(time=slice("2019-01-01 04:00", "2019-01-01 04:59")).mean()
@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from HUGS.Modules import Datasource
+from HUGS.ObjectStore import exists, get_local_bucket
+from HUGS.Processing import (
+    combine_rollups,
+    create_rollup,
+    recombine_resampled,
+    recombine_rollups,
+    resample_observations,
+    resample_rollup,
+    rollup_key,
+    rollup_level,
+)
+
+
+def test_rollup_level():
+    assert rollup_level("2h") == "1h"
+    assert rollup_level("1D") == "1d"
+    assert rollup_level("3D") == "1d"
+    assert rollup_level("MS") == "1mo"
+    assert rollup_level("30min") is None
+    assert rollup_level("90min") is None
+
+    start = pd.Timestamp("2019-02-01 00:00", tz="UTC")
+    end = pd.Timestamp("2019-02-28 23:59:59.999999999", tz="UTC")
+
+    assert rollup_level("MS", start_date=start, end_date=end) == "1mo"
+    assert rollup_level("MS", start_date=start.replace(day=2)) == "1d"
+    assert rollup_level("1D", start_date=start.replace(hour=5)) == "1h"
+    assert rollup_level("1D", end_date=pd.Timestamp("2019-02-28", tz="UTC")) is None
+
+
+@pytest.mark.parametrize("average", ["2h", "1D", "6h", "MS"])
+def test_resample_rollup_matches_resample(observations, average):
+    level = rollup_level(average)
+
+    # Split the data part way through a rollup period
+    split = observations.time.size // 2
+    rollups = [create_rollup(data=observations.isel(time=slice(None, split)), level=level),
+               create_rollup(data=observations.isel(time=slice(split, None)), level=level)]
+
+    rollup = combine_rollups(rollups)
+
+    assert rollup.time.size == create_rollup(data=observations, level=level).time.size
+
+    expected = resample_observations(observations, average=average)
+    resampled = resample_rollup(rollup, average=average)
+
+    np.testing.assert_array_equal(resampled.time.values, expected.time.values)
+
+    for var in expected.data_vars:
+        np.testing.assert_allclose(resampled[var].values, expected[var].values, rtol=1e-9, equal_nan=True)
+
+    assert resampled.attrs == expected.attrs
+    assert resampled["co2"].attrs == expected["co2"].attrs
+
+
+def test_resample_rollup_keep_missing(observations):
+    start = pd.Timestamp("2019-01-29 20:00", tz="UTC")
+    end = pd.Timestamp("2019-02-05 23:00", tz="UTC")
+
+    rollup = create_rollup(data=observations, level="1h")
+
+    expected = resample_observations(observations, average="2h", keep_missing=True, start_date=start, end_date=end)
+    resampled = resample_rollup(rollup, average="2h", keep_missing=True, start_date=start, end_date=end)
+
+    np.testing.assert_array_equal(resampled.time.values, expected.time.values)
+    np.testing.assert_allclose(resampled["co2"].values, expected["co2"].values, rtol=1e-9, equal_nan=True)
+
+
+def test_rollups_saved_and_read(observations):
+    bucket = get_local_bucket(empty=True)
+
+    first = observations.sel(time=slice(None, "2019-02-01 12:30"))
+    second = observations.sel(time=slice("2019-02-01 12:31", None))
+
+    d = Datasource(name="rollup_test")
+    d.add_data(metadata={"species": "co2"}, data=first, data_type="timeseries")
+    d.save()
+    d.add_data(metadata={"species": "co2"}, data=second, data_type="timeseries")
+    d.save()
+
+    data_keys = d.data_keys()
+
+    assert len(data_keys) == 2
+    assert all(exists(bucket=bucket, key=rollup_key(data_key=k, level="1d")) for k in data_keys)
+
+    start = pd.Timestamp("2019-01-31", tz="UTC")
+    end = pd.Timestamp("2019-02-02 23:59:59.999999999", tz="UTC")
+
+    assert recombine_rollups(data_keys=data_keys, level="1h", start_date=start, end_date=end) is not None
+
+    resampled = recombine_resampled(data_keys=data_keys, average="6h", start_date=start, end_date=end)
+    expected = resample_observations(observations.sel(time=slice("2019-01-31", "2019-02-02")), average="6h")
+
+    np.testing.assert_array_equal(resampled.time.values, expected.time.values)
+
+    for var in expected.data_vars:
+        np.testing.assert_allclose(resampled[var].values, expected[var].values, rtol=1e-9, equal_nan=True)
+
+    # Deleting the data removes its rollups
+    Datasource.delete_dataset(bucket=bucket, key=data_keys[0])
+
+    assert not exists(bucket=bucket, key=rollup_key(data_key=data_keys[0], level="1d"))
@@ -99,4 +99,92 @@ def test_valid_site():
     result = Util.valid_site(site=site)
 
     assert result is False
-    
\ No newline at end of file
+    
+
+def test_dataset_chunks_roundtrip():
+    import numpy as np
+    import pandas as pd
+    import xarray
+
+    times = pd.date_range("2019-01-01 00:00:01.123456789", periods=1000, freq="37s")
+    ds = xarray.Dataset({"ch4": ("time", np.random.rand(1000))}, coords={"time": times}, attrs={"site": "bsd"})
+
+    chunks = Util.dataset_to_chunks(ds, chunk_size=1024)
+
+    assert len(chunks) > 1
+    assert all(isinstance(c, str) for c in chunks)
+
+    recreated = Util.chunks_to_dataset(chunks)
+
+    assert recreated.time.equals(ds.time)
+    assert recreated["ch4"].equals(ds["ch4"])
+    assert recreated.attrs == ds.attrs
+
+
+def test_set_datetime_index():
+    import pandas as pd
+
+    data = pd.DataFrame({"date": ["200130", "200131", "bad"], "time": ["010203", "105230", "105230"], "co2": [1.0, 2.0, 3.0]})
+
+    indexed = Util.set_datetime_index(data=data, columns=["date", "time"], format="%y%m%d %H%M%S", errors="coerce")
+
+    assert list(indexed.columns) == ["co2"]
+    assert indexed.index.name == "time"
+    assert indexed.index[0] == Timestamp("2020-01-30 01:02:03")
+    assert indexed.index[1] == Timestamp("2020-01-31 10:52:30")
+    assert pd.isnull(indexed.index[2])
+
+    data = pd.DataFrame({"yyyy": [2018, 2019], "mm": [1, 12], "dd": [2, 31], "hh": [3, 23], "mi": [4, 59], "ch4": [1.0, 2.0]})
+
+    indexed = Util.set_datetime_index(data=data, columns=["yyyy", "mm", "dd", "hh", "mi"], name="Datetime")
+
+    assert list(indexed.columns) == ["ch4"]
+    assert indexed.index.name == "Datetime"
+    assert list(indexed.index) == [Timestamp("2018-01-02 03:04"), Timestamp("2019-12-31 23:59")]
+
+    with pytest.raises(ValueError):
+        Util.set_datetime_index(data=data, columns=["yyyy", "mm"])
+
+
+@pytest.mark.slow
+@pytest.mark.skipif(not os.getenv("HUGS_BENCHMARK"), reason="set HUGS_BENCHMARK to run benchmarks")
+def test_benchmark_datetime_parsing():
+    """ Compare the time taken to create datetimes by calling a function on each row,
+        as the data modules used to, with set_datetime_index for each date format
+
+        Run with HUGS_BENCHMARK=1 pytest -s to print the timings
+    """
+    import time
+    import numpy as np
+    import pandas as pd
+
+    n_rows = 200_000
+    times = pd.date_range("2014-01-01", periods=n_rows, freq="min")
+
+    formats = {
+        "CRDS": (pd.DataFrame({"date": times.strftime("%y%m%d"), "time": times.strftime("%H%M%S")}),
+                 "%y%m%d %H%M%S"),
+        "GCWERKS precision": (pd.DataFrame({"date": times.strftime("%y%m%d")}), "%y%m%d"),
+        "GCWERKS / NOAA / ICOS / EUROCOM": (pd.DataFrame({"year": times.year, "month": times.month, "day": times.day,
+                                                          "hour": times.hour, "minute": times.minute}), None),
+    }
+
+    for name, (data, date_format) in formats.items():
+        columns = list(data.columns)
+
+        start = time.perf_counter()
+        if date_format is None:
+            per_row = [pd.Timestamp(*row) for row in data[columns].itertuples(index=False)]
+        else:
+            joined = data[columns].astype(str).agg(" ".join, axis=1)
+            per_row = [datetime.datetime.strptime(d, date_format) for d in joined]
+        per_row_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        indexed = Util.set_datetime_index(data=data, columns=columns, format=date_format)
+        vectorised_time = time.perf_counter() - start
+
+        print(f"{name}: per row {per_row_time:.3f} s, vectorised {vectorised_time:.3f} s, "
+              f"speedup {per_row_time / vectorised_time:.1f}x")
+
+        assert np.array_equal(indexed.index.values, pd.DatetimeIndex(per_row).values)
@@ -1,6 +1,11 @@
 import os
 import sys
 
+import numpy as np
+import pandas as pd
+import pytest
+import xarray
+
 # load all of the common fixtures used by the mocked tests
 #pytest_plugins = ["mock.fixtures.mocked_services"]
 
@@ -15,7 +20,39 @@ def pytest_configure(config):
     config.addinivalue_line("markers", "slow: slow")
 
 
+@pytest.fixture
+def observations():
+    """ Four days of minute observations with gaps and missing values """
+    rng = np.random.default_rng(seed=7)
+
+    times = pd.date_range("2019-01-30 00:03", periods=6000, freq="min")
+    times = times[rng.random(len(times)) > 0.3]
+
+    mf = 400 + rng.normal(0, 0.5, len(times))
+    mf[::97] = np.nan
+
+    return xarray.Dataset(
+        {
+            "co2": ("time", mf, {"units": "ppm", "long_name": "co2", "comment": "dropped"}),
+            "co2_repeatability": ("time", np.abs(rng.normal(0, 0.1, len(times)))),
+            "co2_variability": ("time", mf.copy()),
+        },
+        coords={"time": times},
+        attrs={"site": "bsd"},
+    )
+
+
+@pytest.fixture
+def make_dataset():
+    """ Returns a function that creates an hourly ch4 Dataset of n_times values """
+    def _make_dataset(n_times=10):
+        times = pd.date_range("2019-01-01", periods=n_times, freq="h")
+        return xarray.Dataset({"ch4": ("time", np.arange(n_times, dtype=float))}, coords={"time": times})
+
+    return _make_dataset
+
+
 acquire_dir = "../acquire"
 
 # sys.path.insert(0, os.path.abspath(acquire_dir))
-sys.path.insert(0, os.path.abspath(f"{acquire_dir}/services"))
\ No newline at end of file
+sys.path.insert(0, os.path.abspath(f"{acquire_dir}/services"))